@@ -0,0 +1,304 @@
+"""Per-endpoint request metrics.
+
+RequestMetricsMiddleware records, for every request, the DRF view and action
+that served it, the number and duration of its SQL queries, the time spent
+rendering the response and the response size. The numbers are aggregated
+into histograms per process and exposed in the Prometheus text format by
+``metrics_view`` (``/metrics``, restricted to staff, the
+``METRICS_ALLOWED_IPS`` and the ``METRICS_BEARER_TOKEN``), and each response
+carries them in a ``Server-Timing`` header. A request that runs the same SQL statement more
+than ``METRICS_N_PLUS_ONE_THRESHOLD`` times is logged as a likely N+1.
+
+Queries are counted by a wrapper installed on every database connection
+(see ``connection.execute_wrapper``) that reports to the request in the
+current context, so queries that async views run through sync_to_async
+threads are attributed to their request as well.
+"""
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from users.authentication import is_staff_request
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = '/metrics'
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Lists of placeholders vary with the number of values, not the statement
+PLACEHOLDER_LIST_RE = re.compile(r'%s(?:\s*,\s*%s)+')
+
+_current = ContextVar('request_metrics', default=None)
+
+
+def get_n_plus_one_threshold():
+    return getattr(settings, 'METRICS_N_PLUS_ONE_THRESHOLD', 10)
+
+
+class Histogram:
+    """Prometheus histogram with one series per label set"""
+
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.series = {}
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * len(self.buckets), 0.0, 0]
+        counts = series[0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[index] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total, count) in sorted(self.series.items()):
+            base = format_labels(label_names, labels)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {bucket_count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {count}')
+            lines.append(f'{self.name}_sum{{{base}}} {total}')
+            lines.append(f'{self.name}_count{{{base}}} {count}')
+        return lines
+
+
+class CounterMetric:
+    """Prometheus counter with one series per label set"""
+
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = Counter()
+
+    def inc(self, labels, amount=1):
+        self.series[labels] += amount
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            lines.append(f'{self.name}{{{format_labels(label_names, labels)}}} {value}')
+        return lines
+
+
+def format_labels(names, values):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return ','.join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+
+
+class MetricsRegistry:
+    """The metrics of this process, keyed by (view, method)"""
+
+    LABELS = ('view', 'method')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = CounterMetric('http_requests_total', 'Requests by view, method and status.')
+        self.n_plus_one = CounterMetric(
+            'http_repeated_queries_total', 'Requests that ran one SQL statement more often than the threshold.'
+        )
+        self.histograms = {
+            'duration': Histogram('http_request_duration_seconds', 'Time to produce the response.', DURATION_BUCKETS),
+            'queries': Histogram('http_request_db_queries', 'SQL queries per request.', QUERY_BUCKETS),
+            'db_time': Histogram('http_request_db_seconds', 'Time spent in SQL queries.', DURATION_BUCKETS),
+            'serialize': Histogram('http_request_serialize_seconds', 'Time spent rendering the response.',
+                                   DURATION_BUCKETS),
+            'size': Histogram('http_response_size_bytes', 'Response body size (not streamed responses).',
+                              SIZE_BUCKETS),
+        }
+
+    def record(self, metrics, status_code):
+        labels = (metrics.view, metrics.method)
+        with self.lock:
+            self.requests.inc(labels + (str(status_code),))
+            if metrics.repeated:
+                self.n_plus_one.inc(labels)
+            self.histograms['duration'].observe(labels, metrics.duration)
+            self.histograms['queries'].observe(labels, metrics.query_count)
+            self.histograms['db_time'].observe(labels, metrics.query_time)
+            if metrics.serialize_time is not None:
+                self.histograms['serialize'].observe(labels, metrics.serialize_time)
+            if metrics.size is not None:
+                self.histograms['size'].observe(labels, metrics.size)
+
+    def render(self):
+        with self.lock:
+            lines = self.requests.render(self.LABELS + ('status',))
+            lines += self.n_plus_one.render(self.LABELS)
+            for histogram in self.histograms.values():
+                lines += histogram.render(self.LABELS)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class RequestMetrics:
+    """Measurements of a single request"""
+
+    def __init__(self, method):
+        self.method = method
+        self.view = 'unresolved'
+        self.start = time.perf_counter()
+        self.duration = 0.0
+        self.query_count = 0
+        self.query_time = 0.0
+        self.shapes = Counter()
+        self.repeated = None
+        self.render_start = None
+        self.serialize_time = None
+        self.size = None
+
+    def add_query(self, sql, elapsed):
+        self.query_count += 1
+        self.query_time += elapsed
+        self.shapes[PLACEHOLDER_LIST_RE.sub('%s, ...', sql)] += 1
+
+    def finish(self, request, response):
+        self.duration = time.perf_counter() - self.start
+        self.view = view_name(request)
+        if not response.streaming:
+            self.size = len(response.content)
+        threshold = get_n_plus_one_threshold()
+        if threshold and self.shapes:
+            sql, count = self.shapes.most_common(1)[0]
+            if count > threshold:
+                self.repeated = (sql, count)
+
+    def server_timing(self):
+        timings = [
+            f'db;dur={self.query_time * 1000:.1f};desc="{self.query_count} queries"',
+            f'total;dur={self.duration * 1000:.1f}',
+        ]
+        if self.serialize_time is not None:
+            timings.insert(1, f'serialize;dur={self.serialize_time * 1000:.1f}')
+        return ', '.join(timings)
+
+
+def record_query(execute, sql, params, many, context):
+    """Execute wrapper timing each query for the request in progress, if any"""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.add_query(sql, time.perf_counter() - start)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+def view_name(request):
+    """``ViewClass.action`` of a DRF view, or the name of a function view"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    view_class = getattr(func, 'cls', None)
+    if view_class is None:
+        return f'{func.__module__}.{func.__name__}'
+    actions = getattr(func, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class RequestMetricsMiddleware:
+    """Collect per-request metrics, add Server-Timing and feed the registry"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        connection_created.connect(on_connection_created, dispatch_uid='request_metrics')
+        # Connections opened before the middleware was loaded
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if request.path == METRICS_PATH:
+            return self.get_response(request)
+        metrics = RequestMetrics(request.method)
+        token = _current.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        if request.path == METRICS_PATH:
+            return await self.get_response(request)
+        metrics = RequestMetrics(request.method)
+        token = _current.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered (serialized to JSON) after the view returns
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.render_start = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self.rendered(metrics))
+        return response
+
+    def rendered(self, metrics):
+        metrics.serialize_time = time.perf_counter() - metrics.render_start
+
+    def finish(self, request, response, metrics):
+        metrics.finish(request, response)
+        response['Server-Timing'] = metrics.server_timing()
+        if metrics.repeated:
+            sql, count = metrics.repeated
+            logger.warning(
+                'Possible N+1 queries in %s %s (%s): statement run %d times: %s',
+                request.method, request.path, metrics.view, count, sql[:500],
+            )
+        registry.record(metrics, response.status_code)
+        return response
+
+
+def can_read_metrics(request):
+    """Whether the request may scrape /metrics: by bearer token, client address or staff user"""
+    token = getattr(settings, 'METRICS_BEARER_TOKEN', '')
+    if token and constant_time_compare(request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'):
+        return True
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', ()):
+        return True
+    return is_staff_request(request)
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint with the metrics of this process"""
+    if not can_read_metrics(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 from datetime import timedelta
 
@@ -48,12 +49,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Outermost, so its timings cover the rest of the stack
+    'employee_management.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'employees.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -82,12 +86,62 @@ WSGI_APPLICATION = 'employee_management.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The profile is selected with the DB_PROFILE environment variable:
+#   sqlite         - plain SQLite, a new connection per request (default)
+#   sqlite-tuned   - SQLite in WAL mode with persistent connections, busy
+#                    timeout and BEGIN IMMEDIATE writes for concurrent writers
+#   postgres       - PostgreSQL with persistent, health-checked connections;
+#                    set DB_POOLER=pgbouncer when connecting through PgBouncer
+#                    in transaction pooling mode
+
+DB_PROFILE = os.environ.get('DB_PROFILE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '60'))
+SQLITE_PATH = os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3')
+
+if DB_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'employee_management'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+    if os.environ.get('DB_POOLER') == 'pgbouncer':
+        # PgBouncer owns the pool; server-side cursors do not survive
+        # transaction pooling
+        DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = True
+elif DB_PROFILE == 'sqlite-tuned':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'employee_management.sqlite3',
+            'NAME': SQLITE_PATH,
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'timeout': 20,
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'busy_timeout': 20000,
+                    'mmap_size': 268435456,
+                    'cache_size': -20000,
+                    'temp_store': 'MEMORY',
+                },
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+        }
     }
-}
 
 
 # Password validation
@@ -143,7 +197,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES' :(
-         'rest_framework_simplejwt.authentication.JWTAuthentication',
+         'users.authentication.TokenUserAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -168,4 +222,62 @@ SIMPLE_JWT = {
 
 AUTH_USER_MODEL = 'users.User'
 
+# Seconds a user's active flag is cached by TokenUserAuthentication
+USERS_STATUS_CACHE_TTL = int(os.environ.get('USERS_STATUS_CACHE_TTL', 30))
+
+# Backend used for the ?search= parameter on /api/employees/records/:
+# substring matching over every field value. Word prefix search with typo
+# tolerance is available per request with ?search_mode=words
+EMPLOYEES_SEARCH_BACKEND = 'employees.search.SearchTextBackend'
+
+# Ranking weight of field labels in /records/suggest/ (default 1.0)
+EMPLOYEES_SEARCH_BOOSTS = {}
+
+# Caching
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Local memory by default; set REDIS_URL to share the cache between processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'employee-management',
+    }
+}
+
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Cache used for per-user employees data (see employees/cache.py). Each
+# worker process has its own LocMemCache and misses the invalidations of
+# writes served by the others, so entries in it only live
+# EMPLOYEES_LOCAL_CACHE_TIMEOUT seconds; a shared cache uses the full timeout.
+EMPLOYEES_CACHE_ALIAS = 'default'
+EMPLOYEES_CACHE_TIMEOUT = 300
+EMPLOYEES_LOCAL_CACHE_TIMEOUT = 5
+
+# Limits for POST /api/employees/records/bulk/
+EMPLOYEES_BULK_MAX_RECORDS = 10000
+EMPLOYEES_BULK_BATCH_SIZE = 500
+
+# Requests running one SQL statement more often than this are logged as
+# possible N+1 queries by employee_management.metrics (0 disables)
+METRICS_N_PLUS_ONE_THRESHOLD = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', 10))
+
+# GET /metrics is only served to staff users, to clients in METRICS_ALLOWED_IPS
+# (comma separated) and to requests sending "Authorization: Bearer <token>"
+# with METRICS_BEARER_TOKEN (empty disables the token)
+METRICS_ALLOWED_IPS = [ip.strip() for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()]
+METRICS_BEARER_TOKEN = os.environ.get('METRICS_BEARER_TOKEN', '')
+
+# Request profiling (employees/profiling.py): requests running longer than
+# this many seconds are sampled (0 disables); staff can profile any request
+# with an X-Profile header. Profiles are listed in the admin.
+PROFILER_SLOW_REQUEST_SECONDS = float(os.environ.get('PROFILER_SLOW_REQUEST_SECONDS', 1.0))
+PROFILER_SAMPLE_INTERVAL = 0.005
+PROFILER_BUFFER_SIZE = 50
+PROFILER_TOP_STACKS = 20
+
 CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
@@ -0,0 +1,25 @@
+"""SQLite backend tuned for concurrent writers.
+
+Applies the PRAGMAs listed in ``OPTIONS['pragmas']`` to every new
+connection and starts transactions with ``BEGIN IMMEDIATE`` so that a
+writer waits on ``busy_timeout`` for the lock up front, instead of failing
+with "database is locked" when a read transaction later tries to write.
+"""
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for pragma, value in self.settings_dict['OPTIONS'].get('pragmas', {}).items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
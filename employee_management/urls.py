@@ -19,10 +19,12 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import TemplateView
+from .metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/users/', include('users.urls')),
     path('api/employees/', include('employees.urls')),
+    path('metrics', metrics_view, name='metrics'),
     path('', TemplateView.as_view(template_name='index.html'), name='home'),
 ]
\ No newline at end of file
@@ -1,5 +1,9 @@
 from django.contrib import admin
-from .models import DynamicForm, FormField, Employee
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from .models import DynamicForm, FormField, Employee, RequestProfile
+from .profiling import clear_profiles, get_profiles, get_slow_request_seconds
 
 
 # Inline FormField inside DynamicForm
@@ -45,4 +49,34 @@ class EmployeeAdmin(admin.ModelAdmin):
     readonly_fields = (
         'created_at',
         'updated_at',
-    )
\ No newline at end of file
+    )
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Lists the profiles of this process's ring buffer instead of table rows"""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if request.method == 'POST' and 'clear' in request.POST:
+            clear_profiles()
+            return HttpResponseRedirect(request.path)
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': 'Request profiles',
+            'profiles': get_profiles(),
+            'slow_request_seconds': get_slow_request_seconds(),
+            **(extra_context or {}),
+        }
+        return TemplateResponse(request, 'admin/employees/requestprofile/change_list.html', context)
@@ -0,0 +1,145 @@
+"""Async variants of the records endpoints.
+
+These are plain Django async views rather than DRF viewsets (DRF views are
+synchronous), built on the async ORM. Under the ASGI application a slow
+search or a long export then waits on the database without holding a
+worker thread. Filtering is shared with EmployeeViewSet through
+``filter_employees``.
+"""
+from asgiref.sync import sync_to_async
+import functools
+from django.http import HttpResponseNotAllowed, JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import ValidationError
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from users.authentication import ais_user_active
+from .exporter import EXPORT_FORMATS, export_columns, export_response
+from .field_keys import field_label_maps
+from .filters import filter_employees
+from .serializers import EmployeeSerializer
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_CHUNK_SIZE = 2000
+
+_jwt = JWTStatelessUserAuthentication()
+
+
+async def authenticate(request):
+    """Return a TokenUser for the request's active Bearer token, or None"""
+    header = _jwt.get_header(request)
+    raw_token = _jwt.get_raw_token(header) if header is not None else None
+    if raw_token is None:
+        return None
+    try:
+        token = _jwt.get_validated_token(raw_token)
+        user = _jwt.get_user(token)
+    except InvalidToken:
+        return None
+    # Same cheap check as TokenUserAuthentication: no user row per request
+    if not await ais_user_active(user.id):
+        return None
+    return user
+
+
+def require_get(view):
+    """Async-compatible require_GET (Django 4.2's decorator is sync only)"""
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def unauthorized():
+    return JsonResponse(
+        {'detail': 'Authentication credentials were not provided or are invalid.'}, status=401
+    )
+
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def record_serializer(field_labels):
+    # Rows never embed the form schema and field labels are loaded up front,
+    # so serializing makes no queries
+    return EmployeeSerializer(context={'include_form_fields': False, 'field_labels': field_labels})
+
+
+def parse_int(value, default, maximum=None):
+    try:
+        number = max(0, int(value)) if value is not None else default
+    except ValueError:
+        raise ValidationError({'detail': f'"{value}" is not a valid integer.'})
+    return min(number, maximum) if maximum is not None else number
+
+
+@require_get
+async def record_list(request):
+    """List or search records with ``limit``/``offset`` and a total ``count``"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    try:
+        queryset = await sync_to_async(filter_employees)(user, request.GET)
+        queryset = queryset.select_related('form', 'created_by')
+        limit = parse_int(request.GET.get('limit'), DEFAULT_LIMIT, MAX_LIMIT)
+        offset = parse_int(request.GET.get('offset'), 0)
+        count = await queryset.acount()
+        serializer = record_serializer(await sync_to_async(field_label_maps)(user))
+        results = [
+            serializer.to_representation(employee)
+            async for employee in queryset[offset:offset + limit]
+        ]
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    return json_response({'count': count, 'results': results})
+
+
+async def aiter_json_array(queryset, serializer):
+    encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    yield '['
+    first = True
+    async for employee in queryset.aiterator(chunk_size=STREAM_CHUNK_SIZE):
+        yield ('' if first else ',') + encode(serializer.to_representation(employee))
+        first = False
+    yield ']'
+
+
+@require_get
+async def record_stream(request):
+    """Stream every matching record as a JSON array"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    try:
+        queryset = await sync_to_async(filter_employees)(user, request.GET)
+        queryset = queryset.select_related('form', 'created_by')
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    serializer = record_serializer(await sync_to_async(field_label_maps)(user))
+    response = StreamingHttpResponse(aiter_json_array(queryset, serializer), content_type='application/json')
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_get
+async def record_export(request):
+    """Stream matching records as CSV or NDJSON (?format=csv|ndjson)"""
+    user = await authenticate(request)
+    if user is None:
+        return unauthorized()
+    file_format = request.GET.get('format', 'csv')
+    if file_format not in EXPORT_FORMATS:
+        return json_response({'format': f'Must be one of: {", ".join(EXPORT_FORMATS)}'}, status=400)
+    try:
+        queryset = await sync_to_async(filter_employees)(user, request.GET)
+    except ValidationError as e:
+        return json_response(e.detail, status=400)
+    form_id = request.GET.get('form_id')
+    columns = await sync_to_async(export_columns)(user, form_id)
+    labels = await sync_to_async(field_label_maps)(user, form_id)
+    return export_response(queryset, columns, labels, file_format, chunk_size=STREAM_CHUNK_SIZE, asynchronous=True)
@@ -0,0 +1,95 @@
+"""Helpers shared by the benchmark management commands."""
+import time
+from datetime import date, timedelta
+from rest_framework_simplejwt.tokens import RefreshToken
+
+FIRST_NAMES = ['Anna', 'John', 'Priya', 'Rahul', 'Maria', 'David', 'Fatima', 'Chen', 'Olivia', 'Arjun', 'Sara', 'Lucas']
+LAST_NAMES = ['Smith', 'Kumar', 'Garcia', 'Nair', 'Brown', 'Wang', 'Menon', 'Johnson', 'Lopez', 'Das', 'Miller', 'Khan']
+WORDS = ['reliable', 'team', 'player', 'remote', 'senior', 'junior', 'mentor', 'customer', 'focused', 'certified']
+FIRST_DATE = date(2015, 1, 1)
+
+# A form with one field of every type, as created by seed_employees
+SEED_FIELDS = [
+    {'label': 'Full Name', 'field_type': 'text', 'is_required': True},
+    {'label': 'Salary', 'field_type': 'number', 'is_required': True},
+    {'label': 'Joining Date', 'field_type': 'date', 'is_required': True},
+    {'label': 'Password', 'field_type': 'password'},
+    {'label': 'Email', 'field_type': 'email', 'is_required': True},
+    {'label': 'Bio', 'field_type': 'textarea'},
+    {'label': 'Skills', 'field_type': 'checkbox', 'options': ['Python', 'Django', 'SQL', 'React', 'Docker', 'Excel']},
+    {'label': 'Gender', 'field_type': 'radio', 'options': ['Male', 'Female', 'Other']},
+    {'label': 'Department', 'field_type': 'select', 'is_required': True,
+     'options': ['Engineering', 'Sales', 'HR', 'Finance', 'Support', 'Marketing']},
+]
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency summary for a list of per-request seconds"""
+    return {
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'requests_per_second': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def fake_value(rng, field_type, options=None, key=0):
+    """A random value that passes validation for a field; key keeps emails unique"""
+    if field_type == 'number':
+        return rng.randrange(20000, 200000, 500)
+    if field_type == 'date':
+        return (FIRST_DATE + timedelta(days=rng.randrange(3650))).isoformat()
+    if field_type == 'password':
+        return f'secret-{rng.randrange(10 ** 6)}'
+    if field_type == 'email':
+        return f'{rng.choice(FIRST_NAMES).lower()}.{key}@example.com'
+    if field_type == 'textarea':
+        return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(3, 12)))
+    if options and field_type == 'checkbox':
+        return rng.sample(options, rng.randint(1, min(3, len(options))))
+    if options and field_type in ('radio', 'select', 'checkbox'):
+        return rng.choice(options)
+    return f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+
+
+def fake_record(rng, fields, key=0):
+    """Data for a record of a form with the given fields (FormFields or dicts).
+
+    Optional fields are left out now and then, as in real records.
+    """
+    data = {}
+    for field in fields:
+        if not isinstance(field, dict):
+            field = {'label': field.label, 'field_type': field.field_type,
+                     'is_required': field.is_required, 'options': field.options}
+        if not field.get('is_required') and rng.random() < 0.2:
+            continue
+        options = field.get('options') if isinstance(field.get('options'), list) else None
+        data[field['label']] = fake_value(rng, field['field_type'], options, key)
+    return data
+
+
+def access_token(user):
+    """A fresh JWT access token for user"""
+    return str(RefreshToken.for_user(user).access_token)
+
+
+class Timer:
+    """Context manager measuring elapsed wall-clock seconds"""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.elapsed = time.perf_counter() - self.start
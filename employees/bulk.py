@@ -0,0 +1,150 @@
+from collections import Counter
+from django.db import transaction
+from django.db.models.deletion import Collector
+from django.utils import timezone
+from .cache import bump_generation_on_commit
+from .form_stats import apply_bulk_stats, remember_state
+from .indexing import reindex_employees
+from .models import DynamicForm, Employee
+from .search import build_search_text
+from .search_index import prune_deleted_tokens
+from .validation import get_compiled_form
+
+
+def load_compiled_forms(user, form_ids):
+    """Load the user's forms with their fields in two queries and compile them"""
+    forms = DynamicForm.objects.filter(id__in=set(form_ids), created_by_id=user.id).prefetch_related('fields')
+    return {form.pk: get_compiled_form(form) for form in forms}
+
+
+def save_records(new, changed, compiled_forms, batch_size=500):
+    """Insert and update Employee instances in batches and index them.
+
+    Runs ``bulk_create``/``bulk_update`` so model save() is bypassed; the
+    derived search text, updated_at, field value index and form stats are
+    maintained here.
+    """
+    now = timezone.now()
+    for employee in new:
+        employee.search_text = build_search_text(employee.data)
+    for employee in changed:
+        employee.search_text = build_search_text(employee.data)
+        employee.updated_at = now
+
+    with transaction.atomic():
+        Employee.objects.bulk_create(new, batch_size=batch_size)
+        Employee.objects.bulk_update(
+            changed, ['form', 'data', 'search_text', 'updated_at'], batch_size=batch_size
+        )
+        fields_by_form = {form_id: compiled.fields for form_id, compiled in compiled_forms.items()}
+        reindex_employees(new + changed, batch_size=batch_size, fields_by_form=fields_by_form)
+        # bulk_create/bulk_update send no signals, so update stats and invalidate caches here
+        apply_bulk_stats(new, changed, compiled_forms)
+        for user_id in {employee.created_by_id for employee in new + changed}:
+            bump_generation_on_commit(user_id, 'records')
+
+
+def delete_records(queryset):
+    """Delete records with one stats delta and cache bump per form.
+
+    The records are loaded once and deleted through a Collector over those
+    instances, so the per-record signal path (a stats update per row) is
+    skipped. Returns the number of records deleted.
+    """
+    employees = list(queryset)
+    if not employees:
+        return 0
+    forms = DynamicForm.objects.filter(pk__in={e.form_id for e in employees}).prefetch_related('fields')
+    compiled_forms = {form.pk: get_compiled_form(form) for form in forms}
+    for employee in employees:
+        employee._bulk_deleted = True
+
+    with transaction.atomic():
+        collector = Collector(using=queryset.db, origin=queryset)
+        collector.collect(employees)
+        collector.delete()
+        apply_bulk_stats([], [], compiled_forms, deleted=employees)
+        prune_deleted_tokens(employees, {form_id: compiled.fields for form_id, compiled in compiled_forms.items()})
+        for user_id in {employee.created_by_id for employee in employees}:
+            bump_generation_on_commit(user_id, 'records')
+    return len(employees)
+
+
+def bulk_write_records(user, records, batch_size=500):
+    """Validate and save a list of record payloads for user.
+
+    Each payload is ``{"form": <id>, "data": {...}}`` plus an optional
+    ``"id"`` to update an existing record. Valid rows are saved in a single
+    transaction; invalid rows are returned with their errors. Rows sharing
+    an id are all rejected, since which of them should win is ambiguous.
+    """
+    id_counts = Counter(
+        record['id'] for record in records if isinstance(record, dict) and isinstance(record.get('id'), int)
+    )
+    errors = []
+    rows = []
+    for index, record in enumerate(records):
+        if not isinstance(record, dict):
+            errors.append({'index': index, 'errors': {'non_field_errors': 'Expected an object.'}})
+            continue
+        form_id = record.get('form')
+        data = record.get('data')
+        row_errors = {}
+        if not isinstance(form_id, int) or isinstance(form_id, bool):
+            row_errors['form'] = 'A valid form id is required.'
+        if not isinstance(data, dict):
+            row_errors['data'] = 'Expected an object of field values.'
+        if 'id' in record and (not isinstance(record['id'], int) or isinstance(record['id'], bool)):
+            row_errors['id'] = 'A valid record id is required.'
+        elif id_counts[record.get('id')] > 1:
+            row_errors['id'] = 'This record id is sent more than once.'
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+        rows.append((index, record))
+
+    compiled_forms = load_compiled_forms(user, [record['form'] for _, record in rows])
+    existing = Employee.objects.filter(
+        created_by_id=user.id, id__in=[record['id'] for _, record in rows if 'id' in record]
+    ).in_bulk()
+
+    new, changed, results = [], [], []
+    for index, record in rows:
+        compiled = compiled_forms.get(record['form'])
+        if compiled is None:
+            errors.append({'index': index, 'errors': {'form': 'Form not found.'}})
+            continue
+        row_errors = compiled.validate(record['data'])
+        if row_errors:
+            errors.append({'index': index, 'errors': row_errors})
+            continue
+
+        if 'id' in record:
+            employee = existing.get(record['id'])
+            if employee is None:
+                errors.append({'index': index, 'errors': {'id': 'Record not found.'}})
+                continue
+            remember_state(employee)
+            employee.form_id = record['form']
+            employee.data = compiled.to_storage(record['data'])
+            changed.append(employee)
+            results.append((index, employee, 'updated'))
+        else:
+            employee = Employee(form_id=record['form'], created_by_id=user.id, data=compiled.to_storage(record['data']))
+            new.append(employee)
+            results.append((index, employee, 'created'))
+
+    if new or changed:
+        save_records(new, changed, compiled_forms, batch_size=batch_size)
+
+    errors.sort(key=lambda error: error['index'])
+    return {
+        'created': len(new),
+        'updated': len(changed),
+        'failed': len(errors),
+        'results': [
+            {'index': index, 'id': employee.pk, 'status': status}
+            for index, employee, status in results
+        ],
+        'errors': errors,
+    }
@@ -0,0 +1,116 @@
+import hashlib
+import json
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def get_cache():
+    """Return the cache used for employees data (EMPLOYEES_CACHE_ALIAS)"""
+    return caches[getattr(settings, 'EMPLOYEES_CACHE_ALIAS', 'default')]
+
+
+def get_cache_timeout():
+    """Lifetime of cached entries and generation counters, in seconds.
+
+    A per-process cache (LocMemCache) never sees the generation bumps of
+    writes served by other worker processes, so it is held to the short
+    EMPLOYEES_LOCAL_CACHE_TIMEOUT; bounding generations as well keeps it
+    from serving another process's stale data for longer than that.
+    """
+    timeout = getattr(settings, 'EMPLOYEES_CACHE_TIMEOUT', 300)
+    if isinstance(get_cache(), LocMemCache):
+        timeout = min(timeout, getattr(settings, 'EMPLOYEES_LOCAL_CACHE_TIMEOUT', 5))
+    return timeout
+
+
+def generation_key(user_id, scope):
+    return f'employees:gen:{scope}:{user_id}'
+
+
+def get_generation(user_id, scope):
+    """Return the current cache generation of a user's data in scope.
+
+    Generations start from the current time in milliseconds, so a counter
+    that was evicted never reuses a value older cache entries were keyed by.
+    """
+    cache = get_cache()
+    key = generation_key(user_id, scope)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, int(time.time() * 1000), timeout=get_cache_timeout())
+        generation = cache.get(key)
+    return generation
+
+
+def bump_generation(user_id, scope):
+    """Invalidate every cached value derived from a user's data in scope"""
+    cache = get_cache()
+    key = generation_key(user_id, scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), timeout=get_cache_timeout())
+
+
+def bump_generation_on_commit(user_id, scope):
+    """Bump once the current transaction commits, so no reader can cache
+    pre-commit data under the new generation"""
+    transaction.on_commit(lambda: bump_generation(user_id, scope))
+
+
+def etag_matches(request, etag):
+    """Whether the request's If-None-Match header matches etag"""
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return etag in [tag.strip() for tag in header.split(',')] or header.strip() == '*'
+
+
+class CachedResponseMixin:
+    """Cache list/retrieve responses per user, query string and generation.
+
+    The cache key includes the user's generation for each scope in
+    ``cache_scopes``, which signals bump whenever the underlying rows
+    change. Responses carry an ETag hashed from their body, stored with the
+    cached entry, and a matching If-None-Match is answered with 304.
+    """
+    cache_scopes = ()
+
+    def compute_etag(self, data):
+        # Derived from the body rather than the generations, which a
+        # per-process cache cannot keep in step with other workers' writes
+        body = json.dumps(data, cls=JSONEncoder, separators=(',', ':'))
+        return f'"{hashlib.md5(body.encode("utf-8")).hexdigest()}"'
+
+    def cached_response(self, request, view_func, *args, **kwargs):
+        user_id = request.user.id
+        generations = '-'.join(str(get_generation(user_id, scope)) for scope in self.cache_scopes)
+        # Paginated bodies hold absolute next/first links, so the host is part of the key
+        digest = hashlib.md5(request.build_absolute_uri().encode('utf-8')).hexdigest()
+        key = f'employees:response:{self.basename}:{self.action}:{user_id}:{generations}:{digest}'
+
+        cache = get_cache()
+        entry = cache.get(key)
+        if entry is None:
+            response = view_func(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = {'etag': self.compute_etag(response.data), 'data': response.data}
+            cache.set(key, entry, timeout=get_cache_timeout())
+        if etag_matches(request, entry['etag']):
+            return self.not_modified(entry['etag'])
+
+        response = Response(entry['data'])
+        response['ETag'] = entry['etag']
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def not_modified(self, etag):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,131 @@
+import csv
+import json
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+from .importer import CHECKBOX_SEPARATOR
+from .models import FormField
+from .validation import relabel
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+# Record metadata columns written before the form's field columns
+META_COLUMNS = ('record_id', 'form_id', 'created_at', 'updated_at')
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """File-like object that returns what is written, for csv.writer"""
+
+    def write(self, value):
+        return value
+
+
+def export_columns(user, form_id=None):
+    """Field labels to export, ordered by form and FormField.order"""
+    fields = FormField.objects.filter(form__created_by_id=user.id)
+    if form_id:
+        fields = fields.filter(form_id=form_id)
+    labels = fields.order_by('-form__created_at', 'form_id', 'order').values_list('label', flat=True)
+    return list(dict.fromkeys(labels))
+
+
+def cell(value):
+    """Flatten a single data value into a CSV cell"""
+    if value is None:
+        return ''
+    if isinstance(value, list):
+        return CHECKBOX_SEPARATOR.join(str(v) for v in value)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return value
+
+
+EXPORT_ROW_FIELDS = ('id', 'form_id', 'created_at', 'updated_at', 'data')
+
+
+def export_rows(queryset):
+    """(id, form_id, created_at, updated_at, data) tuples for each record"""
+    return queryset.values_list(*EXPORT_ROW_FIELDS)
+
+
+def csv_header(writer, columns):
+    return writer.writerow(list(META_COLUMNS) + columns)
+
+
+def row_data(form_id, data, labels):
+    """A row's stored data keyed by label; labels is {form id: {key: label}}"""
+    return relabel(data or {}, labels.get(form_id, {}))
+
+
+def csv_line(writer, row, columns, labels):
+    pk, form_id, created_at, updated_at, data = row
+    data = row_data(form_id, data, labels)
+    return writer.writerow(
+        [pk, form_id, created_at.isoformat(), updated_at.isoformat()]
+        + [cell(data.get(label)) for label in columns]
+    )
+
+
+def ndjson_line(encode, row, columns, labels):
+    pk, form_id, created_at, updated_at, data = row
+    data = row_data(form_id, data, labels)
+    item = {'record_id': pk, 'form_id': form_id, 'created_at': created_at, 'updated_at': updated_at}
+    item.update((label, data[label]) for label in columns if label in data)
+    return encode(item) + '\n'
+
+
+def line_formatter(file_format, columns, labels):
+    """Return (header, format_row) for an export format"""
+    if file_format == 'csv':
+        writer = csv.writer(Echo())
+        return csv_header(writer, columns), lambda row: csv_line(writer, row, columns, labels)
+    encode = JSONEncoder(ensure_ascii=False).encode
+    return '', lambda row: ndjson_line(encode, row, columns, labels)
+
+
+def iter_export(queryset, columns, labels, file_format, chunk_size=2000):
+    """Yield the export body in buffered chunks"""
+    header, format_row = line_formatter(file_format, columns, labels)
+    if header:
+        yield header
+    buffer = []
+    for row in export_rows(queryset).iterator(chunk_size=chunk_size):
+        buffer.append(format_row(row))
+        if len(buffer) >= 500:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+async def aiter_export(queryset, columns, labels, file_format, chunk_size=2000):
+    """Async variant of iter_export built on QuerySet.aiterator()"""
+    header, format_row = line_formatter(file_format, columns, labels)
+    if header:
+        yield header
+    buffer = []
+    # values() rather than values_list(): on Django 4.2 values_list().aiterator()
+    # runs its query synchronously in the event loop
+    async for row in queryset.values(*EXPORT_ROW_FIELDS).aiterator(chunk_size=chunk_size):
+        buffer.append(format_row(tuple(row[name] for name in EXPORT_ROW_FIELDS)))
+        if len(buffer) >= 500:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def export_response(queryset, columns, labels, file_format, chunk_size=2000, asynchronous=False):
+    """Stream records as a CSV or NDJSON attachment.
+
+    labels maps each form id to its {field key: label}, see field_label_maps.
+    """
+    iterate = aiter_export if asynchronous else iter_export
+    response = StreamingHttpResponse(
+        iterate(queryset, columns, labels, file_format, chunk_size), content_type=EXPORT_CONTENT_TYPES[file_format]
+    )
+    response['Content-Disposition'] = f'attachment; filename="employees.{file_format}"'
+    response['Cache-Control'] = 'no-store'
+    return response
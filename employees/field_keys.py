@@ -0,0 +1,89 @@
+"""Stable field keys for Employee.data.
+
+Records of forms with ``schema_version`` LABEL_KEYED store their values
+under the field labels, so renaming a field orphans its values. ID_KEYED
+forms (every new form) store them under the field id (as a string),
+and a rename only changes the key -> label map. The API keeps sending and
+returning label-keyed data: CompiledForm.to_storage and to_labels translate,
+using the per-process compiled form as the cached key -> label map.
+
+``migrate_form_keys`` switches an existing form to ID_KEYED and then
+rewrites its records in chunks; until it is done, CompiledField.value()
+reads a record under either key.
+"""
+from django.db import transaction
+from django.utils import timezone
+from .cache import bump_generation_on_commit
+from .models import DynamicForm, Employee
+from .validation import get_compiled_form, invalidate_compiled_form
+
+
+def field_label_maps(user, form_id=None):
+    """{form id: {key: label}} for every form of the user, in one query.
+
+    Forms without fields map to an empty dict. Passed to EmployeeSerializer
+    as ``field_labels`` where the compiled forms cannot be loaded lazily,
+    such as in async views.
+    """
+    forms = DynamicForm.objects.filter(created_by_id=user.id)
+    if form_id:
+        forms = forms.filter(pk=form_id)
+    maps = {}
+    # The outer join yields (form id, None, None) for a form without fields
+    for field_form_id, field_id, label in forms.order_by().values_list('pk', 'fields__id', 'fields__label'):
+        labels = maps.setdefault(field_form_id, {})
+        if field_id is not None:
+            labels[str(field_id)] = label
+    return maps
+
+
+def rekey(data, compiled):
+    """Stored data of a record rewritten under the form's field keys"""
+    if not isinstance(data, dict):
+        return data
+    keys = compiled.keys_by_label
+    rekeyed = {}
+    for key, value in data.items():
+        field_key = keys.get(key, key)
+        # A value already stored under the field key is the newer one
+        if field_key != key and field_key in data:
+            continue
+        rekeyed[field_key] = value
+    return rekeyed
+
+
+def migrate_form_keys(form, batch_size=1000):
+    """Switch form to ID_KEYED and rewrite its records; returns the number rewritten"""
+    if form.schema_version < DynamicForm.ID_KEYED:
+        # Touching updated_at makes every process recompile the form
+        DynamicForm.objects.filter(pk=form.pk).update(
+            schema_version=DynamicForm.ID_KEYED, updated_at=timezone.now()
+        )
+        invalidate_compiled_form(form.pk)
+        bump_generation_on_commit(form.created_by_id, 'forms')
+    form = DynamicForm.objects.prefetch_related('fields').get(pk=form.pk)
+    compiled = get_compiled_form(form)
+
+    rewritten = 0
+    last_pk = 0
+    while True:
+        # Locked until rewritten, so a record saved meanwhile is not overwritten
+        # with its old values
+        with transaction.atomic():
+            batch = list(
+                Employee.objects.select_for_update().filter(form_id=form.pk, pk__gt=last_pk)
+                .order_by('pk').only('pk', 'data')[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1].pk
+            changed = []
+            for employee in batch:
+                data = rekey(employee.data, compiled)
+                if data != employee.data:
+                    employee.data = data
+                    changed.append(employee)
+            # The values are unchanged, so the search text, indexes and stats stay valid
+            Employee.objects.bulk_update(changed, ['data'], batch_size=batch_size)
+        rewritten += len(changed)
+    return rewritten
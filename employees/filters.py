@@ -0,0 +1,111 @@
+from django.db.models import Exists, OuterRef
+from rest_framework.exceptions import ValidationError
+from .indexing import parse_date, parse_number
+from .models import Employee, EmployeeFieldValue
+from .ordering import candidate_labels, data_fields, order_employees, sort_column
+from .search import get_search_backend
+
+FIELD_FILTER_PREFIX = 'field_'
+RANGE_OPERATORS = ('gte', 'lte', 'gt', 'lt', 'between')
+
+
+def parse_field_filter(key):
+    """Split a ``field_<label>[__<op>]`` query param into (label, operator).
+
+    Underscores in the label may stand for spaces (see ``candidate_labels``).
+    """
+    name = key[len(FIELD_FILTER_PREFIX):]
+    operator = 'contains'
+    if '__' in name:
+        head, _, tail = name.rpartition('__')
+        if tail in RANGE_OPERATORS:
+            name, operator = head, tail
+    return name, operator
+
+
+# Parser of range operands for each typed EmployeeFieldValue column
+RANGE_PARSERS = {
+    'numeric_value': (parse_number, 'number'),
+    'date_value': (parse_date, 'date'),
+}
+
+
+def range_column(key, user, label, form_id=None):
+    """Return (typed column, field ids) of the number or date fields a range filter targets"""
+    fields = data_fields(user, label, form_id, param=key)
+    column = sort_column(field.field_type for field in fields)
+    if column not in RANGE_PARSERS:
+        raise ValidationError({key: 'Range filters need a number or date field.'})
+    return column, [field.id for field in fields]
+
+
+def parse_operand(key, column, operand):
+    """Parse a range operand as the field's type, rejecting anything else"""
+    parse, type_name = RANGE_PARSERS[column]
+    value = parse(operand)
+    if value is None:
+        raise ValidationError({key: f'"{operand}" is not a valid {type_name}.'})
+    return value
+
+
+def field_value_condition(key, value, user, form_id=None):
+    """Build the EmployeeFieldValue lookups for a single field filter.
+
+    Range operators compare the typed column of the field's type, looked up
+    from its FormField, so the operand must parse as that type.
+    """
+    label, operator = parse_field_filter(key)
+    if operator == 'contains':
+        return {'form_field__label__in': candidate_labels(label), 'normalized_value__contains': value.lower()}
+
+    column, field_ids = range_column(key, user, label, form_id)
+    lookups = {'form_field_id__in': field_ids}
+    if operator == 'between':
+        bounds = [part.strip() for part in value.split(',')]
+        if len(bounds) != 2:
+            raise ValidationError({key: 'Expected two comma separated values.'})
+        lookups[f'{column}__range'] = tuple(parse_operand(key, column, bound) for bound in bounds)
+    else:
+        lookups[f'{column}__{operator}'] = parse_operand(key, column, value)
+    return lookups
+
+
+def apply_field_filters(queryset, query_params, user, form_id=None):
+    """Apply every ``field_<label>`` query param as an indexed EXISTS join"""
+    for key, value in query_params.items():
+        if not key.startswith(FIELD_FILTER_PREFIX):
+            continue
+        matches = EmployeeFieldValue.objects.filter(
+            employee=OuterRef('pk'), **field_value_condition(key, value, user, form_id)
+        )
+        queryset = queryset.filter(Exists(matches))
+    return queryset
+
+
+def filter_employees(user, query_params):
+    """Return the user's employees filtered and ordered by the list query params.
+
+    Shared by the DRF viewset and the async views so both honour the same
+    ``ordering``, ``form_id``, ``search``, ``search_mode`` and ``field_`` parameters.
+    """
+    # Filter to only show employees created by the user
+    queryset = Employee.objects.filter(created_by_id=user.id)
+
+    # Filter by form (only user's own forms)
+    form_id = query_params.get('form_id', None)
+    if form_id:
+        queryset = queryset.filter(form_id=form_id)
+
+    # Apply ordering (default to most recent first); data.<label> sorts by a field
+    ordering = query_params.get('ordering') or '-created_at'
+    queryset = order_employees(queryset, user, ordering, form_id)
+
+    # Search across all dynamic field values in the database
+    # (search_mode=words searches the token index instead)
+    search = query_params.get('search', None)
+    if search:
+        backend = get_search_backend(query_params.get('search_mode'))
+        queryset = backend.filter(queryset, search, user=user)
+
+    # Filter by specific dynamic fields (field_<label>, field_<label>__gte, ...)
+    return apply_field_filters(queryset, query_params, user, form_id)
@@ -0,0 +1,237 @@
+"""Incremental maintenance of FormStats.
+
+Every record change is turned into a delta (record count, option counts,
+latest record time) that is applied to the form's FormStats row under a row
+lock, so concurrent writers do not lose updates. Signals handle single
+records; bulk writes and deletes bypass them and apply one combined delta
+per form. Records deleted along with their form or owner are skipped, as
+the stats row goes with the form.
+"""
+from collections import Counter, defaultdict
+from django.db import transaction
+from django.db.models import Count, Max
+from .models import DynamicForm, Employee, EmployeeFieldValue, FormStats
+from .validation import get_compiled_form
+
+CHOICE_FIELD_TYPES = ('select', 'radio')
+
+
+def choice_fields(compiled):
+    return [field for field in compiled.fields if field.field_type in CHOICE_FIELD_TYPES]
+
+
+def choice_values(fields, data):
+    """The chosen option of each choice field present in stored data, by label"""
+    data = data if isinstance(data, dict) else {}
+    values = {}
+    for field in fields:
+        value = field.value(data, None)
+        if value not in (None, ''):
+            values[field.label] = str(value)
+    return values
+
+
+class StatsDelta:
+    """Pending change to one form's FormStats"""
+
+    def __init__(self):
+        self.count = 0
+        self.options = defaultdict(Counter)
+        self.last_record_at = None
+        self.removed_latest_at = None
+
+    def add(self, fields, data, created_at=None):
+        self.count += 1
+        for label, option in choice_values(fields, data).items():
+            self.options[label][option] += 1
+        if created_at and (self.last_record_at is None or created_at > self.last_record_at):
+            self.last_record_at = created_at
+
+    def remove(self, fields, data, created_at=None):
+        self.count -= 1
+        for label, option in choice_values(fields, data).items():
+            self.options[label][option] -= 1
+        if created_at and (self.removed_latest_at is None or created_at > self.removed_latest_at):
+            self.removed_latest_at = created_at
+
+
+def apply_delta(form_id, delta):
+    """Apply a delta to the form's stats row, creating it if needed"""
+    # Joins the caller's transaction, so a record save pays for no savepoint
+    with transaction.atomic(savepoint=False):
+        stats = FormStats.objects.select_for_update().filter(form_id=form_id).first()
+        if stats is None:
+            if not DynamicForm.objects.filter(pk=form_id).exists():
+                # The form itself is being deleted
+                return
+            stats, _ = FormStats.objects.get_or_create(form_id=form_id)
+
+        stats.record_count = max(0, stats.record_count + delta.count)
+        for label, changes in delta.options.items():
+            counts = stats.option_counts.setdefault(label, {})
+            for option, change in changes.items():
+                total = counts.get(option, 0) + change
+                if total > 0:
+                    counts[option] = total
+                else:
+                    counts.pop(option, None)
+            if not counts:
+                del stats.option_counts[label]
+
+        if delta.last_record_at and (stats.last_record_at is None or delta.last_record_at > stats.last_record_at):
+            stats.last_record_at = delta.last_record_at
+        elif delta.removed_latest_at and stats.last_record_at and delta.removed_latest_at >= stats.last_record_at:
+            stats.last_record_at = Employee.objects.filter(form_id=form_id).aggregate(last=Max('created_at'))['last']
+        stats.save()
+
+
+def loaded_state(employee):
+    """(form id, data) as stored before the pending write, if known"""
+    return getattr(employee, '_loaded_state', None)
+
+
+def remember_state(employee):
+    """Keep the current form and data as the stored state (call before changing them)"""
+    data = employee.data
+    employee._loaded_state = (employee.form_id, dict(data) if isinstance(data, dict) else data)
+
+
+def saves_data(update_fields):
+    """Whether a save with these update_fields can change a record's form or data"""
+    return update_fields is None or bool({'form', 'form_id', 'data'} & set(update_fields))
+
+
+def capture_state(employee, update_fields=None):
+    """Read the stored form and data of a record about to be updated.
+
+    Called at save time rather than when records are loaded, so reads
+    (lists, streams) do not copy every record's data.
+    """
+    if employee._state.adding or employee.pk is None or loaded_state(employee) is not None:
+        return
+    if not saves_data(update_fields):
+        return
+    employee._loaded_state = Employee.objects.filter(pk=employee.pk).values_list('form_id', 'data').first()
+
+
+def record_saved(employee, created):
+    fields = choice_fields(get_compiled_form(employee.form))
+    previous = loaded_state(employee)
+    remember_state(employee)
+    if created:
+        delta = StatsDelta()
+        delta.add(fields, employee.data, employee.created_at)
+        apply_delta(employee.form_id, delta)
+        return
+    if previous is None:
+        # Not loaded from the database, so its old values are unknown
+        return
+    old_form_id, old_data = previous
+    if old_form_id == employee.form_id:
+        if choice_values(fields, old_data) == choice_values(fields, employee.data):
+            return
+        delta = StatsDelta()
+        delta.remove(fields, old_data)
+        delta.add(fields, employee.data)
+        apply_delta(employee.form_id, delta)
+        return
+    # Moved to another form
+    old_form = DynamicForm.objects.filter(pk=old_form_id).prefetch_related('fields').first()
+    if old_form is not None:
+        removed = StatsDelta()
+        removed.remove(choice_fields(get_compiled_form(old_form)), old_data, employee.created_at)
+        apply_delta(old_form_id, removed)
+    added = StatsDelta()
+    added.add(fields, employee.data, employee.created_at)
+    apply_delta(employee.form_id, added)
+
+
+def record_deleted(employee):
+    previous = loaded_state(employee)
+    data = previous[1] if previous is not None and previous[0] == employee.form_id else employee.data
+    delta = StatsDelta()
+    delta.remove(choice_fields(get_compiled_form(employee.form)), data, employee.created_at)
+    apply_delta(employee.form_id, delta)
+
+
+def apply_bulk_stats(new, changed, compiled_forms, deleted=()):
+    """Apply the stats deltas of bulk_create/bulk_update writes and bulk deletes, one per form"""
+    deltas = defaultdict(StatsDelta)
+    compiled_forms = dict(compiled_forms)
+    old_form_ids = {state[0] for state in map(loaded_state, changed) if state is not None}
+    missing = (old_form_ids | {employee.form_id for employee in deleted}) - set(compiled_forms)
+    if missing:
+        for form in DynamicForm.objects.filter(pk__in=missing).prefetch_related('fields'):
+            compiled_forms[form.pk] = get_compiled_form(form)
+
+    for employee in new:
+        fields = choice_fields(compiled_forms[employee.form_id])
+        deltas[employee.form_id].add(fields, employee.data, employee.created_at)
+        remember_state(employee)
+    for employee in changed:
+        previous = loaded_state(employee)
+        remember_state(employee)
+        if previous is None:
+            continue
+        old_form_id, old_data = previous
+        moved = old_form_id != employee.form_id
+        if old_form_id in compiled_forms:
+            deltas[old_form_id].remove(
+                choice_fields(compiled_forms[old_form_id]), old_data, employee.created_at if moved else None
+            )
+        deltas[employee.form_id].add(
+            choice_fields(compiled_forms[employee.form_id]), employee.data, employee.created_at if moved else None
+        )
+    for employee in deleted:
+        deltas[employee.form_id].remove(
+            choice_fields(compiled_forms[employee.form_id]), employee.data, employee.created_at
+        )
+    for form_id, delta in deltas.items():
+        apply_delta(form_id, delta)
+
+
+def rename_stats_labels(form_id, renames):
+    """Move option counts to the new labels of renamed fields, {old: new}"""
+    with transaction.atomic():
+        stats = FormStats.objects.select_for_update().filter(form_id=form_id).first()
+        if stats is None:
+            return
+        # Pop every old label first so that swapped labels move correctly
+        moved = {new: stats.option_counts.pop(old) for old, new in renames.items() if old in stats.option_counts}
+        if moved:
+            stats.option_counts.update(moved)
+            stats.save()
+
+
+def rebuild_form_stats(forms):
+    """Recompute FormStats from scratch for the given forms; returns the number rebuilt"""
+    rebuilt = 0
+    for form in forms:
+        fields = {
+            field.id: field for field in get_compiled_form(form).fields if field.field_type in CHOICE_FIELD_TYPES
+        }
+        summary = Employee.objects.filter(form_id=form.pk).aggregate(count=Count('pk'), last=Max('created_at'))
+
+        # Choice values are validated against the options, so the option list
+        # restores the spelling of the lowercased index values
+        display = {
+            field_id: {option.lower(): option for option in field.options or ()}
+            for field_id, field in fields.items()
+        }
+        option_counts = {}
+        rows = (
+            EmployeeFieldValue.objects.filter(form_field_id__in=fields).exclude(normalized_value='')
+            .values_list('form_field_id', 'normalized_value').annotate(count=Count('pk'))
+        )
+        for field_id, value, count in rows:
+            option = display[field_id].get(value, value)
+            counts = option_counts.setdefault(fields[field_id].label, {})
+            counts[option] = counts.get(option, 0) + count
+
+        FormStats.objects.update_or_create(form_id=form.pk, defaults={
+            'record_count': summary['count'],
+            'last_record_at': summary['last'],
+            'option_counts': option_counts,
+        })
+        rebuilt += 1
+    return rebuilt
@@ -0,0 +1,155 @@
+import csv
+import io
+import json
+import os
+from .bulk import save_records
+from .models import Employee
+from .validation import get_compiled_form
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+# Separates multiple checkbox values inside a single CSV cell
+CHECKBOX_SEPARATOR = ';'
+MAX_REPORTED_ERRORS = 100
+
+
+def detect_format(name, default='csv'):
+    """Guess the import format from a file name"""
+    extension = os.path.splitext(name or '')[1].lower().lstrip('.')
+    if extension in ('ndjson', 'jsonl'):
+        return 'ndjson'
+    if extension == 'csv':
+        return 'csv'
+    return default
+
+
+def open_text(fileobj):
+    """Wrap a binary file object for streaming text reads"""
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+
+
+def iter_csv_rows(stream):
+    """Yield one dict per CSV row"""
+    yield from csv.DictReader(stream)
+
+
+def iter_ndjson_rows(stream):
+    """Yield one dict per non-empty NDJSON line (None for malformed lines)"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield row if isinstance(row, dict) else None
+
+
+def iter_rows(stream, file_format):
+    if file_format == 'ndjson':
+        return iter_ndjson_rows(stream)
+    return iter_csv_rows(stream)
+
+
+class RecordImporter:
+    """Stream rows into Employee records for a single form.
+
+    Rows are mapped to FormField labels, validated with the form's compiled
+    validator and written in chunked transactions, so memory use does not
+    grow with the input. ``skip`` resumes after rows that were already
+    imported, and ``progress`` is called with the counters after each chunk.
+    """
+
+    def __init__(self, form, user, batch_size=1000, skip=0, progress=None):
+        self.form = form
+        self.user = user
+        self.batch_size = batch_size
+        self.skip = skip
+        self.progress = progress
+        self.compiled = get_compiled_form(form)
+        self.fields = {field.label: field for field in self.compiled.fields}
+        self.labels_by_name = {label.strip().lower(): label for label in self.fields}
+        # Input column -> field label (None when ignored), filled as columns appear
+        self.column_labels = {}
+        self.stats = {
+            'processed': skip,
+            'imported': 0,
+            'failed': 0,
+            'skipped': skip,
+            'ignored_columns': [],
+            'errors': [],
+        }
+
+    def map_column(self, column):
+        """Match an input column to a field label, ignoring case and spacing.
+
+        NDJSON rows may each carry different keys, so columns are mapped as
+        they first appear rather than from the first row only.
+        """
+        if column not in self.column_labels:
+            label = column if column in self.fields else self.labels_by_name.get(column.strip().lower())
+            if label is None:
+                self.stats['ignored_columns'].append(column)
+            self.column_labels[column] = label
+        return self.column_labels[column]
+
+    def convert(self, row):
+        """Build Employee.data from an input row"""
+        data = {}
+        for column, value in row.items():
+            # Extra CSV cells are collected under None
+            label = self.map_column(column) if column is not None else None
+            if label is None or value is None or value == '':
+                continue
+            if (isinstance(value, str) and self.fields[label].field_type == 'checkbox'
+                    and self.fields[label].options is not None):
+                value = [part.strip() for part in value.split(CHECKBOX_SEPARATOR) if part.strip()]
+            data[label] = value
+        return data
+
+    def record_error(self, row_number, errors):
+        self.stats['failed'] += 1
+        if len(self.stats['errors']) < MAX_REPORTED_ERRORS:
+            self.stats['errors'].append({'row': row_number, 'errors': errors})
+
+    def flush(self, batch):
+        if batch:
+            save_records(batch, [], {self.form.pk: self.compiled}, batch_size=self.batch_size)
+            self.stats['imported'] += len(batch)
+        if self.progress is not None:
+            self.progress(self.stats)
+
+    def run(self, rows):
+        """Import an iterable of row dicts and return the counters.
+
+        Input that cannot be decoded (not UTF-8, malformed CSV) stops the
+        import with an ``error``; the rows before it are kept and
+        ``processed`` tells where to resume from.
+        """
+        batch = []
+        try:
+            for row_number, row in enumerate(rows, start=1):
+                if row_number <= self.skip:
+                    continue
+                self.stats['processed'] = row_number
+
+                if row is None:
+                    self.record_error(row_number, {'non_field_errors': 'Row is not a JSON object.'})
+                    continue
+                data = self.convert(row)
+                errors = self.compiled.validate(data)
+                if errors:
+                    self.record_error(row_number, errors)
+                    continue
+
+                data = self.compiled.to_storage(data)
+                batch.append(Employee(form_id=self.form.pk, created_by_id=self.user.pk, data=data))
+                if len(batch) >= self.batch_size:
+                    self.flush(batch)
+                    batch = []
+        except UnicodeDecodeError:
+            self.stats['error'] = f'The file is not UTF-8 encoded after row {self.stats["processed"]}.'
+        except csv.Error as error:
+            self.stats['error'] = f'Malformed CSV after row {self.stats["processed"]}: {error}'
+        self.flush(batch)
+        return self.stats
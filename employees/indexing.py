@@ -0,0 +1,241 @@
+import math
+import re
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from .models import DynamicForm, Employee, EmployeeFieldValue
+from .search_index import build_search_tokens, save_search_tokens
+
+DATE_FORMATS = ['%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y', '%d/%m/%Y']
+ISO_DATE_RE = re.compile(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$')
+# Field types whose values are coerced into typed EmployeeFieldValue columns
+TYPED_FIELD_TYPES = ('number', 'date', 'checkbox')
+PROJECTION_COLUMNS = ('normalized_value', 'numeric_value', 'date_value', 'bool_value')
+TRUE_VALUES = ('true', 'on', 'yes', '1')
+# Returned by CompiledField.value() for fields missing from a record's data
+MISSING = object()
+FALSE_VALUES = ('false', 'off', 'no', '0', '')
+
+
+def parse_decimal(value):
+    """Return value as a finite Decimal, or None if it is not numeric"""
+    if isinstance(value, bool):
+        return None
+    try:
+        number = Decimal(str(value).strip())
+    except (InvalidOperation, ValueError):
+        return None
+    return number if number.is_finite() else None
+
+
+def parse_number(value):
+    """Return value as a finite float, or None if it is not numeric"""
+    number = parse_decimal(value)
+    if number is None:
+        return None
+    number = float(number)
+    return number if math.isfinite(number) else None
+
+
+def parse_date(value):
+    """Return value as a date using the accepted input formats, or None"""
+    if not isinstance(value, str):
+        return None
+    # Fast path for the common ISO format before trying every strptime format
+    if ISO_DATE_RE.match(value):
+        try:
+            return date.fromisoformat(value)
+        except ValueError:
+            pass
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def parse_bool(value):
+    """Return value as a bool (a single checkbox), or None if it is not one"""
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return False
+    return None
+
+
+def normalize_value(value):
+    """Lowercased text used for substring filters on a single field"""
+    return str(value).lower() if value is not None else ''
+
+
+def project_value(field, value):
+    """Typed projection of a field value, as EmployeeFieldValue column values.
+
+    Values are coerced once, when the record is written, by the field type:
+    numbers to a finite decimal (also kept in canonical form as the text),
+    dates to an ISO date, checkbox option lists to one lowercased option per
+    line and a checkbox without options to a boolean. Values that cannot be
+    coerced keep only their text, so typed filters and sorts skip them.
+    """
+    projection = {'numeric_value': None, 'date_value': None, 'bool_value': None}
+    field_type = field.field_type
+    if field_type == 'number':
+        number = parse_decimal(value)
+        if number is not None and math.isfinite(float(number)):
+            projection['numeric_value'] = float(number)
+            projection['normalized_value'] = format(number.normalize(), 'f')
+            return projection
+    elif field_type == 'date':
+        projection['date_value'] = parse_date(value)
+        if projection['date_value'] is not None:
+            projection['normalized_value'] = projection['date_value'].isoformat()
+            return projection
+    elif field_type == 'checkbox':
+        if isinstance(value, list):
+            projection['normalized_value'] = '\n'.join(normalize_value(option) for option in value)
+            return projection
+        if not field.options:
+            projection['bool_value'] = parse_bool(value)
+            if projection['bool_value'] is not None:
+                projection['normalized_value'] = 'true' if projection['bool_value'] else 'false'
+                return projection
+    projection['normalized_value'] = normalize_value(value)
+    return projection
+
+
+def compiled_fields(form_id):
+    """The CompiledFields of a form, whose ``value()`` reads stored data"""
+    # validation imports this module for its parsers
+    from .validation import get_compiled_form
+    form = DynamicForm.objects.prefetch_related('fields').get(pk=form_id)
+    return get_compiled_form(form).fields
+
+
+def build_field_values(employee, fields):
+    """Build (unsaved) EmployeeFieldValue rows for an employee's data"""
+    data = employee.data or {}
+    values = []
+    for field in fields:
+        value = field.value(data, MISSING)
+        if value is MISSING:
+            continue
+        values.append(EmployeeFieldValue(
+            employee=employee, form_field_id=field.id, **project_value(field, value)
+        ))
+    return values
+
+
+def sync_field_values(employee, fields=None, created=False):
+    """Rebuild the field value index and search tokens for a single employee.
+
+    ``fields`` are the CompiledFields of the employee's form; they are
+    loaded when not given. A ``created`` record has no rows to replace yet.
+    Joins the caller's transaction without a savepoint of its own.
+    """
+    if fields is None:
+        fields = compiled_fields(employee.form_id)
+    with transaction.atomic(savepoint=False):
+        if not created:
+            EmployeeFieldValue.objects.filter(employee=employee).delete()
+        EmployeeFieldValue.objects.bulk_create(build_field_values(employee, fields))
+        save_search_tokens([employee.pk], build_search_tokens(employee, fields), replace=not created)
+
+
+def reindex_employees(employees, batch_size=1000, fields_by_form=None):
+    """Rebuild the field value index and search tokens for many employees in batches.
+
+    ``employees`` may be a queryset or any iterable of Employee instances.
+    ``fields_by_form`` optionally maps form id to already compiled fields.
+    Returns the number of employees indexed.
+    """
+    if hasattr(employees, 'iterator'):
+        employees = employees.iterator(chunk_size=batch_size)
+
+    fields_by_form = dict(fields_by_form or {})
+    total = 0
+    batch = []
+
+    def flush(batch):
+        values, tokens = [], []
+        for employee in batch:
+            if employee.form_id not in fields_by_form:
+                fields_by_form[employee.form_id] = compiled_fields(employee.form_id)
+            values.extend(build_field_values(employee, fields_by_form[employee.form_id]))
+            tokens.extend(build_search_tokens(employee, fields_by_form[employee.form_id]))
+        employee_ids = [e.pk for e in batch]
+        with transaction.atomic():
+            EmployeeFieldValue.objects.filter(employee__in=employee_ids).delete()
+            EmployeeFieldValue.objects.bulk_create(values, batch_size=batch_size)
+            save_search_tokens(employee_ids, tokens, batch_size=batch_size)
+
+    for employee in employees:
+        batch.append(employee)
+        if len(batch) >= batch_size:
+            flush(batch)
+            total += len(batch)
+            batch = []
+    if batch:
+        flush(batch)
+        total += len(batch)
+    return total
+
+
+def backfill_typed_values(forms, batch_size=1000):
+    """Re-project the stored values of the typed fields of forms.
+
+    Rows written before values were coerced (or with a missing index row)
+    are brought up to date in batches of records; only rows whose projection
+    changed are written. Returns counts of updated, created and deleted rows.
+    """
+    counts = {'updated': 0, 'created': 0, 'deleted': 0}
+    for form in forms:
+        fields = [field for field in compiled_fields(form.pk) if field.field_type in TYPED_FIELD_TYPES]
+        if not fields:
+            continue
+        employees = Employee.objects.filter(form_id=form.pk).order_by('pk').only('pk', 'form_id', 'data')
+        batch = []
+        for employee in employees.iterator(chunk_size=batch_size):
+            batch.append(employee)
+            if len(batch) >= batch_size:
+                _backfill_batch(batch, fields, batch_size, counts)
+                batch = []
+        if batch:
+            _backfill_batch(batch, fields, batch_size, counts)
+    return counts
+
+
+def _backfill_batch(employees, fields, batch_size, counts):
+    existing = {
+        (row.employee_id, row.form_field_id): row
+        for row in EmployeeFieldValue.objects.filter(
+            employee__in=employees, form_field_id__in=[field.id for field in fields]
+        )
+    }
+    changed, new, stale = [], [], []
+    for employee in employees:
+        data = employee.data if isinstance(employee.data, dict) else {}
+        for field in fields:
+            row = existing.get((employee.pk, field.id))
+            value = field.value(data, MISSING)
+            if value is MISSING:
+                if row is not None:
+                    stale.append(row.pk)
+                continue
+            projection = project_value(field, value)
+            if row is None:
+                new.append(EmployeeFieldValue(employee=employee, form_field_id=field.id, **projection))
+            elif any(getattr(row, column) != projection[column] for column in PROJECTION_COLUMNS):
+                for column in PROJECTION_COLUMNS:
+                    setattr(row, column, projection[column])
+                changed.append(row)
+    with transaction.atomic():
+        EmployeeFieldValue.objects.bulk_update(changed, PROJECTION_COLUMNS, batch_size=batch_size)
+        EmployeeFieldValue.objects.bulk_create(new, batch_size=batch_size)
+        EmployeeFieldValue.objects.filter(pk__in=stale).delete()
+    counts['updated'] += len(changed)
+    counts['created'] += len(new)
+    counts['deleted'] += len(stale)
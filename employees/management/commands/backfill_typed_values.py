@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+from employees.indexing import backfill_typed_values
+from employees.models import DynamicForm
+
+
+class Command(BaseCommand):
+    help = 'Re-project stored number, date and checkbox values into the typed field value columns'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, help='Only backfill records of this form id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        forms = DynamicForm.objects.order_by('pk').prefetch_related('fields')
+        if options['form']:
+            forms = forms.filter(pk=options['form'])
+            if not forms.exists():
+                raise CommandError(f'Form {options["form"]} does not exist')
+        counts = backfill_typed_values(forms, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Updated {counts["updated"]}, created {counts["created"]} and deleted {counts["deleted"]} field values'
+        ))
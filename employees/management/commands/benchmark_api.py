@@ -0,0 +1,228 @@
+import json
+import random
+import tracemalloc
+from urllib.parse import urlencode
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from employees.benchmarking import Timer, access_token, fake_record, summarize
+from employees.bulk import delete_records, load_compiled_forms, save_records
+from employees.models import DynamicForm, Employee
+
+User = get_user_model()
+
+SCENARIOS = ('list', 'search', 'field_filter', 'search_fields', 'create', 'bulk_delete')
+# Metrics compared against a baseline; higher is worse for all of them
+COMPARED_METRICS = ('p50_ms', 'p99_ms', 'queries_per_request', 'peak_memory_kb')
+RECORDS_URL = '/api/employees/records/'
+BULK_DELETE_SIZE = 10
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the main records endpoints: latency, queries per request and peak memory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username whose records are queried')
+        parser.add_argument('--form', type=int, help='Form used for filters and writes (default: the largest)')
+        parser.add_argument('--requests', type=int, default=50, help='Timed requests per scenario')
+        parser.add_argument('--profile-requests', type=int, default=5,
+                            help='Extra requests per scenario counting queries and tracing memory')
+        parser.add_argument('--page-size', type=int, default=50)
+        parser.add_argument('--scenarios', default=','.join(SCENARIOS), help='Comma separated subset to run')
+        parser.add_argument('--save', help='Write the results to this JSON file as a baseline')
+        parser.add_argument('--compare', help='Compare the results with a baseline JSON file')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Relative increase over the baseline reported as a regression')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        try:
+            self.user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+        scenarios = [name.strip() for name in options['scenarios'].split(',') if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f'Unknown scenarios: {", ".join(sorted(unknown))}')
+
+        self.form = self.get_form(options['form'])
+        self.compiled = load_compiled_forms(self.user, [self.form.pk])
+        self.page_size = options['page_size']
+        self.rng = random.Random(0)
+        self.client = Client(HTTP_AUTHORIZATION=f'Bearer {access_token(self.user)}')
+        self.created_ids = []
+
+        results = {}
+        try:
+            for name in scenarios:
+                results[name] = self.run(name, options['requests'], options['profile_requests'])
+        finally:
+            # Records written by the create scenario are not left behind
+            delete_records(Employee.objects.filter(pk__in=self.created_ids))
+
+        report = {
+            'user': self.user.username,
+            'form': self.form.pk,
+            'records': Employee.objects.filter(created_by_id=self.user.id).count(),
+            'scenarios': results,
+        }
+        if options['compare']:
+            report['comparison'] = self.compare(results, options['compare'], options['tolerance'])
+        self.stdout.write(json.dumps(report, indent=2))
+        if options['save']:
+            with open(options['save'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["save"]}'))
+
+        regressions = [
+            f'{name} {metric}' for name, metrics in report.get('comparison', {}).items()
+            for metric, change in metrics.items() if change['regression']
+        ]
+        if regressions:
+            message = f'Regressions: {", ".join(regressions)}'
+            if options['fail_on_regression']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+
+    def get_form(self, form_id):
+        forms = DynamicForm.objects.filter(created_by_id=self.user.id).prefetch_related('fields')
+        if form_id:
+            forms = forms.filter(pk=form_id)
+        form = forms.order_by('-stats__record_count', 'pk').first()
+        if form is None:
+            raise CommandError(f'Form {form_id} not found' if form_id else 'The user has no forms')
+        return form
+
+    def run(self, name, count, profile_count):
+        """Time count requests, then count queries and peak memory over profile_count more"""
+        requests = getattr(self, f'prepare_{name}')(count + profile_count)
+        latencies = []
+        with Timer() as total:
+            for method, url, payload in requests[:count]:
+                with Timer() as timer:
+                    self.send(method, url, payload)
+                latencies.append(timer.elapsed)
+        result = summarize(latencies, total.elapsed)
+
+        # Query capture and memory tracing slow requests down, so they are
+        # measured separately from the latencies
+        queries = []
+        peak = 0
+        for method, url, payload in requests[count:]:
+            tracemalloc.start()
+            with CaptureQueriesContext(connection) as captured:
+                self.send(method, url, payload)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+            queries.append(len(captured.captured_queries))
+        result['queries_per_request'] = round(sum(queries) / len(queries), 1) if queries else None
+        result['peak_memory_kb'] = round(peak / 1024, 1) if queries else None
+        return result
+
+    def send(self, method, url, payload):
+        if method == 'get':
+            response = self.client.get(url)
+        else:
+            response = self.client.post(url, payload, content_type='application/json')
+        if response.status_code not in (200, 201):
+            raise CommandError(f'{method.upper()} {url} returned {response.status_code}')
+        if response.status_code == 201:
+            self.created_ids.append(response.json()['id'])
+        return response
+
+    def list_url(self, index, **params):
+        # A nonce per request keeps the response cache from answering
+        params.update(form_id=self.form.pk, page_size=self.page_size, _=index)
+        return f'{RECORDS_URL}?{urlencode(params)}'
+
+    def prepare_list(self, count):
+        return [('get', self.list_url(index), None) for index in range(count)]
+
+    def prepare_search(self, count):
+        words = self.sample_words()
+        return [('get', self.list_url(index, search=words[index % len(words)]), None) for index in range(count)]
+
+    def prepare_field_filter(self, count):
+        label, values = self.filter_values()
+        param = f'field_{label.replace(" ", "_")}'
+        return [('get', self.list_url(index, **{param: values[index % len(values)]}), None) for index in range(count)]
+
+    def prepare_search_fields(self, count):
+        # Answered from the forms cache after the first request, as for clients
+        return [('get', f'{RECORDS_URL}search_fields/?form_id={self.form.pk}', None) for _ in range(count)]
+
+    def prepare_create(self, count):
+        return [
+            ('post', RECORDS_URL, {'form': self.form.pk, 'data': self.fake_data(f'create.{index}')})
+            for index in range(count)
+        ]
+
+    def prepare_bulk_delete(self, count):
+        # The deleted records are inserted up front, outside the timings
+        compiled = self.compiled[self.form.pk]
+        records = [
+            Employee(
+                form_id=self.form.pk, created_by_id=self.user.id,
+                data=compiled.to_storage(self.fake_data(f'delete.{index}')),
+            )
+            for index in range(count * BULK_DELETE_SIZE)
+        ]
+        save_records(records, [], self.compiled)
+        ids = [record.pk for record in records]
+        self.created_ids.extend(ids)
+        return [
+            ('post', f'{RECORDS_URL}bulk_delete/', {'ids': ids[start:start + BULK_DELETE_SIZE]})
+            for start in range(0, len(ids), BULK_DELETE_SIZE)
+        ]
+
+    def fake_data(self, key):
+        return fake_record(self.rng, self.form.fields.all(), key)
+
+    def sample_words(self):
+        """First words of text values of the form's records, to search for"""
+        fields = [field for field in self.compiled[self.form.pk].fields if field.field_type == 'text']
+        words = []
+        for data in Employee.objects.filter(form_id=self.form.pk).values_list('data', flat=True)[:200]:
+            for field in fields:
+                value = str(field.value(data, None) or '').split()
+                if value and value[0] not in words:
+                    words.append(value[0])
+        if not words:
+            raise CommandError(f'Form {self.form.pk} has no text values to search for')
+        return words
+
+    def filter_values(self):
+        """A field of the form to filter on and values to filter it by"""
+        fields = sorted(self.form.fields.all(), key=lambda field: field.field_type not in ('select', 'radio'))
+        for field in fields:
+            if field.field_type in ('select', 'radio') and field.options:
+                return field.label, [str(option)[:3] for option in field.options]
+            if field.field_type == 'text':
+                return field.label, self.sample_words()
+        raise CommandError(f'Form {self.form.pk} has no text or choice field to filter by')
+
+    def compare(self, results, path, tolerance):
+        try:
+            with open(path) as fh:
+                baseline = json.load(fh)['scenarios']
+        except (OSError, ValueError, KeyError) as e:
+            raise CommandError(f'Cannot read baseline {path}: {e}')
+        comparison = {}
+        for name, metrics in results.items():
+            if name not in baseline:
+                continue
+            comparison[name] = {}
+            for metric in COMPARED_METRICS:
+                before, after = baseline[name].get(metric), metrics.get(metric)
+                if before is None or after is None:
+                    continue
+                change = (after - before) / before if before else 0.0
+                comparison[name][metric] = {
+                    'baseline': before,
+                    'current': after,
+                    'change': round(change, 3),
+                    'regression': change > tolerance,
+                }
+        return comparison
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from employees.benchmarking import Timer, access_token, summarize
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Compare records list/search throughput of the WSGI (DRF) and async (ASGI) paths'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username whose records are queried')
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--limit', type=int, default=100, help='Records per response')
+        parser.add_argument('--query', default='', help='Extra query string, e.g. "search=ann"')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+        token = access_token(user)
+        query = f'&{options["query"]}' if options['query'] else ''
+        limit = options['limit']
+
+        # A nonce per request keeps the response cache from answering
+        wsgi_urls = [f'/api/employees/records/?page_size={limit}{query}&_={i}' for i in range(options['requests'])]
+        async_urls = [f'/api/employees/async/records/?limit={limit}{query}&_={i}' for i in range(options['requests'])]
+
+        results = {
+            'wsgi': self.run_wsgi(wsgi_urls, token, options['concurrency']),
+            'asgi': asyncio.run(self.run_asgi(async_urls, token, options['concurrency'])),
+        }
+        if results['wsgi']['requests_per_second']:
+            results['speedup'] = round(
+                results['asgi']['requests_per_second'] / results['wsgi']['requests_per_second'], 2
+            )
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run_wsgi(self, urls, token, concurrency):
+        def fetch(url):
+            client = Client(HTTP_AUTHORIZATION=f'Bearer {token}')
+            with Timer() as timer:
+                response = client.get(url)
+            connection.close()
+            if response.status_code != 200:
+                raise CommandError(f'{url} returned {response.status_code}')
+            return timer.elapsed
+
+        with Timer() as total:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                latencies = list(pool.map(fetch, urls))
+        return summarize(latencies, total.elapsed)
+
+    async def run_asgi(self, urls, token, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(url):
+            async with semaphore:
+                with Timer() as timer:
+                    response = await client.get(url, headers={'Authorization': f'Bearer {token}'})
+                if response.status_code != 200:
+                    raise CommandError(f'{url} returned {response.status_code}')
+                return timer.elapsed
+
+        with Timer() as total:
+            latencies = await asyncio.gather(*(fetch(url) for url in urls))
+        return summarize(list(latencies), total.elapsed)
@@ -0,0 +1,64 @@
+import json
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from users.authentication import TokenUserAuthentication
+from employees.benchmarking import Timer, access_token, summarize
+
+User = get_user_model()
+
+AUTHENTICATION_CLASSES = {
+    'jwt_user_lookup': JWTAuthentication,
+    'token_user': TokenUserAuthentication,
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare API throughput with the user-lookup and token-user JWT authentication classes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username the requests are made as')
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--path', default='/api/employees/records/search_fields/',
+                            help='API path requested; a cheap endpoint isolates the authentication cost')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+        path = options['path'].split('?')[0]
+        view_class = getattr(resolve(path).func, 'cls', None)
+        if view_class is None:
+            raise CommandError(f'{path} is not a DRF view')
+
+        client = Client(HTTP_AUTHORIZATION=f'Bearer {access_token(user)}')
+        results = {}
+        for name, authentication_class in AUTHENTICATION_CLASSES.items():
+            with mock.patch.object(view_class, 'authentication_classes', [authentication_class]):
+                results[name] = self.run(client, options['path'], options['requests'])
+        if results['jwt_user_lookup']['requests_per_second']:
+            results['speedup'] = round(
+                results['token_user']['requests_per_second'] / results['jwt_user_lookup']['requests_per_second'], 2
+            )
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def run(self, client, path, requests):
+        # Warm up caches so both runs measure the steady state
+        client.get(path)
+        latencies = []
+        with CaptureQueriesContext(connection) as queries, Timer() as total:
+            for _ in range(requests):
+                with Timer() as timer:
+                    response = client.get(path)
+                if response.status_code not in (200, 304):
+                    raise CommandError(f'{path} returned {response.status_code}')
+                latencies.append(timer.elapsed)
+        summary = summarize(latencies, total.elapsed)
+        summary['queries_per_request'] = round(len(queries) / requests, 2)
+        return summary
@@ -0,0 +1,65 @@
+import json
+import threading
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connection, transaction
+from employees.benchmarking import Timer, summarize
+from employees.bulk import delete_records
+from employees.models import DynamicForm, Employee
+from employees.validation import get_compiled_form
+
+
+class Command(BaseCommand):
+    help = 'Measure write throughput of concurrent writers under the active DB_PROFILE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, required=True, help='Form the benchmark records are created in')
+        parser.add_argument('--writers', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=100, help='Records written by each writer')
+
+    def handle(self, *args, **options):
+        try:
+            form = DynamicForm.objects.get(pk=options['form'])
+        except DynamicForm.DoesNotExist:
+            raise CommandError(f'Form {options["form"]} does not exist')
+        compiled = get_compiled_form(form)
+        data = compiled.to_storage({
+            field.label: '1' for field in compiled.fields if field.field_type in ('text', 'number', 'textarea')
+        })
+
+        lock = threading.Lock()
+        latencies, errors, created = [], [], []
+
+        def writer():
+            for _ in range(options['writes']):
+                try:
+                    with Timer() as timer:
+                        with transaction.atomic():
+                            employee = Employee.objects.create(form=form, created_by_id=form.created_by_id, data=data)
+                    with lock:
+                        latencies.append(timer.elapsed)
+                        created.append(employee.pk)
+                except OperationalError as e:
+                    with lock:
+                        errors.append(str(e))
+            connection.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(options['writers'])]
+        with Timer() as total:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        # Remove the benchmark records again
+        for start in range(0, len(created), 500):
+            delete_records(Employee.objects.filter(pk__in=created[start:start + 500]))
+
+        result = summarize(latencies, total.elapsed)
+        result.update({
+            'profile': settings.DB_PROFILE,
+            'writers': options['writers'],
+            'errors': len(errors),
+            'error_samples': sorted(set(errors))[:3],
+        })
+        self.stdout.write(json.dumps(result, indent=2))
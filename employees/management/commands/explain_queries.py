@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.http import QueryDict
+from employees.filters import filter_employees
+from employees.models import DynamicForm, FormField
+
+User = get_user_model()
+
+# Example operand of a range filter per field type
+RANGE_OPERANDS = {'number': '1', 'date': '2000-01-01'}
+
+
+class Command(BaseCommand):
+    help = 'Print the database EXPLAIN plan for each query shape used by the employees API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help='Username to build the queries for')
+        parser.add_argument('--label', help='Field label used for field_ filter examples')
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User "{options["user"]}" does not exist')
+
+        form = DynamicForm.objects.filter(created_by=user).first()
+        form_id = form.pk if form else 0
+        label = options['label'] or (
+            FormField.objects.filter(form=form).values_list('label', flat=True).first() if form else None
+        ) or 'name'
+        param = label.replace(' ', '_')
+        # Range filters only apply to number and date fields
+        range_field = FormField.objects.filter(form=form, field_type__in=RANGE_OPERANDS).order_by('order').first()
+
+        def records(query):
+            return filter_employees(user, QueryDict(query)).select_related('form', 'created_by')
+
+        shapes = [
+            ('forms list', DynamicForm.objects.filter(created_by=user).order_by('-created_at')),
+            ('form fields', FormField.objects.filter(form_id=form_id).order_by('order')),
+            ('search_fields catalog', FormField.objects.filter(form__created_by=user)
+                .order_by('-form__created_at', 'form_id', 'order').values_list('label', 'field_type')),
+            ('records list', records('')),
+            ('records list, keyset page', records('').order_by('-created_at', '-pk')[:50]),
+            ('records by form', records(f'form_id={form_id}')),
+            ('records search', records('search=a')),
+            (f'records field_{param}', records(f'field_{param}=a')),
+            (f'records ordering=data.{param}', records(f'ordering=data.{param}')),
+        ]
+        if range_field is not None:
+            range_param = range_field.label.replace(' ', '_')
+            operand = RANGE_OPERANDS[range_field.field_type]
+            shapes.append((f'records field_{range_param}__gte', records(f'field_{range_param}__gte={operand}')))
+        else:
+            self.stdout.write(self.style.WARNING('No number or date field, skipping the range filter example'))
+
+        for title, queryset in shapes:
+            self.stdout.write(self.style.MIGRATE_HEADING(title))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
@@ -0,0 +1,64 @@
+import json
+import os
+from django.core.management.base import BaseCommand, CommandError
+from employees.importer import IMPORT_FORMATS, RecordImporter, detect_format, iter_rows, open_text
+from employees.models import DynamicForm
+
+
+class Command(BaseCommand):
+    help = 'Import employee records for a form from a CSV or NDJSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV (.csv) or NDJSON (.ndjson/.jsonl) file')
+        parser.add_argument('--form', type=int, required=True, help='Form id the records belong to')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Input format (default: from extension)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint)')
+        parser.add_argument('--resume', action='store_true', help='Continue after the last checkpoint')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'File "{path}" does not exist')
+        try:
+            form = DynamicForm.objects.select_related('created_by').get(pk=options['form'])
+        except DynamicForm.DoesNotExist:
+            raise CommandError(f'Form {options["form"]} does not exist')
+
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        skip = 0
+        if options['resume'] and os.path.exists(checkpoint):
+            with open(checkpoint) as fh:
+                state = json.load(fh)
+            if state.get('form') != form.pk:
+                raise CommandError(f'Checkpoint {checkpoint} belongs to form {state.get("form")}')
+            skip = state['processed']
+            self.stdout.write(f'Resuming after row {skip}')
+
+        def progress(stats):
+            with open(checkpoint, 'w') as fh:
+                json.dump({'form': form.pk, 'processed': stats['processed']}, fh)
+            self.stdout.write(
+                f'{stats["processed"]} rows processed, {stats["imported"]} imported, {stats["failed"]} failed'
+            )
+
+        importer = RecordImporter(
+            form, form.created_by, batch_size=options['batch_size'], skip=skip, progress=progress
+        )
+        file_format = options['format'] or detect_format(path)
+        with open(path, 'rb') as fh:
+            stats = importer.run(iter_rows(open_text(fh), file_format))
+
+        if stats['ignored_columns']:
+            self.stdout.write(self.style.WARNING(f'Ignored columns: {", ".join(stats["ignored_columns"])}'))
+        for error in stats['errors']:
+            self.stdout.write(self.style.WARNING(f'Row {error["row"]}: {error["errors"]}'))
+        if 'error' in stats:
+            # The checkpoint is kept so the import can be resumed once the file is fixed
+            raise CommandError(
+                f'{stats["error"]} Imported {stats["imported"]} records; fix the file and run again with --resume'
+            )
+        os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {stats["imported"]} records, {stats["failed"]} rows failed'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+from employees.field_keys import migrate_form_keys
+from employees.models import DynamicForm
+
+
+class Command(BaseCommand):
+    help = 'Store employee data by stable field id instead of label, rewriting records in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, help='Only migrate this form id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        forms = DynamicForm.objects.order_by('pk')
+        if options['form']:
+            forms = forms.filter(pk=options['form'])
+            if not forms.exists():
+                raise CommandError(f'Form {options["form"]} does not exist')
+        total = 0
+        for form in forms:
+            rewritten = migrate_form_keys(form, batch_size=options['batch_size'])
+            total += rewritten
+            self.stdout.write(f'Form {form.pk}: {rewritten} records rewritten')
+        self.stdout.write(self.style.SUCCESS(f'Rewrote {total} records'))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from employees.indexing import reindex_employees
+from employees.models import Employee
+from employees.search_index import prune_orphaned_trigrams
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-field value index used by field_<label> filters and the search token index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, help='Only reindex records of this form id')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        employees = Employee.objects.order_by('pk')
+        if options['form']:
+            employees = employees.filter(form_id=options['form'])
+        total = reindex_employees(employees, batch_size=options['batch_size'])
+        # Also drops trigrams left behind by records deleted before they were pruned
+        pruned = prune_orphaned_trigrams()
+        self.stdout.write(self.style.SUCCESS(f'Reindexed {total} employee records, pruned {pruned} trigrams'))
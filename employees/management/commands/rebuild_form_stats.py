@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from employees.form_stats import rebuild_form_stats
+from employees.models import DynamicForm
+
+
+class Command(BaseCommand):
+    help = 'Recompute the per-form record counts and option counts shown with each form'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--form', type=int, help='Only rebuild the stats of this form id')
+
+    def handle(self, *args, **options):
+        forms = DynamicForm.objects.order_by('pk').prefetch_related('fields')
+        if options['form']:
+            forms = forms.filter(pk=options['form'])
+        total = rebuild_form_stats(forms)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {total} forms'))
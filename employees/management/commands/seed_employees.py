@@ -0,0 +1,79 @@
+import random
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from employees.benchmarking import SEED_FIELDS, fake_record
+from employees.bulk import load_compiled_forms, save_records
+from employees.models import DynamicForm, Employee, FormField
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Create users, forms with every field type and valid employee records for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1)
+        parser.add_argument('--forms', type=int, default=2, help='Forms per user')
+        parser.add_argument('--records', type=int, default=1000, help='Records per form')
+        parser.add_argument('--prefix', default='seed', help='Username prefix; existing users are reused')
+        parser.add_argument('--password', default='password', help='Password of created users')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for repeatable data')
+
+    def handle(self, *args, **options):
+        if min(options['users'], options['forms'], options['records']) < 0:
+            raise CommandError('--users, --forms and --records must not be negative')
+        rng = random.Random(options['seed'])
+        users = self.seed_users(options['prefix'], options['users'], options['password'])
+
+        created = 0
+        for user in users:
+            for _ in range(options['forms']):
+                form = self.seed_form(user)
+                created += self.seed_records(rng, user, form, options['records'], options['batch_size'])
+                self.stdout.write(f'{user.username}: form {form.pk} with {options["records"]} records')
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(users)} users, {len(users) * options["forms"]} forms and {created} records'
+        ))
+
+    def seed_users(self, prefix, count, password):
+        usernames = [f'{prefix}{index}' for index in range(1, count + 1)]
+        existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+        # Hashing is slow on purpose, so every new user shares one hash
+        hashed = make_password(password)
+        User.objects.bulk_create([
+            User(username=username, email=f'{username}@example.com', password=hashed)
+            for username in usernames if username not in existing
+        ])
+        return list(User.objects.filter(username__in=usernames).order_by('pk'))
+
+    def seed_form(self, user):
+        number = DynamicForm.objects.filter(created_by_id=user.id).count() + 1
+        # Created one by one so the form signals set up its stats row
+        form = DynamicForm.objects.create(
+            name=f'Seed Form {number}', description='Generated by seed_employees', created_by=user
+        )
+        FormField.objects.bulk_create([
+            FormField(form=form, order=order, **field) for order, field in enumerate(SEED_FIELDS)
+        ])
+        return form
+
+    def seed_records(self, rng, user, form, count, batch_size):
+        """Insert generated records in batches.
+
+        save_records maintains the search text, field value and token
+        indexes, the form stats and the cache generations, as the bulk API does.
+        """
+        compiled_forms = load_compiled_forms(user, [form.pk])
+        for start in range(0, count, batch_size):
+            compiled = compiled_forms[form.pk]
+            batch = []
+            for index in range(start, min(start + batch_size, count)):
+                data = fake_record(rng, SEED_FIELDS, f'{form.pk}.{index}')
+                errors = compiled.validate(data)
+                if errors:
+                    raise CommandError(f'Generated an invalid record: {errors}')
+                batch.append(Employee(form_id=form.pk, created_by_id=user.id, data=compiled.to_storage(data)))
+            save_records(batch, [], compiled_forms, batch_size=batch_size)
+        return count
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:25
+
+from django.db import migrations, models
+
+
+def populate_search_text(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    batch = []
+    for employee in Employee.objects.only('id', 'data').iterator(chunk_size=2000):
+        data = employee.data or {}
+        employee.search_text = '\x1f'.join(
+            str(value).lower() if value is not None else ''
+            for value in data.values()
+        )
+        batch.append(employee)
+        if len(batch) >= 2000:
+            Employee.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        Employee.objects.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='search_text',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import datetime
+
+
+def _parse_date(value):
+    if not isinstance(value, str):
+        return None
+    for fmt in ('%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y', '%d/%m/%Y'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _parse_number(value):
+    try:
+        return float(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def populate_field_values(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    FormField = apps.get_model('employees', 'FormField')
+    EmployeeFieldValue = apps.get_model('employees', 'EmployeeFieldValue')
+    fields_by_form = {}
+    values = []
+    for employee in Employee.objects.only('id', 'form_id', 'data').iterator(chunk_size=2000):
+        if employee.form_id not in fields_by_form:
+            fields_by_form[employee.form_id] = list(FormField.objects.filter(form_id=employee.form_id))
+        data = employee.data or {}
+        for field in fields_by_form[employee.form_id]:
+            if field.label not in data:
+                continue
+            value = data[field.label]
+            values.append(EmployeeFieldValue(
+                employee_id=employee.id,
+                form_field_id=field.id,
+                normalized_value=str(value).lower() if value is not None else '',
+                numeric_value=_parse_number(value) if field.field_type == 'number' else None,
+                date_value=_parse_date(value) if field.field_type == 'date' else None,
+            ))
+        if len(values) >= 5000:
+            EmployeeFieldValue.objects.bulk_create(values)
+            values = []
+    if values:
+        EmployeeFieldValue.objects.bulk_create(values)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0003_employee_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeFieldValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_value', models.TextField(blank=True, default='')),
+                ('numeric_value', models.FloatField(blank=True, null=True)),
+                ('date_value', models.DateField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='field_values', to='employees.employee')),
+                ('form_field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='employees.formfield')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['form_field', 'normalized_value'], name='employees_e_form_fi_5d4e32_idx'), models.Index(fields=['form_field', 'numeric_value'], name='employees_e_form_fi_2fced4_idx'), models.Index(fields=['form_field', 'date_value'], name='employees_e_form_fi_fed51c_idx')],
+                'unique_together': {('employee', 'form_field')},
+            },
+        ),
+        migrations.RunPython(populate_field_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0004_employeefieldvalue'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='dynamicform',
+            index=models.Index(fields=['created_by', '-created_at'], name='form_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_by', '-created_at'], name='employee_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_by', 'form', '-created_at'], name='employee_owner_form_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='formfield',
+            index=models.Index(fields=['form', 'order'], name='field_form_order_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_by', '-updated_at'], name='employee_owner_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_form_stats(apps, schema_editor):
+    DynamicForm = apps.get_model('employees', 'DynamicForm')
+    Employee = apps.get_model('employees', 'Employee')
+    FormField = apps.get_model('employees', 'FormField')
+    FormStats = apps.get_model('employees', 'FormStats')
+    for form in DynamicForm.objects.all():
+        labels = list(FormField.objects.filter(
+            form_id=form.pk, field_type__in=('select', 'radio')
+        ).values_list('label', flat=True))
+        stats = FormStats(form_id=form.pk, option_counts={})
+        records = Employee.objects.filter(form_id=form.pk).values_list('created_at', 'data')
+        for created_at, data in records.iterator(chunk_size=2000):
+            stats.record_count += 1
+            if stats.last_record_at is None or created_at > stats.last_record_at:
+                stats.last_record_at = created_at
+            data = data if isinstance(data, dict) else {}
+            for label in labels:
+                if data.get(label) not in (None, ''):
+                    counts = stats.option_counts.setdefault(label, {})
+                    option = str(data[label])
+                    counts[option] = counts.get(option, 0) + 1
+        stats.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0006_employee_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FormStats',
+            fields=[
+                ('form', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='employees.dynamicform')),
+                ('record_count', models.PositiveIntegerField(default=0)),
+                ('last_record_at', models.DateTimeField(blank=True, null=True)),
+                ('option_counts', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'form stats',
+            },
+        ),
+        migrations.RunPython(populate_form_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 4.2.7 on 2026-10-18 01:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import re
+
+TOKEN_RE = re.compile(r'\w+')
+
+
+def _trigrams(token):
+    padded = f'  {token} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def populate_search_tokens(apps, schema_editor):
+    Employee = apps.get_model('employees', 'Employee')
+    FormField = apps.get_model('employees', 'FormField')
+    SearchToken = apps.get_model('employees', 'SearchToken')
+    SearchTrigram = apps.get_model('employees', 'SearchTrigram')
+    fields_by_form = {}
+    tokens, trigrams = [], []
+    seen = set()
+    employees = Employee.objects.only('id', 'form_id', 'created_by_id', 'data')
+    for employee in employees.iterator(chunk_size=2000):
+        if employee.form_id not in fields_by_form:
+            fields_by_form[employee.form_id] = list(
+                FormField.objects.filter(form_id=employee.form_id).exclude(field_type='password')
+            )
+        data = employee.data or {}
+        for field in fields_by_form[employee.form_id]:
+            if field.label not in data:
+                continue
+            value = data[field.label]
+            for item in value if isinstance(value, list) else [value]:
+                if item in (None, ''):
+                    continue
+                item = str(item)
+                for token in dict.fromkeys(t[:64] for t in TOKEN_RE.findall(item.lower())):
+                    tokens.append(SearchToken(
+                        created_by_id=employee.created_by_id, employee_id=employee.id,
+                        form_field_id=field.id, token=token, value=item[:255],
+                    ))
+                    if (employee.created_by_id, token) not in seen:
+                        seen.add((employee.created_by_id, token))
+                        trigrams.extend(
+                            SearchTrigram(created_by_id=employee.created_by_id, trigram=trigram, token=token)
+                            for trigram in _trigrams(token)
+                        )
+        if len(tokens) >= 5000:
+            SearchToken.objects.bulk_create(tokens)
+            tokens = []
+    SearchToken.objects.bulk_create(tokens)
+    SearchTrigram.objects.bulk_create(trigrams, batch_size=5000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('employees', '0007_formstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('token', models.CharField(max_length=64)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('created_by', 'trigram', 'token')},
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=64)),
+                ('value', models.CharField(max_length=255)),
+                ('created_by', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='employees.employee')),
+                ('form_field', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='employees.formfield')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_by', 'token'], name='search_token_owner_idx')],
+            },
+        ),
+        migrations.RunPython(populate_search_tokens, migrations.RunPython.noop),
+    ]
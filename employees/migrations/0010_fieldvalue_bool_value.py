@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 02:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0009_request_profile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeefieldvalue',
+            name='bool_value',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0010_fieldvalue_bool_value'),
+    ]
+
+    operations = [
+        # Existing records are keyed by label until migrate_field_keys rewrites them
+        migrations.AddField(
+            model_name='dynamicform',
+            name='schema_version',
+            field=models.PositiveSmallIntegerField(default=1),
+        ),
+        migrations.AlterField(
+            model_name='dynamicform',
+            name='schema_version',
+            field=models.PositiveSmallIntegerField(default=2),
+        ),
+    ]
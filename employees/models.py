@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from .search import build_search_text
 
 User = get_user_model()
 
@@ -16,14 +17,22 @@ class DynamicForm(models.Model):
         ('select', 'Select'),
     ]
 
+    # How Employee.data is keyed: by field label, or by the field's id (see field_keys.py)
+    LABEL_KEYED = 1
+    ID_KEYED = 2
+
     name = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='forms')
+    schema_version = models.PositiveSmallIntegerField(default=ID_KEYED)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', '-created_at'], name='form_owner_created_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -40,6 +49,9 @@ class FormField(models.Model):
 
     class Meta:
         ordering = ['order']
+        indexes = [
+            models.Index(fields=['form', 'order'], name='field_form_order_idx'),
+        ]
 
     def __str__(self):
         return f"{self.form.name} - {self.label}"
@@ -48,11 +60,96 @@ class Employee(models.Model):
     form = models.ForeignKey(DynamicForm, on_delete=models.CASCADE, related_name='employees')
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='employees')
     data = models.JSONField()  # Store dynamic field values
+    search_text = models.TextField(blank=True, default='', editable=False)  # Lowercased values for search
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['created_by', '-created_at'], name='employee_owner_created_idx'),
+            models.Index(fields=['created_by', 'form', '-created_at'], name='employee_owner_form_idx'),
+            models.Index(fields=['created_by', '-updated_at'], name='employee_owner_updated_idx'),
+        ]
 
     def __str__(self):
         return f"Employee #{self.id} - {self.form.name}"
+
+    def save(self, *args, **kwargs):
+        self.search_text = build_search_text(self.data)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'data' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'search_text'}
+        super().save(*args, **kwargs)
+
+class EmployeeFieldValue(models.Model):
+    """Per-field index of Employee.data used for filtering records"""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='field_values')
+    form_field = models.ForeignKey(FormField, on_delete=models.CASCADE, related_name='values')
+    normalized_value = models.TextField(blank=True, default='')  # Lowercased text for substring filters
+    numeric_value = models.FloatField(blank=True, null=True)  # Set for number fields
+    date_value = models.DateField(blank=True, null=True)  # Set for date fields
+    bool_value = models.BooleanField(blank=True, null=True)  # Set for checkbox fields without options
+
+    class Meta:
+        unique_together = ('employee', 'form_field')
+        indexes = [
+            models.Index(fields=['form_field', 'normalized_value']),
+            models.Index(fields=['form_field', 'numeric_value']),
+            models.Index(fields=['form_field', 'date_value']),
+        ]
+
+    def __str__(self):
+        return f"Employee #{self.employee_id} - {self.form_field_id}"
+
+class SearchToken(models.Model):
+    """A word of an employee's field value, for prefix and typo-tolerant search"""
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='search_tokens')
+    form_field = models.ForeignKey(FormField, on_delete=models.CASCADE, related_name='+')
+    token = models.CharField(max_length=64)  # Lowercased word
+    value = models.CharField(max_length=255)  # The field value it came from, shown as a suggestion
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_by', 'token'], name='search_token_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.token} (employee #{self.employee_id})"
+
+class SearchTrigram(models.Model):
+    """Trigrams of every token a user's records contain, for similarity lookups"""
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    trigram = models.CharField(max_length=3)
+    token = models.CharField(max_length=64)
+
+    class Meta:
+        unique_together = ('created_by', 'trigram', 'token')
+
+    def __str__(self):
+        return f"{self.trigram} -> {self.token}"
+
+class FormStats(models.Model):
+    """Denormalized record summary of a form, maintained by signals"""
+    form = models.OneToOneField(DynamicForm, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    record_count = models.PositiveIntegerField(default=0)
+    last_record_at = models.DateTimeField(blank=True, null=True)
+    option_counts = models.JSONField(default=dict)  # {label: {option: count}} for select/radio fields
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'form stats'
+
+    def __str__(self):
+        return f"Stats for form #{self.form_id}"
+
+class RequestProfile(models.Model):
+    """Admin entry for the slow request profiles; they are kept in memory (see profiling.py), not in a table"""
+
+    class Meta:
+        managed = False
+        default_permissions = ('view',)
+
+    def __str__(self):
+        return f"Request profile #{self.pk}"
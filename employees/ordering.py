@@ -0,0 +1,89 @@
+from django.db.models import F, OuterRef, Subquery
+from rest_framework.exceptions import ValidationError
+from .models import EmployeeFieldValue, FormField
+
+DATA_ORDERING_PREFIX = 'data.'
+SORT_VALUE = 'sort_value'
+
+# Columns clients may order by. Record columns are backed by (owner, column)
+# indexes; forms are few per user, so their sorts stay cheap without them.
+FORM_ORDERING_FIELDS = ('created_at', 'updated_at', 'name', 'id')
+RECORD_ORDERING_FIELDS = ('created_at', 'updated_at', 'id')
+
+# EmployeeFieldValue column holding the typed value for each field type
+SORT_COLUMNS = {
+    'number': 'numeric_value',
+    'date': 'date_value',
+}
+
+
+def split_ordering(ordering):
+    """Split ``-name`` into ('name', True)"""
+    if ordering.startswith('-'):
+        return ordering[1:], True
+    return ordering, False
+
+
+def order_by_column(queryset, ordering, allowed, choices=None):
+    """Order by a whitelisted model column, rejecting anything else"""
+    name, _ = split_ordering(ordering)
+    if name not in allowed:
+        choices = choices or ', '.join(allowed)
+        raise ValidationError({'ordering': f'Must be one of: {choices}.'})
+    return queryset.order_by(ordering)
+
+
+def sort_column(field_types):
+    """Typed value column shared by every field type, text otherwise"""
+    columns = {SORT_COLUMNS.get(field_type, 'normalized_value') for field_type in field_types}
+    return columns.pop() if len(columns) == 1 else 'normalized_value'
+
+
+def candidate_labels(label):
+    """A label from a query param, as is and with underscores standing for spaces"""
+    return {label, label.replace('_', ' ')}
+
+
+def data_fields(user, label, form_id=None, param='ordering'):
+    """The user's FormFields with the given label (underscores may stand for spaces)"""
+    fields = FormField.objects.filter(form__created_by_id=user.id, label__in=candidate_labels(label))
+    if form_id:
+        fields = fields.filter(form_id=form_id)
+    fields = list(fields.only('id', 'label', 'field_type', 'options'))
+    if not fields:
+        raise ValidationError({param: f'Unknown field "{label}".'})
+    return fields
+
+
+def order_by_data(queryset, user, label, descending, form_id=None):
+    """Order records by a dynamic field through the field value index.
+
+    The field type decides whether values sort as numbers, dates or text.
+    Records without a value for the field always come last.
+
+    Each record's value is looked up through the (employee, form_field)
+    index and the filtered records are then sorted as a whole before a page
+    is cut, so unlike the column orderings this is not served in index
+    order and its cost grows with the number of records matched. Records
+    without a value have no index row to walk, which is what keeps the
+    (form_field, value) indexes from driving the sort.
+    """
+    fields = data_fields(user, label, form_id)
+    column = sort_column(field.field_type for field in fields)
+    values = EmployeeFieldValue.objects.filter(
+        employee=OuterRef('pk'), form_field_id__in=[field.id for field in fields]
+    ).values(column)[:1]
+    queryset = queryset.annotate(**{SORT_VALUE: Subquery(values)})
+    # Ties (including every missing value) fall back to id, as in pagination
+    if descending:
+        return queryset.order_by(F(SORT_VALUE).desc(nulls_last=True), '-pk')
+    return queryset.order_by(F(SORT_VALUE).asc(nulls_last=True), 'pk')
+
+
+def order_employees(queryset, user, ordering, form_id=None):
+    """Apply a record ``ordering`` param: a whitelisted column or data.<label>"""
+    name, descending = split_ordering(ordering)
+    if name.startswith(DATA_ORDERING_PREFIX) and name != DATA_ORDERING_PREFIX:
+        return order_by_data(queryset, user, name[len(DATA_ORDERING_PREFIX):], descending, form_id)
+    choices = ', '.join(RECORD_ORDERING_FIELDS + (f'{DATA_ORDERING_PREFIX}<label>',))
+    return order_by_column(queryset, ordering, RECORD_ORDERING_FIELDS, choices)
@@ -0,0 +1,149 @@
+import base64
+import json
+from collections import OrderedDict
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, OrderBy, Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class RecordCursorPagination(BasePagination):
+    """Keyset pagination over (<ordering field>, id).
+
+    The ordering is taken from the queryset, so the view's ``ordering`` param
+    is respected, and ``id`` is used as a tie breaker so pages never overlap.
+    Orderings on annotated values (``ordering=data.<label>``) sort missing
+    values last, which the cursor filter accounts for.
+    Pagination is opt-in: it only applies when the client sends
+    ``page_size``, so existing clients keep receiving a plain list.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return None
+        try:
+            page_size = int(value)
+        except ValueError:
+            raise ValidationError({self.page_size_query_param: 'A valid integer is required.'})
+        if page_size <= 0:
+            raise ValidationError({self.page_size_query_param: 'Must be greater than zero.'})
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        """Return (field name, descending, nulls last) of the primary ordering"""
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        name = ordering[0] if ordering else 'pk'
+        if isinstance(name, OrderBy) and isinstance(name.expression, F):
+            return name.expression.name, name.descending, bool(name.nulls_last)
+        if not isinstance(name, str):
+            raise ValidationError({'ordering': 'This ordering cannot be paginated.'})
+        return name.lstrip('-'), name.startswith('-'), False
+
+    def get_value(self, obj, name):
+        try:
+            attname = obj._meta.get_field(name).attname
+        except FieldDoesNotExist:
+            attname = name
+        value = getattr(obj, attname)
+        return value.isoformat() if hasattr(value, 'isoformat') else value
+
+    def to_python(self, model, name, value):
+        try:
+            return model._meta.get_field(name).to_python(value)
+        except FieldDoesNotExist:
+            return value
+        except DjangoValidationError:
+            # A hand-edited cursor holding a value the column cannot take
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_filter(self, model, name, descending, nulls_last, cursor):
+        """Rows strictly after the cursor position"""
+        value, pk = cursor
+        op = 'lt' if descending else 'gt'
+        if value is None:
+            # Past the last non-null value only the null rows remain
+            return Q(**{f'{name}__isnull': True, f'pk__{op}': pk})
+        value = self.to_python(model, name, value)
+        after = Q(**{f'{name}__{op}': value}) | Q(**{name: value, f'pk__{op}': pk})
+        if nulls_last:
+            after |= Q(**{f'{name}__isnull': True})
+        return after
+
+    def encode_cursor(self, value, pk):
+        payload = json.dumps({'v': value, 'pk': pk}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            value, pk = payload['v'], int(payload['pk'])
+        except (TypeError, ValueError, KeyError, UnicodeEncodeError):
+            raise NotFound(self.invalid_cursor_message)
+        # Cursors only ever hold a scalar sort value
+        if not isinstance(value, (str, int, float, type(None))) or isinstance(value, bool):
+            raise NotFound(self.invalid_cursor_message)
+        return value, pk
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.request = request
+        name, descending, nulls_last = self.get_ordering(queryset)
+        prefix = '-' if descending else ''
+        if nulls_last:
+            primary = F(name).desc(nulls_last=True) if descending else F(name).asc(nulls_last=True)
+        else:
+            primary = f'{prefix}{name}'
+        queryset = queryset.order_by(primary, f'{prefix}pk')
+
+        cursor = self.decode_cursor(request)
+        if cursor is not None:
+            queryset = queryset.filter(self.cursor_filter(queryset.model, name, descending, nulls_last, cursor))
+
+        results = list(queryset[:self.page_size + 1])
+        self.has_next = len(results) > self.page_size
+        results = results[:self.page_size]
+        self.next_cursor = None
+        if self.has_next:
+            last = results[-1]
+            self.next_cursor = self.encode_cursor(self.get_value(last, name), last.pk)
+        return results
+
+    def get_next_link(self):
+        if not self.next_cursor:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_first_link(self):
+        url = self.request.build_absolute_uri()
+        return remove_query_param(url, self.cursor_query_param)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('first', self.get_first_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'first': {'type': 'string', 'format': 'uri'},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,246 @@
+"""Opt-in profiles of slow API requests.
+
+ProfilingMiddleware profiles a request in one of two ways:
+
+- ``cprofile``: a staff user sends the ``X-Profile`` header and the whole
+  request runs under cProfile.
+- ``sampling``: any request still running after ``PROFILER_SLOW_REQUEST_SECONDS``
+  has its thread's stack sampled every ``PROFILER_SAMPLE_INTERVAL`` seconds by
+  a background thread until it finishes.
+
+The top call stacks and the request details are kept in an in-memory ring
+buffer of ``PROFILER_BUFFER_SIZE`` entries per process, shown in the admin
+under Employees > Request profiles. A request that triggers neither only
+registers its thread with the sampler, so the cost stays close to zero.
+Requests served through the async (ASGI) handler are passed through
+unprofiled.
+"""
+import cProfile
+import io
+import itertools
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import timedelta
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils import timezone
+from employee_management.metrics import view_name
+from users.authentication import is_staff_request
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+MAX_STACK_DEPTH = 40
+
+_profiles = deque(maxlen=getattr(settings, 'PROFILER_BUFFER_SIZE', 50))
+_profile_ids = itertools.count(1)
+
+
+def get_slow_request_seconds():
+    """Latency after which requests are sampled; 0 or None disables sampling"""
+    return getattr(settings, 'PROFILER_SLOW_REQUEST_SECONDS', 1.0)
+
+
+def get_sample_interval():
+    return getattr(settings, 'PROFILER_SAMPLE_INTERVAL', 0.005)
+
+
+def get_top_stacks():
+    return getattr(settings, 'PROFILER_TOP_STACKS', 20)
+
+
+def get_profiles():
+    """Stored profiles, newest first"""
+    return list(reversed(_profiles))
+
+
+def clear_profiles():
+    _profiles.clear()
+
+
+def frame_location(path, lineno, name):
+    """``path:line function``, with paths shortened to the project or package"""
+    if path.startswith(str(settings.BASE_DIR)):
+        path = os.path.relpath(path, settings.BASE_DIR)
+    elif os.sep in path:
+        path = os.path.join(*path.split(os.sep)[-2:])
+    return f'{path}:{lineno} {name}'
+
+
+def frame_stack(frame):
+    """The stack of a frame, innermost call last"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(frame_location(frame.f_code.co_filename, frame.f_lineno, frame.f_code.co_name))
+        frame = frame.f_back
+    return tuple(reversed(stack))
+
+
+class SlowRequestSampler:
+    """Background thread sampling the stacks of requests past the threshold"""
+
+    def __init__(self, threshold, interval):
+        self.threshold = threshold
+        self.interval = interval
+        # thread id -> (monotonic time sampling starts, stack sample counts)
+        self.active = {}
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='slow-request-sampler', daemon=True)
+        self.thread.start()
+
+    def begin(self, thread_id):
+        with self.lock:
+            idle = not self.active
+            self.active[thread_id] = (time.monotonic() + self.threshold, Counter())
+            # Later requests are due after the one already waited for
+            if idle:
+                self.wakeup.set()
+
+    def end(self, thread_id):
+        """The stacks sampled from the request, if it ran past the threshold"""
+        with self.lock:
+            return self.active.pop(thread_id)[1]
+
+    def run(self):
+        while True:
+            with self.lock:
+                due = [(due_at, samples, thread_id) for thread_id, (due_at, samples) in self.active.items()]
+                self.wakeup.clear()
+            if not due:
+                self.wakeup.wait()
+                continue
+            now = time.monotonic()
+            overdue = [(samples, thread_id) for due_at, samples, thread_id in due if due_at <= now]
+            if not overdue:
+                # Sleep until the oldest request reaches the threshold
+                self.wakeup.wait(min(due_at for due_at, _, _ in due) - now)
+                continue
+            frames = sys._current_frames()
+            for samples, thread_id in overdue:
+                frame = frames.get(thread_id)
+                if frame is not None:
+                    samples[frame_stack(frame)] += 1
+            del frames
+            time.sleep(self.interval)
+
+
+_sampler = None
+_sampler_lock = threading.Lock()
+
+
+def get_sampler():
+    """The process-wide sampler, or None when sampling is disabled"""
+    global _sampler
+    threshold = get_slow_request_seconds()
+    if not threshold:
+        return None
+    with _sampler_lock:
+        if _sampler is None:
+            _sampler = SlowRequestSampler(threshold, get_sample_interval())
+    return _sampler
+
+
+def sampled_stacks(samples, interval):
+    """Top stacks by sample count, with their estimated time"""
+    return [
+        {'samples': count, 'ms': round(count * interval * 1000, 1), 'stack': list(stack)}
+        for stack, count in samples.most_common(get_top_stacks())
+    ]
+
+
+def cprofile_stacks(profiler, depth=8):
+    """Functions with the most time of their own, each with its heaviest callers"""
+    stats = pstats.Stats(profiler).stats
+    rows = sorted(stats.items(), key=lambda item: -item[1][2])[:get_top_stacks()]
+    stacks = []
+    for function, (_, calls, own, cumulative, callers) in rows:
+        stack = [frame_location(*function)]
+        seen = {function}
+        # Follow the caller that spent the most time in the function
+        while callers and len(stack) < depth:
+            caller = max(callers, key=lambda key: callers[key][3])
+            if caller in seen or caller not in stats:
+                break
+            seen.add(caller)
+            stack.insert(0, frame_location(*caller))
+            callers = stats[caller][4]
+        stacks.append({
+            'calls': calls,
+            'ms': round(cumulative * 1000, 1),
+            'own_ms': round(own * 1000, 1),
+            'stack': stack,
+        })
+    return stacks
+
+
+def cprofile_report(profiler):
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(get_top_stacks())
+    return stream.getvalue()
+
+
+def store_profile(request, response, mode, duration, stacks, report=''):
+    _profiles.append({
+        'id': next(_profile_ids),
+        'mode': mode,
+        'method': request.method,
+        'path': request.get_full_path(),
+        'view': view_name(request),
+        'user_id': getattr(getattr(request, 'user', None), 'id', None),
+        'status': response.status_code,
+        'duration_ms': round(duration * 1000, 1),
+        'started_at': timezone.now() - timedelta(seconds=duration),
+        'stacks': stacks,
+        'report': report,
+    })
+
+
+class ProfilingMiddleware:
+    """Profile staff requests sent with X-Profile, and sample slow requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sampler = None
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+            return
+        self.sampler = get_sampler()
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if request.META.get(PROFILE_HEADER) and is_staff_request(request):
+            return self.profile(request)
+        if self.sampler is None:
+            return self.get_response(request)
+
+        thread_id = threading.get_ident()
+        start = time.perf_counter()
+        self.sampler.begin(thread_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            samples = self.sampler.end(thread_id)
+        if samples:
+            duration = time.perf_counter() - start
+            store_profile(request, response, 'sampling', duration, sampled_stacks(samples, self.sampler.interval))
+        return response
+
+    def profile(self, request):
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            response = self.get_response(request)
+        finally:
+            profiler.disable()
+        duration = time.perf_counter() - start
+        store_profile(request, response, 'cprofile', duration, cprofile_stacks(profiler), cprofile_report(profiler))
+        response['X-Profile-Id'] = str(_profiles[-1]['id'])
+        return response
+
@@ -0,0 +1,17 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class CSVRenderer(JSONRenderer):
+    """Negotiates ``?format=csv``.
+
+    Export bodies are streamed directly, so only error responses pass
+    through this renderer and they are rendered as JSON.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class NDJSONRenderer(JSONRenderer):
+    """Negotiates ``?format=ndjson``; see CSVRenderer"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Separates the individual values inside Employee.search_text so that a search
+# term can never match across two different fields.
+SEARCH_TEXT_SEPARATOR = '\x1f'
+
+# Backends selected per request with ?search_mode=
+SEARCH_MODES = {
+    'words': 'employees.search_index.TokenSearchBackend',
+}
+
+
+def build_search_text(data):
+    """Flatten Employee.data into the lowercased text used for searching"""
+    if not data:
+        return ''
+    return SEARCH_TEXT_SEPARATOR.join(
+        str(value).lower() if value is not None else ''
+        for value in data.values()
+    )
+
+
+class BaseSearchBackend:
+    """Interface for record search backends"""
+
+    def filter(self, queryset, term, user=None):
+        """Return a lazy queryset restricted to records of user matching term"""
+        raise NotImplementedError
+
+
+class SearchTextBackend(BaseSearchBackend):
+    """Substring search over the denormalized Employee.search_text column.
+
+    Matches exactly like ``term.lower() in str(value).lower()`` for any value
+    of Employee.data, but runs as a single LIKE in the database.
+    """
+
+    def filter(self, queryset, term, user=None):
+        term = term.lower()
+        if SEARCH_TEXT_SEPARATOR in term:
+            return queryset.none()
+        return queryset.filter(search_text__contains=term)
+
+
+def get_search_backend(mode=None):
+    """Return the backend of a search mode, or the one configured by EMPLOYEES_SEARCH_BACKEND"""
+    path = SEARCH_MODES.get(mode) or getattr(settings, 'EMPLOYEES_SEARCH_BACKEND', 'employees.search.SearchTextBackend')
+    return import_string(path)()
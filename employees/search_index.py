@@ -0,0 +1,291 @@
+"""Token index over Employee.data for prefix and typo-tolerant search.
+
+Each field value is split into lowercased word tokens stored in SearchToken
+(with the value they came from), so prefixes are answered by a range scan
+of the (owner, token) index. SearchTrigram maps the trigrams of every token
+a user has to that token; a misspelt word finds its candidates through the
+trigrams it shares with them, and they are ordered by trigram similarity.
+``suggest`` ranks the values it offers; TokenSearchBackend only filters.
+The index is rebuilt with the field value index (see indexing.py), and the
+trigrams of tokens no record contains any more are pruned as records are
+reindexed or deleted.
+"""
+import re
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import Count, Exists, OuterRef, Q
+from .models import SearchToken, SearchTrigram
+from .search import BaseSearchBackend
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TOKEN_LENGTH = 64
+MAX_VALUE_LENGTH = 255
+# Values of these field types are never indexed, so they cannot be suggested
+UNINDEXED_FIELD_TYPES = ('password',)
+
+# Minimum trigram similarity of a typo candidate, and how many are used
+SIMILARITY_THRESHOLD = 0.3
+MAX_SIMILAR_TOKENS = 20
+# Prefix matches scanned per suggestion request; bounds very short prefixes
+MAX_SCANNED_TOKENS = 2000
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+
+def tokenize(text):
+    return [token[:MAX_TOKEN_LENGTH] for token in TOKEN_RE.findall(str(text).lower())]
+
+
+def trigrams(token):
+    """Trigrams of a token padded like pg_trgm (two leading blanks, one trailing)"""
+    padded = f'  {token} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+
+def edit_distance(left, right):
+    """Edits (insert, delete, substitute, swap neighbours) turning left into right"""
+    previous, current = None, list(range(len(right) + 1))
+    for i, left_char in enumerate(left, 1):
+        before, previous, current = previous, current, [i] + [0] * len(right)
+        for j, right_char in enumerate(right, 1):
+            cost = left_char != right_char
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and left_char == right[j - 2] and left[i - 2] == right_char:
+                current[j] = min(current[j], before[j - 2] + 1)
+    return current[-1]
+
+
+def similarity(left, right):
+    """Trigram similarity, raised for words within a typo or two of each other.
+
+    Short words share few trigrams, so a single swapped letter ("jhon") would
+    otherwise fall below the threshold.
+    """
+    left_trigrams, right_trigrams = trigrams(left), trigrams(right)
+    score = len(left_trigrams & right_trigrams) / len(left_trigrams | right_trigrams)
+    longest = max(len(left), len(right))
+    distance = edit_distance(left, right)
+    if distance <= (1 if longest <= 5 else 2):
+        score = max(score, 1 - distance / longest)
+    return score
+
+
+def field_values(value):
+    """The individual values of a field; checkbox lists hold several"""
+    values = value if isinstance(value, list) else [value]
+    return [str(item) for item in values if item not in (None, '')]
+
+
+def build_search_tokens(employee, fields):
+    """Build (unsaved) SearchToken rows for an employee's data (fields are CompiledFields)"""
+    data = employee.data or {}
+    tokens = []
+    for field in fields:
+        stored = field.value(data, None)
+        if field.field_type in UNINDEXED_FIELD_TYPES or stored is None:
+            continue
+        for value in field_values(stored):
+            for token in dict.fromkeys(tokenize(value)):
+                tokens.append(SearchToken(
+                    created_by_id=employee.created_by_id,
+                    employee_id=employee.pk,
+                    form_field_id=field.id,
+                    token=token,
+                    value=value[:MAX_VALUE_LENGTH],
+                ))
+    return tokens
+
+
+def build_trigrams(tokens):
+    """(Unsaved) SearchTrigram rows for new tokens; duplicates are ignored on insert"""
+    seen = set()
+    rows = []
+    for token in tokens:
+        key = (token.created_by_id, token.token)
+        if key in seen:
+            continue
+        seen.add(key)
+        rows.extend(
+            SearchTrigram(created_by_id=token.created_by_id, trigram=trigram, token=token.token)
+            for trigram in trigrams(token.token)
+        )
+    return rows
+
+
+def save_search_tokens(employee_ids, tokens, batch_size=1000, replace=True):
+    """Replace the tokens of the given employees (call inside a transaction).
+
+    Pass ``replace=False`` for new employees, which have no tokens to remove.
+    """
+    old_tokens = set()
+    if replace:
+        previous = SearchToken.objects.filter(employee__in=employee_ids)
+        old_tokens = set(previous.values_list('created_by_id', 'token').distinct())
+        previous.delete()
+    SearchToken.objects.bulk_create(tokens, batch_size=batch_size)
+    SearchTrigram.objects.bulk_create(build_trigrams(tokens), batch_size=batch_size, ignore_conflicts=True)
+    if old_tokens:
+        prune_trigrams(old_tokens - {(token.created_by_id, token.token) for token in tokens})
+
+
+def prune_trigrams(owner_tokens, batch_size=500):
+    """Delete the trigrams of (owner id, token) pairs no record of the owner contains any more"""
+    by_owner = defaultdict(set)
+    for owner_id, token in owner_tokens:
+        by_owner[owner_id].add(token)
+    for owner_id, tokens in by_owner.items():
+        tokens = list(tokens)
+        for start in range(0, len(tokens), batch_size):
+            chunk = tokens[start:start + batch_size]
+            live = SearchToken.objects.filter(created_by_id=owner_id, token__in=chunk).values_list('token', flat=True)
+            gone = set(chunk) - set(live)
+            if gone:
+                SearchTrigram.objects.filter(created_by_id=owner_id, token__in=gone).delete()
+
+
+def prune_deleted_tokens(employees, fields_by_form):
+    """Prune the trigrams of deleted records' tokens, whose SearchToken rows were cascaded.
+
+    The tokens are rebuilt from the records' data; ``fields_by_form`` maps
+    form id to its CompiledFields.
+    """
+    prune_trigrams({
+        (token.created_by_id, token.token)
+        for employee in employees
+        for token in build_search_tokens(employee, fields_by_form[employee.form_id])
+    })
+
+
+def prune_orphaned_trigrams(owner_ids=None):
+    """Delete every trigram whose token no record of its owner contains; returns the rows deleted"""
+    trigrams = SearchTrigram.objects.exclude(Exists(
+        SearchToken.objects.filter(created_by_id=OuterRef('created_by_id'), token=OuterRef('token'))
+    ))
+    if owner_ids is not None:
+        trigrams = trigrams.filter(created_by_id__in=owner_ids)
+    return trigrams.delete()[0]
+
+
+def get_field_boosts():
+    """Per-label ranking weights from EMPLOYEES_SEARCH_BOOSTS (default 1.0)"""
+    return getattr(settings, 'EMPLOYEES_SEARCH_BOOSTS', {})
+
+
+def similar_tokens(user_id, word):
+    """Tokens of the user's records similar to word, as {token: similarity}"""
+    if len(word) < 3:
+        return {}
+    word_trigrams = trigrams(word)
+    # Only tokens some record still contains, should a stale trigram remain
+    live_tokens = SearchToken.objects.filter(created_by_id=user_id).values('token')
+    candidates = (
+        SearchTrigram.objects.filter(created_by_id=user_id, trigram__in=word_trigrams, token__in=live_tokens)
+        .values_list('token').annotate(shared=Count('pk')).order_by('-shared')[:MAX_SIMILAR_TOKENS * 5]
+    )
+    scores = {}
+    for token, _ in candidates:
+        score = similarity(word, token)
+        if score >= SIMILARITY_THRESHOLD:
+            scores[token] = score
+    best = sorted(scores.items(), key=lambda item: -item[1])[:MAX_SIMILAR_TOKENS]
+    return dict(best)
+
+
+def prefix_condition(word):
+    """Index range equivalent of ``token LIKE 'word%'``"""
+    return Q(token__gte=word, token__lt=word + '\uffff')
+
+
+def word_condition(user_id, word):
+    """Tokens matching a search word: by prefix, or by similarity if none do"""
+    prefix = prefix_condition(word)
+    if SearchToken.objects.filter(prefix, created_by_id=user_id).exists():
+        return prefix
+    similar = similar_tokens(user_id, word)
+    return Q(token__in=list(similar)) if similar else None
+
+
+def suggest(user, query, form_id=None, limit=DEFAULT_SUGGESTIONS):
+    """Field values to offer while typing ``query``, best first.
+
+    The last word is completed as a prefix (or corrected when nothing starts
+    with it); values score by how they matched, weighted by the field boost.
+    """
+    words = tokenize(query)
+    if not words:
+        return []
+    word = words[-1]
+    tokens = SearchToken.objects.filter(created_by_id=user.id)
+    if form_id:
+        tokens = tokens.filter(employee__form_id=form_id)
+    # Earlier words must also occur in the suggested record
+    for previous in words[:-1]:
+        condition = word_condition(user.id, previous)
+        if condition is None:
+            return []
+        tokens = tokens.filter(employee__in=SearchToken.objects.filter(
+            condition, created_by_id=user.id
+        ).values('employee_id'))
+
+    rows = list(_group_values(tokens.filter(prefix_condition(word))))
+    if rows:
+        # Exact words rank above completions
+        weights = {token: 1.0 if token == word else 0.8 for *_, token, _ in rows}
+    else:
+        similar = similar_tokens(user.id, word)
+        rows = list(_group_values(tokens.filter(token__in=list(similar)))) if similar else []
+        weights = {token: score * 0.8 for token, score in similar.items()}
+
+    # A value scores by its best matching word, weighted by its field's boost
+    boosts = get_field_boosts()
+    suggestions = {}
+    for field_id, label, value, token, count in rows:
+        score = weights[token] * boosts.get(label, 1.0)
+        best = suggestions.get((field_id, label, value))
+        if best is None or (score, count) > best:
+            suggestions[(field_id, label, value)] = (score, count)
+
+    # Fields of different forms sharing a label are merged
+    merged = defaultdict(lambda: [0.0, 0])
+    for (field_id, label, value), (score, count) in suggestions.items():
+        entry = merged[(label, value)]
+        entry[0] = max(entry[0], score)
+        entry[1] += count
+    ranked = sorted(merged.items(), key=lambda item: (-item[1][0], -item[1][1], item[0][1]))
+    return [
+        {'value': value, 'field': label, 'count': count, 'score': round(score, 3)}
+        for (label, value), (score, count) in ranked[:limit]
+    ]
+
+
+def _group_values(tokens):
+    """(field id, label, value, token, records) for a bounded sample of matching tokens"""
+    sample = tokens.order_by('token').values('pk')[:MAX_SCANNED_TOKENS]
+    return (
+        SearchToken.objects.filter(pk__in=sample)
+        .values_list('form_field_id', 'form_field__label', 'value', 'token')
+        .annotate(count=Count('employee_id', distinct=True))
+        .order_by('-count')
+    )
+
+
+class TokenSearchBackend(BaseSearchBackend):
+    """Word search over the SearchToken index.
+
+    Every word of the term must start a word of some field value; a word
+    nothing starts with matches its most similar tokens instead, so small
+    typos still find the record.
+    """
+
+    def filter(self, queryset, term, user=None):
+        # The index is per owner, so the user whose records are searched is required
+        words = tokenize(term)
+        if not words:
+            return queryset.none()
+        for word in dict.fromkeys(words):
+            condition = word_condition(user.id, word)
+            if condition is None:
+                return queryset.none()
+            matches = SearchToken.objects.filter(condition, created_by_id=user.id)
+            queryset = queryset.filter(pk__in=matches.values('employee_id'))
+        return queryset
@@ -1,48 +1,130 @@
 from rest_framework import serializers
-from django.core.validators import validate_email
-from django.core.exceptions import ValidationError as DjangoValidationError
-from datetime import datetime
-from .models import DynamicForm, FormField, Employee
+from django.db import transaction
+from .models import DynamicForm, FormField, FormStats, Employee
+from .form_stats import rebuild_form_stats, rename_stats_labels
+from .indexing import reindex_employees
+from .validation import compile_forms, get_compiled_form, invalidate_compiled_form, relabel
 
 class FormFieldSerializer(serializers.ModelSerializer):
+    # Writable so that form updates can match incoming fields to existing ones
+    id = serializers.IntegerField(required=False)
+
     class Meta:
         model = FormField
         fields = ('id', 'label', 'field_type', 'is_required', 'options', 'order', 'placeholder', 'default_value')
-        read_only_fields = ('id',)
+
+class FormStatsSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = FormStats
+        fields = ('record_count', 'last_record_at', 'option_counts')
 
 class DynamicFormSerializer(serializers.ModelSerializer):
     fields = FormFieldSerializer(many=True, required=False)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
+    stats = FormStatsSerializer(read_only=True)
+
+    # FormField columns written when an existing field is updated in place
+    FIELD_UPDATE_COLUMNS = ('label', 'field_type', 'is_required', 'options', 'order', 'placeholder', 'default_value')
 
     class Meta:
         model = DynamicForm
-        fields = ('id', 'name', 'description', 'fields', 'created_by', 'created_by_username', 'created_at', 'updated_at')
+        fields = ('id', 'name', 'description', 'fields', 'stats', 'created_by', 'created_by_username', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_by', 'created_at', 'updated_at')
 
     def create(self, validated_data):
         fields_data = validated_data.pop('fields', [])
-        form = DynamicForm.objects.create(**validated_data)
-        
-        for field_data in fields_data:
-            FormField.objects.create(form=form, **field_data)
-        
+        with transaction.atomic():
+            form = DynamicForm.objects.create(**validated_data)
+            FormField.objects.bulk_create([
+                FormField(form=form, **self.without_id(field_data)) for field_data in fields_data
+            ])
         return form
 
     def update(self, instance, validated_data):
         fields_data = validated_data.pop('fields', None)
         
-        instance.name = validated_data.get('name', instance.name)
-        instance.description = validated_data.get('description', instance.description)
-        instance.save()
-        
-        if fields_data is not None:
-            # Delete existing fields and create new ones
-            instance.fields.all().delete()
-            for field_data in fields_data:
-                FormField.objects.create(form=instance, **field_data)
+        with transaction.atomic():
+            instance.name = validated_data.get('name', instance.name)
+            instance.description = validated_data.get('description', instance.description)
+            instance.save()
+            
+            if fields_data is not None:
+                self.sync_fields(instance, fields_data)
         
+        invalidate_compiled_form(instance.pk)
         return instance
 
+    @staticmethod
+    def without_id(field_data):
+        return {key: value for key, value in field_data.items() if key != 'id'}
+
+    def sync_fields(self, form, fields_data):
+        """Apply the submitted field list as a diff against the stored fields.
+
+        Incoming fields are matched by id, then by label. Matched fields keep
+        their id and are replaced in place, unmatched ones are created and
+        stored fields missing from the list are deleted. Records of ID_KEYED
+        forms store values by field id, so renaming a field leaves them as
+        they are.
+        """
+        existing = {field.pk: field for field in form.fields.all()}
+        by_label = {field.label: field for field in existing.values()}
+        id_keyed = form.schema_version >= DynamicForm.ID_KEYED
+        matched = set()
+        to_update, to_create = [], []
+        renames = {}
+        reindex = False
+
+        for field_data in fields_data:
+            current = existing.get(field_data.get('id'))
+            if current is None or current.pk in matched:
+                current = by_label.get(field_data.get('label'))
+            if current is None or current.pk in matched:
+                to_create.append(FormField(form=form, **self.without_id(field_data)))
+                continue
+
+            # Fields omitted from the payload fall back to their defaults
+            replacement = FormField(form=form, **self.without_id(field_data))
+            replacement.pk = current.pk
+            if replacement.field_type != current.field_type:
+                reindex = True
+            elif replacement.label != current.label:
+                if id_keyed:
+                    renames[current.label] = replacement.label
+                else:
+                    reindex = True
+            matched.add(current.pk)
+            to_update.append(replacement)
+
+        removed = [pk for pk in existing if pk not in matched]
+        if removed:
+            FormField.objects.filter(pk__in=removed).delete()
+        if to_update:
+            FormField.objects.bulk_update(to_update, self.FIELD_UPDATE_COLUMNS)
+        if to_create:
+            FormField.objects.bulk_create(to_create)
+            # A new id has no stored values; a new label may have some
+            reindex = reindex or not id_keyed
+
+        # Retyped fields (and renamed or new ones of label-keyed forms) change
+        # which values are indexed and under which labels options are counted
+        invalidate_compiled_form(form.pk)
+        if reindex:
+            reindex_employees(form.employees.all())
+            rebuild_form_stats(DynamicForm.objects.filter(pk=form.pk).prefetch_related('fields'))
+        elif renames:
+            rename_stats_labels(form.pk, renames)
+
+class EmployeeListSerializer(serializers.ListSerializer):
+    """Compiles the forms of all listed records up front, in one query"""
+
+    def to_representation(self, data):
+        records = list(data.all() if hasattr(data, 'all') else data)
+        if 'field_labels' not in self.context:
+            compile_forms(record.form for record in records)
+        return super().to_representation(records)
+
+
 class EmployeeSerializer(serializers.ModelSerializer):
     form_name = serializers.CharField(source='form.name', read_only=True)
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
@@ -52,91 +134,61 @@ class EmployeeSerializer(serializers.ModelSerializer):
         model = Employee
         fields = ('id', 'form', 'form_name', 'form_fields', 'data', 'created_by', 'created_by_username', 'created_at', 'updated_at')
         read_only_fields = ('id', 'created_by', 'created_at', 'updated_at')
+        list_serializer_class = EmployeeListSerializer
 
-    def get_form_fields(self, obj):
-        """Return form fields for reference"""
-        return FormFieldSerializer(obj.form.fields.all(), many=True).data
+    def create(self, validated_data):
+        # The post_save signal indexes the record in the same transaction
+        with transaction.atomic():
+            return super().create(validated_data)
 
-    def validate_field_value(self, field, value):
-        """Validate individual field value based on field type"""
-        if not value and not field.is_required:
-            return True
-        
-        field_type = field.field_type
-        
-        try:
-            if field_type == 'number':
-                # Check if value can be converted to number
-                float(str(value))
-            
-            elif field_type == 'email':
-                # Validate email format
-                validate_email(str(value))
-            
-            elif field_type == 'date':
-                # Validate date format (expecting YYYY-MM-DD or similar)
-                if isinstance(value, str):
-                    # Try multiple date formats
-                    date_formats = ['%Y-%m-%d', '%d-%m-%Y', '%m/%d/%Y', '%d/%m/%Y']
-                    valid = False
-                    for fmt in date_formats:
-                        try:
-                            datetime.strptime(value, fmt)
-                            valid = True
-                            break
-                        except ValueError:
-                            continue
-                    if not valid:
-                        raise ValueError("Invalid date format")
-            
-            elif field_type in ['select', 'radio']:
-                # Validate that value is in options
-                if field.options and isinstance(field.options, list):
-                    if str(value) not in [str(opt) for opt in field.options]:
-                        raise ValueError(f"Value must be one of: {', '.join(map(str, field.options))}")
-            
-            elif field_type == 'checkbox':
-                # Validate checkbox value (should be list if multiple, or boolean)
-                if field.options and isinstance(field.options, list):
-                    if isinstance(value, list):
-                        for v in value:
-                            if str(v) not in [str(opt) for opt in field.options]:
-                                raise ValueError(f"Invalid checkbox value: {v}")
-                    else:
-                        # Single value
-                        if str(value) not in [str(opt) for opt in field.options]:
-                            raise ValueError(f"Value must be one of: {', '.join(map(str, field.options))}")
-            
-            return True
-            
-        except (ValueError, DjangoValidationError) as e:
-            return str(e)
+    def update(self, instance, validated_data):
+        with transaction.atomic():
+            return super().update(instance, validated_data)
+
+    def to_representation(self, instance):
+        representation = super().to_representation(instance)
+        if 'data' in representation:
+            representation['data'] = relabel(representation['data'], self.labels_by_key(instance))
+        return representation
+
+    def labels_by_key(self, obj):
+        """Field labels of the record's form by stored key, from the context or the compiled form.
+
+        With ``field_labels`` in the context no query is made, so it is safe
+        to call from async views.
+        """
+        labels = self.context.get('field_labels')
+        if labels is not None:
+            return labels.get(obj.form_id, {})
+        return get_compiled_form(obj.form).labels_by_key
+
+    def get_fields(self):
+        fields = super().get_fields()
+        # List views only embed the form schema when asked for it
+        if not self.context.get('include_form_fields', True):
+            fields.pop('form_fields', None)
+        return fields
+
+    def get_form_fields(self, obj):
+        """Return form fields for reference, serialized once per form per response"""
+        cache = self.context.setdefault('form_fields_cache', {})
+        if obj.form_id not in cache:
+            cache[obj.form_id] = FormFieldSerializer(obj.form.fields.all(), many=True).data
+        return cache[obj.form_id]
 
     def validate(self, attrs):
         form = attrs.get('form')
         data = attrs.get('data', {})
         
-        errors = {}
-        
-        # Validate each field in the form
-        for field in form.fields.all():
-            value = data.get(field.label)
-            
-            # Check if required field is missing
-            if field.is_required:
-                if value is None or value == '' or (isinstance(value, str) and not value.strip()):
-                    errors[field.label] = f"{field.label} is required."
-                    continue
-            
-            # Validate field type if value is provided
-            if value is not None and value != '':
-                validation_result = self.validate_field_value(field, value)
-                if validation_result is not True:
-                    errors[field.label] = validation_result
-        
+        # Validate against the form's cached, precompiled field rules
+        compiled = get_compiled_form(form)
+        errors = compiled.validate(data)
         if errors:
             raise serializers.ValidationError(errors)
-        
+
+        # Clients send and receive values by label; ID_KEYED forms store them by field id
+        if 'data' in attrs:
+            attrs['data'] = compiled.to_storage(data)
         return attrs
 
 class EmployeeSearchSerializer(serializers.Serializer):
@@ -0,0 +1,87 @@
+from django.db import transaction
+from django.db.models import QuerySet
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+from .cache import bump_generation_on_commit
+from .form_stats import capture_state, record_deleted, record_saved, saves_data
+from .indexing import sync_field_values
+from .models import DynamicForm, Employee, FormField, FormStats
+from .search_index import prune_deleted_tokens, prune_orphaned_trigrams
+from .validation import get_compiled_form, invalidate_compiled_form
+
+
+def touch_form(form_id):
+    """Bump a form's updated_at so cached schema derived from it goes stale"""
+    invalidate_compiled_form(form_id)
+    DynamicForm.objects.filter(pk=form_id).update(updated_at=timezone.now())
+
+
+def form_owner_id(field):
+    """Return the id of the user owning a field's form"""
+    if FormField.form.is_cached(field):
+        return field.form.created_by_id
+    return DynamicForm.objects.filter(pk=field.form_id).values_list('created_by_id', flat=True).first()
+
+
+@receiver(post_save, sender=FormField)
+@receiver(post_delete, sender=FormField)
+def form_field_changed(sender, instance, **kwargs):
+    touch_form(instance.form_id)
+    owner_id = form_owner_id(instance)
+    if owner_id is not None:
+        bump_generation_on_commit(owner_id, 'forms')
+
+
+@receiver(post_save, sender=DynamicForm)
+def form_saved(sender, instance, created, **kwargs):
+    if created:
+        FormStats.objects.get_or_create(form=instance)
+    bump_generation_on_commit(instance.created_by_id, 'forms')
+
+
+@receiver(post_delete, sender=DynamicForm)
+def form_deleted(sender, instance, **kwargs):
+    invalidate_compiled_form(instance.pk)
+    # Its records were deleted along with it, without invalidating one by one
+    bump_generation_on_commit(instance.created_by_id, 'forms')
+    bump_generation_on_commit(instance.created_by_id, 'records')
+    prune_orphaned_trigrams([instance.created_by_id])
+
+
+def is_cascade(origin):
+    """Whether a delete started from another model (a form or user) than Employee"""
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not Employee
+
+
+@receiver(pre_save, sender=Employee)
+def employee_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        capture_state(instance, update_fields)
+
+
+@receiver(post_save, sender=Employee)
+def employee_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        # Indexed here rather than in the API so records saved anywhere
+        # (admin, shell, commands) can be searched and filtered. Both steps
+        # share one transaction, the caller's when there is one.
+        with transaction.atomic(savepoint=False):
+            if saves_data(update_fields):
+                sync_field_values(instance, get_compiled_form(instance.form).fields, created=created)
+            record_saved(instance, created)
+    bump_generation_on_commit(instance.created_by_id, 'records')
+
+
+@receiver(post_delete, sender=Employee)
+def employee_deleted(sender, instance, origin=None, **kwargs):
+    # Bulk deletes (see bulk.delete_records) update stats and caches once per
+    # form; records of a deleted form or user lose their stats row with it
+    if getattr(instance, '_bulk_deleted', False) or is_cascade(origin):
+        return
+    record_deleted(instance)
+    prune_deleted_tokens([instance], {instance.form_id: get_compiled_form(instance.form).fields})
+    bump_generation_on_commit(instance.created_by_id, 'records')
@@ -0,0 +1,221 @@
+"""Aggregations over employee records, computed in the database.
+
+Numbers and dates are aggregated from the typed columns of the
+EmployeeFieldValue index (chosen from ``FormField.field_type``), so only the
+aggregated values ever leave the database. Without search or field filters
+the field ids alone select the user's records and the aggregates are read
+straight from the (form_field, value) indexes; otherwise the values are
+restricted to the filtered records with an ``employee IN (...)`` subquery.
+"""
+from collections import Counter
+from django.db.models import Avg, Count, F, IntegerField, Max, Min, Value
+from django.db.models.functions import Cast, Least
+from rest_framework.exceptions import ValidationError
+from .filters import FIELD_FILTER_PREFIX
+from .models import EmployeeFieldValue
+from .ordering import SORT_COLUMNS, data_fields, sort_column
+
+STATS_METRICS = ('count', 'avg', 'min', 'max', 'histogram')
+DEFAULT_BINS = 10
+MAX_BINS = 100
+MAX_GROUPS = 100
+
+AGGREGATES = {
+    'avg': Avg,
+    'min': Min,
+    'max': Max,
+}
+
+
+def parse_metrics(value):
+    """Parse ``count,avg:<label>,min,max`` into [(metric, label)].
+
+    A metric without a label applies to the label of the metric before it.
+    """
+    metrics = []
+    label = None
+    for item in (value or 'count').split(','):
+        item = item.strip()
+        if not item:
+            continue
+        name, _, item_label = item.partition(':')
+        if name not in STATS_METRICS:
+            raise ValidationError({'metrics': f'Unknown metric "{name}". Must be one of: {", ".join(STATS_METRICS)}.'})
+        if name == 'count':
+            continue
+        label = item_label or label
+        if not label:
+            raise ValidationError({'metrics': f'"{name}" needs a field, e.g. {name}:<label>.'})
+        if (name, label) not in metrics:
+            metrics.append((name, label))
+    return metrics
+
+
+def parse_bins(value):
+    if value is None:
+        return DEFAULT_BINS
+    try:
+        bins = int(value)
+    except ValueError:
+        raise ValidationError({'bins': 'A valid integer is required.'})
+    return max(1, min(bins, MAX_BINS))
+
+
+class FieldColumn:
+    """The typed EmployeeFieldValue column of a dynamic field"""
+
+    def __init__(self, user, label, form_id=None, param='metrics'):
+        self.label = label
+        self.fields = data_fields(user, label, form_id, param=param)
+        self.field_ids = [field.id for field in self.fields]
+        self.column = sort_column(field.field_type for field in self.fields)
+
+    def require_typed(self, metric):
+        if self.column not in SORT_COLUMNS.values():
+            raise ValidationError({'metrics': f'"{metric}:{self.label}" needs a number or date field.'})
+        if metric == 'avg' and self.column != 'numeric_value':
+            raise ValidationError({'metrics': f'"avg:{self.label}" needs a number field.'})
+
+
+class RecordStats:
+    """Compute the ``/records/stats`` response for a filtered records queryset"""
+
+    def __init__(self, user, employees, query_params):
+        self.user = user
+        self.employees = employees.order_by()
+        self.form_id = query_params.get('form_id')
+        self.metrics = parse_metrics(query_params.get('metrics'))
+        self.bins = parse_bins(query_params.get('bins'))
+        self.group_label = query_params.get('group_by')
+        # form_id is already applied by resolving the fields within that form
+        self.filtered = bool(query_params.get('search')) or any(
+            key.startswith(FIELD_FILTER_PREFIX) for key in query_params
+        )
+        self.columns = {}
+        for name, label in self.metrics:
+            if label not in self.columns:
+                self.columns[label] = FieldColumn(user, label, self.form_id)
+            self.columns[label].require_typed(name)
+
+    def values(self, column):
+        """Index rows of a field for the filtered records"""
+        values = EmployeeFieldValue.objects.filter(form_field_id__in=column.field_ids)
+        if self.filtered:
+            values = values.filter(employee__in=self.employees.values('pk'))
+        return values
+
+    def aggregates(self, label):
+        """The avg/min/max aggregates requested for one field, keyed ``<metric>:<label>``"""
+        column = self.columns[label].column
+        return {
+            f'{name}:{label}': AGGREGATES[name](column)
+            for name, metric_label in self.metrics if metric_label == label and name in AGGREGATES
+        }
+
+    def compute(self):
+        result = {'count': self.employees.count()}
+        if self.metrics:
+            values = {}
+            for label, column in self.columns.items():
+                aggregates = self.aggregates(label)
+                if aggregates:
+                    # Every avg/min/max of the same field in one query
+                    values.update(self.values(column).aggregate(**aggregates))
+            for name, label in self.metrics:
+                if name == 'histogram':
+                    values[f'histogram:{label}'] = self.histogram(self.columns[label])
+            result['metrics'] = {f'{name}:{label}': values[f'{name}:{label}'] for name, label in self.metrics}
+        if self.group_label:
+            result['groups'] = self.groups(result['count'])
+        return result
+
+    def histogram(self, column):
+        if column.column == 'numeric_value':
+            return self.numeric_histogram(column)
+        return self.date_histogram(column)
+
+    def numeric_histogram(self, column):
+        """Equal-width buckets between the smallest and largest value"""
+        values = self.values(column).filter(numeric_value__isnull=False)
+        bounds = values.aggregate(low=Min('numeric_value'), high=Max('numeric_value'))
+        low, high = bounds['low'], bounds['high']
+        if low is None:
+            return []
+        bins = self.bins if high > low else 1
+        width = (high - low) / bins or 1.0
+        # The offset is never negative, so truncating to an integer floors it
+        bucket = Least(
+            Cast((F('numeric_value') - Value(low)) / Value(width), IntegerField()), Value(bins - 1),
+        )
+        counts = dict(values.annotate(bucket=bucket).order_by().values_list('bucket').annotate(count=Count('pk')))
+        return [
+            {'from': low + index * width, 'to': low + (index + 1) * width, 'count': counts.get(index, 0)}
+            for index in range(bins)
+        ]
+
+    def date_histogram(self, column):
+        """Record counts per calendar month"""
+        # Count per distinct date in the database and fold into months here,
+        # which avoids a per-row date truncation function
+        rows = (
+            self.values(column).filter(date_value__isnull=False)
+            .order_by().values_list('date_value').annotate(count=Count('pk'))
+        )
+        months = Counter()
+        for day, count in rows:
+            months[day.strftime('%Y-%m')] += count
+        return [{'month': month, 'count': count} for month, count in sorted(months.items())]
+
+    def groups(self, total):
+        """Counts and avg/min/max per value of the group_by field (top MAX_GROUPS by count)"""
+        group = FieldColumn(self.user, self.group_label, self.form_id, param='group_by')
+        counts = list(
+            self.values(group).order_by().values_list('normalized_value')
+            .annotate(count=Count('pk')).order_by('-count', 'normalized_value')
+        )
+        # Records without a value for the group field form the null group
+        missing = total - sum(count for _, count in counts)
+        counts = counts[:MAX_GROUPS]
+        if missing > 0:
+            counts.append((None, missing))
+
+        keys = {key for key, _ in counts}
+        per_group = {}
+        for label, column in self.columns.items():
+            aggregates = self.aggregates(label)
+            if not aggregates:
+                continue
+            # Pair each metric value with the group value of the same record
+            rows = (
+                self.values(column)
+                .filter(employee__field_values__form_field_id__in=group.field_ids)
+                .order_by().values('employee__field_values__normalized_value').annotate(**aggregates)
+            )
+            for row in rows:
+                key = row.pop('employee__field_values__normalized_value')
+                if key in keys:
+                    per_group.setdefault(key, {}).update(row)
+            if missing > 0:
+                per_group.setdefault(None, {}).update(
+                    self.values(column).exclude(employee__field_values__form_field_id__in=group.field_ids)
+                    .aggregate(**aggregates)
+                )
+
+        aggregated = [f'{name}:{label}' for name, label in self.metrics if name in AGGREGATES]
+        display = group_display(group.fields)
+        groups = []
+        for key, count in counts:
+            entry = {'value': display.get(key, key), 'count': count}
+            if aggregated:
+                entry['metrics'] = {name: per_group.get(key, {}).get(name) for name in aggregated}
+            groups.append(entry)
+        return groups
+
+
+def group_display(fields):
+    """Map normalized values back to the option spelling for choice fields"""
+    display = {}
+    for field in fields:
+        for option in field.options or []:
+            display.setdefault(str(option).lower(), option)
+    return display
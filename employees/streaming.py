@@ -0,0 +1,31 @@
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def iter_json_array(items, chunk_size=500):
+    """Yield a JSON array one chunk of items at a time"""
+    encode = JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+    yield '['
+    buffer = []
+    first = True
+    for item in items:
+        buffer.append(encode(item))
+        if len(buffer) >= chunk_size:
+            yield ('' if first else ',') + ','.join(buffer)
+            buffer = []
+            first = False
+    if buffer:
+        yield ('' if first else ',') + ','.join(buffer)
+    yield ']'
+
+
+def stream_queryset(queryset, serializer, chunk_size=2000):
+    """Stream a queryset as a JSON array without building the full list.
+
+    ``serializer`` is a single (non-many) serializer instance whose
+    ``to_representation`` is reused for every row.
+    """
+    items = (serializer.to_representation(obj) for obj in queryset.iterator(chunk_size=chunk_size))
+    response = StreamingHttpResponse(iter_json_array(items), content_type='application/json')
+    response['Cache-Control'] = 'no-store'
+    return response
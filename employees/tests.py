@@ -1,3 +1,963 @@
-from django.test import TestCase
+import base64
+import csv
+import json
+import time
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from .cache import get_cache, get_cache_timeout
+from .field_keys import migrate_form_keys, rekey
+from .form_stats import rebuild_form_stats
+from .models import DynamicForm, Employee, EmployeeFieldValue, FormField, FormStats, SearchTrigram
+from .profiling import ProfilingMiddleware, SlowRequestSampler, clear_profiles, get_profiles
+from .search_index import trigrams
+from .validation import get_compiled_form, invalidate_compiled_form
 
-# Create your tests here.
+User = get_user_model()
+
+RECORDS_URL = '/api/employees/records/'
+
+
+class RecordsTestCase(TestCase):
+    """A user with one form (Name, Salary, Joined, Dept) and an API client"""
+
+    def setUp(self):
+        get_cache().clear()
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.form = DynamicForm.objects.create(name='Staff', created_by=self.user)
+        FormField.objects.bulk_create([
+            FormField(form=self.form, label='Name', field_type='text', is_required=True, order=0),
+            FormField(form=self.form, label='Salary', field_type='number', order=1),
+            FormField(form=self.form, label='Joined', field_type='date', order=2),
+            FormField(form=self.form, label='Dept', field_type='select', options=['HR', 'IT'], order=3),
+        ])
+
+    def write(self, method, url, data=None, format='json'):
+        """Send a write request, running the on-commit cache invalidation"""
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(url, data, format=format)
+
+    def create(self, **data):
+        response = self.write('post', RECORDS_URL, {'form': self.form.pk, 'data': data})
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def get_records(self, query=''):
+        response = self.client.get(f'{RECORDS_URL}?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def names(self, query=''):
+        return sorted(record['data'].get('Name') for record in self.get_records(query))
+
+
+class FieldFilterTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create(Name='Ann', Salary='50000', Joined='2019-06-01', Dept='HR')
+        self.create(Name='Bob', Salary='5e4', Joined='2021-03-15', Dept='IT')
+        self.create(Name='Cid', Salary='900', Joined='15-01-2024')
+
+    def test_contains_filter_matches_substrings(self):
+        self.assertEqual(self.names('field_Name=o'), ['Bob'])
+        self.assertEqual(self.names('field_Dept=h'), ['Ann'])
+
+    def test_number_range_uses_the_number_column(self):
+        self.assertEqual(self.names('field_Salary__gte=50000'), ['Ann', 'Bob'])
+        self.assertEqual(self.names('field_Salary__between=100,1000'), ['Cid'])
+
+    def test_date_range_uses_the_date_column(self):
+        self.assertEqual(self.names('field_Joined__gte=2020-01-01'), ['Bob', 'Cid'])
+        self.assertEqual(self.names('field_Joined__lt=2020-01-01'), ['Ann'])
+
+    def test_operand_must_parse_as_the_field_type(self):
+        response = self.client.get(f'{RECORDS_URL}?field_Joined__gte=2020')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('field_Joined__gte', response.data)
+        response = self.client.get(f'{RECORDS_URL}?field_Salary__lt=2020-01-01')
+        self.assertEqual(response.status_code, 400)
+
+    def test_range_on_a_text_field_is_rejected(self):
+        response = self.client.get(f'{RECORDS_URL}?field_Name__gte=5')
+        self.assertEqual(response.status_code, 400)
+
+    def test_range_on_an_unknown_field_is_rejected(self):
+        response = self.client.get(f'{RECORDS_URL}?field_Missing__gte=5')
+        self.assertEqual(response.status_code, 400)
+
+
+class CursorPaginationTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for name, salary in [('A', '300'), ('B', None), ('C', '100'), ('D', '300'), ('E', None), ('F', '200')]:
+            self.create(Name=name, **({'Salary': salary} if salary else {}))
+
+    def walk(self, query):
+        """Names of every page of a paginated listing, following the cursors"""
+        pages = []
+        url = f'{RECORDS_URL}?page_size=2&{query}'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200, response.data)
+            pages.append([record['data']['Name'] for record in response.data['results']])
+            url = response.data['next']
+        return pages
+
+    def test_pages_follow_the_default_ordering(self):
+        pages = self.walk('')
+        self.assertEqual(pages, [['F', 'E'], ['D', 'C'], ['B', 'A']])
+
+    def test_field_ordering_sorts_missing_values_last(self):
+        ascending = sum(self.walk('ordering=data.Salary'), [])
+        self.assertEqual(ascending, ['C', 'F', 'A', 'D', 'B', 'E'])
+        descending = sum(self.walk('ordering=-data.Salary'), [])
+        self.assertEqual(descending, ['D', 'A', 'F', 'C', 'E', 'B'])
+
+    def test_cursor_inside_the_missing_values(self):
+        # The first page ends on a missing value, so the cursor holds a null
+        response = self.client.get(f'{RECORDS_URL}?page_size=5&ordering=data.Salary')
+        self.assertEqual([record['data']['Name'] for record in response.data['results']], ['C', 'F', 'A', 'D', 'B'])
+        response = self.client.get(response.data['next'])
+        self.assertEqual([record['data']['Name'] for record in response.data['results']], ['E'])
+        self.assertIsNone(response.data['next'])
+
+    def test_invalid_cursor_is_not_found(self):
+        response = self.client.get(f'{RECORDS_URL}?page_size=2&cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+    def test_hand_edited_cursor_values_are_not_found(self):
+        for payload in ({'v': 'garbage', 'pk': 1}, {'v': {'a': 1}, 'pk': 1}, {'v': [1], 'pk': 1}):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+            response = self.client.get(f'{RECORDS_URL}?page_size=2&cursor={cursor}')
+            self.assertEqual(response.status_code, 404, payload)
+
+    def test_without_page_size_the_list_is_not_paginated(self):
+        self.assertEqual(len(self.get_records()), 6)
+
+    def test_stream_returns_every_record_as_a_json_array(self):
+        response = self.client.get(f'{RECORDS_URL}?stream=true&ordering=id')
+        self.assertEqual(response.status_code, 200)
+        records = json.loads(b''.join(response.streaming_content))
+        self.assertEqual([record['data']['Name'] for record in records], ['A', 'B', 'C', 'D', 'E', 'F'])
+
+
+class ImportTests(RecordsTestCase):
+
+    def upload(self, name, content):
+        upload = SimpleUploadedFile(name, content.encode('utf-8'))
+        response = self.write('post', f'{RECORDS_URL}import/', {'file': upload, 'form_id': self.form.pk}, 'multipart')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def post_upload(self, name, content, **extra):
+        upload = SimpleUploadedFile(name, content)
+        data = {'file': upload, 'form_id': self.form.pk, **extra}
+        return self.write('post', f'{RECORDS_URL}import/', data, 'multipart')
+
+    @override_settings(EMPLOYEES_BULK_BATCH_SIZE=100)
+    def test_undecodable_input_reports_the_progress_so_far(self):
+        # Past the first read buffer, so earlier chunks are already saved
+        rows = ''.join(f'P{index}\n' for index in range(3000))
+        response = self.post_upload('staff.csv', f'Name\n{rows}'.encode('utf-8') + b'\xff\xfe\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('UTF-8', response.data['error'])
+        processed = response.data['processed']
+        self.assertGreater(processed, 0)
+        self.assertEqual((response.data['imported'], Employee.objects.count()), (processed, processed))
+
+        response = self.post_upload('staff.csv', f'Name\n{rows}'.encode('utf-8'), skip=processed)
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(Employee.objects.count(), 3000)
+
+    def test_malformed_csv_is_a_bad_request(self):
+        response = self.post_upload('staff.csv', b'Name\nAnn\n"' + b'x' * 200000 + b'"\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Malformed CSV after row 1', response.data['error'])
+        self.assertEqual(response.data['imported'], 1)
+
+    def test_ndjson_rows_may_carry_different_keys(self):
+        stats = self.upload('staff.ndjson', '{"Name": "N1"}\n{"name": "N2", "Salary": "5", "Dept": "IT", "Extra": 1}\n')
+        self.assertEqual((stats['imported'], stats['failed']), (2, 0))
+        self.assertEqual(stats['ignored_columns'], ['Extra'])
+        records = {record['data']['Name']: record['data'] for record in self.get_records()}
+        self.assertEqual(records['N1'], {'Name': 'N1'})
+        self.assertEqual(records['N2'], {'Name': 'N2', 'Salary': '5', 'Dept': 'IT'})
+
+    def test_csv_columns_match_labels_ignoring_case(self):
+        stats = self.upload('staff.csv', 'NAME,salary,Unknown\nAnn,10,x\nBob,,\n')
+        self.assertEqual((stats['imported'], stats['failed']), (2, 0))
+        self.assertEqual(stats['ignored_columns'], ['Unknown'])
+        self.assertEqual(self.names('field_Salary__gte=10'), ['Ann'])
+
+    def test_invalid_rows_are_reported(self):
+        stats = self.upload('staff.ndjson', '{"Salary": "1"}\nnot json\n{"Name": "Ok"}\n')
+        self.assertEqual((stats['imported'], stats['failed']), (1, 2))
+        self.assertEqual([error['row'] for error in stats['errors']], [1, 2])
+
+
+class FormFieldDiffTests(RecordsTestCase):
+
+    def form_url(self):
+        return f'/api/employees/forms/{self.form.pk}/'
+
+    def field_ids(self):
+        return dict(FormField.objects.filter(form=self.form).values_list('label', 'id'))
+
+    def update_fields(self, fields):
+        response = self.write('patch', self.form_url(), {'fields': fields})
+        self.assertEqual(response.status_code, 200, response.data)
+        return {field['label']: field for field in response.data['fields']}
+
+    def form_stats(self):
+        return self.client.get(self.form_url()).data['stats']
+
+    def test_fields_are_matched_by_id_then_label(self):
+        ids = self.field_ids()
+        fields = self.update_fields([
+            {'id': ids['Name'], 'label': 'Full Name', 'field_type': 'text', 'order': 0},
+            {'label': 'Salary', 'field_type': 'number', 'order': 1, 'is_required': True},
+            {'label': 'Team', 'field_type': 'text', 'order': 2},
+        ])
+        self.assertEqual(fields['Full Name']['id'], ids['Name'])
+        self.assertEqual(fields['Salary']['id'], ids['Salary'])
+        self.assertTrue(fields['Salary']['is_required'])
+        self.assertNotIn(fields['Team']['id'], ids.values())
+        # Joined and Dept were left out, so they are deleted
+        self.assertEqual(set(self.field_ids()), {'Full Name', 'Salary', 'Team'})
+
+    def test_renamed_field_keeps_its_values(self):
+        self.create(Name='Ann', Salary='10', Dept='HR')
+        ids = self.field_ids()
+        self.update_fields([
+            {'id': ids['Name'], 'label': 'Full Name', 'field_type': 'text', 'order': 0},
+            {'id': ids['Salary'], 'label': 'Pay', 'field_type': 'number', 'order': 1},
+            {'id': ids['Dept'], 'label': 'Team', 'field_type': 'select', 'options': ['HR', 'IT'], 'order': 3},
+        ])
+        self.assertEqual(self.get_records()[0]['data'], {'Full Name': 'Ann', 'Pay': '10', 'Team': 'HR'})
+        self.assertEqual([record['data']['Full Name'] for record in self.get_records('field_Pay__gte=5')], ['Ann'])
+        self.assertEqual(self.form_stats()['option_counts'], {'Team': {'HR': 1}})
+
+    def test_retyped_field_is_reindexed(self):
+        self.create(Name='Ann', Joined='2020-05-01')
+        ids = self.field_ids()
+        self.assertEqual(self.names('field_Joined__gte=2020-01-01'), ['Ann'])
+        self.update_fields([
+            {'id': ids['Name'], 'label': 'Name', 'field_type': 'text', 'order': 0},
+            {'id': ids['Joined'], 'label': 'Joined', 'field_type': 'text', 'order': 2},
+        ])
+        self.assertEqual(self.client.get(f'{RECORDS_URL}?field_Joined__gte=2020-01-01').status_code, 400)
+        self.assertEqual(self.names('field_Joined=2020-05'), ['Ann'])
+
+    def test_label_keyed_form_rename_reindexes_under_the_new_label(self):
+        DynamicForm.objects.filter(pk=self.form.pk).update(schema_version=DynamicForm.LABEL_KEYED)
+        self.create(Name='Ann', Salary='10')
+        self.assertEqual(Employee.objects.get().data, {'Name': 'Ann', 'Salary': '10'})
+        ids = self.field_ids()
+        self.update_fields([
+            {'id': ids['Name'], 'label': 'Name', 'field_type': 'text', 'order': 0},
+            {'id': ids['Salary'], 'label': 'Pay', 'field_type': 'number', 'order': 1},
+        ])
+        # Label-keyed values stay under the old label, which no field has any more
+        self.assertEqual(self.get_records()[0]['data'], {'Name': 'Ann', 'Salary': '10'})
+        self.assertEqual(self.names('field_Pay__gte=5'), [])
+
+
+class ReorderFieldsTests(RecordsTestCase):
+
+    def test_fields_are_reordered_and_failures_reported(self):
+        ids = dict(FormField.objects.filter(form=self.form).values_list('label', 'id'))
+        other = DynamicForm.objects.create(name='Other', created_by=self.user)
+        foreign = FormField.objects.create(form=other, label='X', field_type='text')
+        orders = [
+            {'field_id': ids['Name'], 'order': 3},
+            {'field_id': str(ids['Salary']), 'order': '2'},
+            {'field_id': ids['Joined'], 'order': 1},
+            {'field_id': ids['Dept'], 'order': 0},
+            {'field_id': foreign.pk, 'order': 5},
+            {'field_id': 'abc', 'order': 5},
+            {'field_id': ids['Name'], 'order': 'x'},
+            7,
+        ]
+        response = self.write('post', f'/api/employees/forms/{self.form.pk}/reorder_fields/', {'field_orders': orders})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([field['label'] for field in response.data['fields']], ['Dept', 'Joined', 'Salary', 'Name'])
+        self.assertEqual([failure['index'] for failure in response.data['failed']], [4, 5, 6, 7])
+        self.assertEqual(FormField.objects.get(pk=foreign.pk).order, 0)
+
+
+class ResponseCacheTests(RecordsTestCase):
+
+    def test_writes_invalidate_cached_lists(self):
+        self.create(Name='Ann')
+        self.assertEqual(self.names(), ['Ann'])
+        self.create(Name='Bob')
+        self.assertEqual(self.names(), ['Ann', 'Bob'])
+
+    def test_unchanged_list_is_not_modified(self):
+        self.create(Name='Ann')
+        etag = self.client.get(RECORDS_URL)['ETag']
+        response = self.client.get(RECORDS_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.create(Name='Bob')
+        self.assertEqual(self.client.get(RECORDS_URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_a_stale_worker_does_not_answer_not_modified(self):
+        self.create(Name='Ann')
+        etag = self.client.get(RECORDS_URL)['ETag']
+        # A worker whose cache missed the write still sees the new body
+        Employee.objects.update(data={})
+        get_cache().clear()
+        self.assertEqual(self.client.get(RECORDS_URL, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_uncached_lists_run_no_extra_aggregate(self):
+        self.create(Name='Ann')
+        with CaptureQueriesContext(connection) as queries:
+            self.get_records('search=ann')
+        self.assertFalse([query for query in queries.captured_queries if 'MAX(' in query['sql']])
+
+    def test_non_numeric_ids_are_not_found(self):
+        self.assertEqual(self.client.get(f'{RECORDS_URL}abc/').status_code, 404)
+        self.assertEqual(self.client.get('/api/employees/forms/abc/').status_code, 404)
+
+    def test_cached_pages_link_to_the_requested_host(self):
+        self.create(Name='Ann')
+        self.create(Name='Bob')
+        first = self.client.get(f'{RECORDS_URL}?page_size=1', HTTP_HOST='one.example.com')
+        second = self.client.get(f'{RECORDS_URL}?page_size=1', HTTP_HOST='two.example.com')
+        self.assertTrue(first.data['next'].startswith('http://one.example.com/'))
+        self.assertTrue(second.data['next'].startswith('http://two.example.com/'))
+
+    @override_settings(EMPLOYEES_CACHE_TIMEOUT=300, EMPLOYEES_LOCAL_CACHE_TIMEOUT=5)
+    def test_process_local_cache_uses_the_short_timeout(self):
+        self.assertEqual(get_cache_timeout(), 5)
+
+
+class AsyncRecordTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+        self.create(Name='Ann', Salary='10')
+        empty = DynamicForm.objects.create(name='Empty', created_by=self.user)
+        Employee.objects.create(form=empty, created_by=self.user, data={})
+        # As in a fresh worker, where no compiled form is cached yet
+        invalidate_compiled_form(self.form.pk)
+        invalidate_compiled_form(empty.pk)
+
+    async def aget(self, path, params=None):
+        return await AsyncClient().get(path, params, headers={'Authorization': f'Bearer {self.token}'})
+
+    async def test_list_returns_labelled_data(self):
+        response = await self.aget('/api/employees/async/records/', {'ordering': 'id'})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['count'], 2)
+        self.assertEqual([record['data'] for record in body['results']], [{'Name': 'Ann', 'Salary': '10'}, {}])
+
+    async def test_stream_includes_records_of_forms_without_fields(self):
+        response = await self.aget('/api/employees/async/records/stream/')
+        self.assertEqual(response.status_code, 200)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(len(json.loads(body)), 2)
+
+    async def test_export_writes_field_columns(self):
+        response = await self.aget('/api/employees/async/records/export/', {'format': 'csv', 'form_id': self.form.pk})
+        self.assertEqual(response.status_code, 200)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        header, row = body.splitlines()
+        self.assertTrue(header.endswith('Name,Salary,Joined,Dept'))
+        self.assertTrue(row.endswith('Ann,10,,'))
+
+    async def test_requests_without_a_token_are_rejected(self):
+        response = await AsyncClient().get('/api/employees/async/records/')
+        self.assertEqual(response.status_code, 401)
+
+
+class FormStatsTests(RecordsTestCase):
+
+    def stats(self, form=None):
+        return FormStats.objects.get(form=form or self.form)
+
+    def test_creates_updates_and_deletes_adjust_the_counts(self):
+        ann = self.create(Name='Ann', Dept='HR')
+        self.create(Name='Bob', Dept='HR')
+        self.assertEqual(self.stats().record_count, 2)
+        self.assertEqual(self.stats().option_counts, {'Dept': {'HR': 2}})
+
+        response = self.write('put', f'{RECORDS_URL}{ann["id"]}/', {'form': self.form.pk, 'data': {'Name': 'Ann', 'Dept': 'IT'}})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.stats().option_counts, {'Dept': {'HR': 1, 'IT': 1}})
+
+        self.write('delete', f'{RECORDS_URL}{ann["id"]}/')
+        self.assertEqual(self.stats().record_count, 1)
+        self.assertEqual(self.stats().option_counts, {'Dept': {'HR': 1}})
+
+    def test_model_saves_read_the_stored_values_at_save_time(self):
+        self.create(Name='Ann', Dept='HR')
+        employee = Employee.objects.get()
+        employee.data = Employee.objects.get().data | {str(self.field('Dept').pk): 'IT'}
+        employee.save()
+        self.assertEqual(self.stats().option_counts, {'Dept': {'IT': 1}})
+
+    def test_moving_a_record_updates_both_forms(self):
+        other = DynamicForm.objects.create(name='Other', created_by=self.user)
+        FormField.objects.create(form=other, label='Name', field_type='text')
+        record = self.create(Name='Ann', Dept='HR')
+        response = self.write('put', f'{RECORDS_URL}{record["id"]}/', {'form': other.pk, 'data': {'Name': 'Ann'}})
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual((self.stats().record_count, self.stats().option_counts), (0, {}))
+        self.assertEqual(self.stats(other).record_count, 1)
+
+    def test_deleting_the_latest_record_recomputes_last_record_at(self):
+        first = self.create(Name='Ann')
+        latest = self.create(Name='Bob')
+        self.write('delete', f'{RECORDS_URL}{latest["id"]}/')
+        self.assertEqual(self.stats().last_record_at, Employee.objects.get(pk=first['id']).created_at)
+
+    def test_bulk_delete_applies_one_delta_per_form(self):
+        ids = [self.create(Name=f'N{index}', Dept='HR' if index % 2 else 'IT')['id'] for index in range(12)]
+
+        def bulk_delete(ids):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.write('post', f'{RECORDS_URL}bulk_delete/', {'ids': ids})
+            self.assertEqual(response.data['deleted_count'], len(ids))
+            return len(queries)
+
+        # The number of queries does not grow with the number of records
+        self.assertEqual(bulk_delete(ids[:2]), bulk_delete(ids[2:10]))
+        self.assertEqual(self.stats().record_count, 2)
+        self.assertEqual(self.stats().option_counts, {'Dept': {'HR': 1, 'IT': 1}})
+        self.assertEqual(self.names(), ['N10', 'N11'])
+
+    def test_deleting_a_form_skips_the_per_record_stats(self):
+        def delete_form(count):
+            form = DynamicForm.objects.create(name=f'Form {count}', created_by=self.user)
+            field = FormField.objects.create(form=form, label='Dept', field_type='select', options=['HR'])
+            for _ in range(count):
+                self.write('post', RECORDS_URL, {'form': form.pk, 'data': {'Dept': 'HR'}})
+            with CaptureQueriesContext(connection) as queries:
+                response = self.write('delete', f'/api/employees/forms/{form.pk}/')
+            self.assertTrue(response.data['deleted'])
+            self.assertFalse(FormStats.objects.filter(form_id=form.pk).exists())
+            self.assertFalse(Employee.objects.filter(form_id=form.pk).exists())
+            return len(queries)
+
+        self.assertEqual(delete_form(1), delete_form(6))
+
+    def test_rebuild_matches_the_incremental_stats(self):
+        for name, dept in [('Ann', 'HR'), ('Bob', 'IT'), ('Cid', None)]:
+            self.create(Name=name, **({'Dept': dept} if dept else {}))
+        incremental = self.stats()
+        rebuild_form_stats(DynamicForm.objects.filter(pk=self.form.pk).prefetch_related('fields'))
+        rebuilt = self.stats()
+        self.assertEqual(
+            (rebuilt.record_count, rebuilt.last_record_at, rebuilt.option_counts),
+            (incremental.record_count, incremental.last_record_at, incremental.option_counts),
+        )
+
+    def field(self, label):
+        return FormField.objects.get(form=self.form, label=label)
+
+
+class SearchTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create(Name='John Smith', Dept='HR')
+        self.create(Name='Alice Jones', Dept='IT')
+        self.create(Name='Bob', Dept='IT')
+
+    def test_search_matches_substrings_by_default(self):
+        self.assertEqual(self.names('search=oh'), ['John Smith'])
+        self.assertEqual(self.names('search=ICE'), ['Alice Jones'])
+        self.assertEqual(self.names('search=it'), ['Alice Jones', 'Bob', 'John Smith'])
+
+    def test_search_mode_words_matches_word_prefixes_and_typos(self):
+        self.assertEqual(self.names('search=jo&search_mode=words'), ['Alice Jones', 'John Smith'])
+        self.assertEqual(self.names('search=jhon&search_mode=words'), ['John Smith'])
+        self.assertEqual(self.names('search=oh&search_mode=words'), [])
+
+    def test_records_saved_outside_the_api_are_indexed(self):
+        data = get_compiled_form(self.form).to_storage({'Name': 'Carol King', 'Salary': '70000'})
+        employee = Employee.objects.create(form=self.form, created_by=self.user, data=data)
+        self.assertEqual(self.names('search=carol'), ['Carol King'])
+        self.assertEqual(self.names('search=king&search_mode=words'), ['Carol King'])
+        self.assertEqual(self.names('field_Salary__gte=60000'), ['Carol King'])
+
+        employee.data = get_compiled_form(self.form).to_storage({'Name': 'Carol Price', 'Salary': '50000'})
+        with self.captureOnCommitCallbacks(execute=True):
+            employee.save()
+        self.assertEqual(self.names('search=king&search_mode=words'), [])
+        self.assertEqual(self.names('field_Salary__gte=60000'), [])
+
+    def test_suggest_completes_words(self):
+        response = self.client.get(f'{RECORDS_URL}suggest/?q=jo')
+        self.assertEqual([item['value'] for item in response.data['suggestions']], ['Alice Jones', 'John Smith'])
+
+
+class MetricsAccessTests(TestCase):
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('viewer', password='password')
+
+    def scrape(self, user=None, **headers):
+        client = APIClient()
+        if user is not None:
+            client.force_login(user)
+        return client.get('/metrics', **headers)
+
+    def test_anonymous_and_regular_users_are_refused(self):
+        self.assertEqual(self.scrape().status_code, 403)
+        self.assertEqual(self.scrape(self.user).status_code, 403)
+        token = RefreshToken.for_user(self.user).access_token
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION=f'Bearer {token}').status_code, 403)
+
+    def test_staff_users_can_scrape(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.scrape(self.user).status_code, 200)
+        token = RefreshToken.for_user(self.user).access_token
+        response = self.scrape(HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+
+    @override_settings(METRICS_BEARER_TOKEN='s3cret')
+    def test_bearer_token(self):
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer s3cret').status_code, 200)
+        self.assertEqual(self.scrape(HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_addresses(self):
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.scrape(REMOTE_ADDR='10.0.0.6').status_code, 403)
+
+
+class FieldKeyTests(RecordsTestCase):
+
+    def field_ids(self):
+        return {label: str(pk) for label, pk in FormField.objects.filter(form=self.form).values_list('label', 'id')}
+
+    def test_records_are_stored_by_field_id_and_returned_by_label(self):
+        ids = self.field_ids()
+        record = self.create(Name='Ann', Salary='10')
+        self.assertEqual(Employee.objects.get().data, {ids['Name']: 'Ann', ids['Salary']: '10'})
+        self.assertEqual(record['data'], {'Name': 'Ann', 'Salary': '10'})
+
+    def test_to_storage_relabel_and_rekey(self):
+        ids = self.field_ids()
+        compiled = get_compiled_form(self.form)
+        stored = compiled.to_storage({'Name': 'Ann', 'Other': 1})
+        self.assertEqual(stored, {ids['Name']: 'Ann', 'Other': 1})
+        self.assertEqual(compiled.to_labels(stored), {'Name': 'Ann', 'Other': 1})
+        # A value already under the field id is kept over the label-keyed one
+        self.assertEqual(
+            rekey({'Name': 'old', ids['Name']: 'new', 'Salary': '10'}, compiled),
+            {ids['Name']: 'new', ids['Salary']: '10'},
+        )
+
+    def test_values_are_read_under_either_key(self):
+        ids = self.field_ids()
+        name = next(field for field in get_compiled_form(self.form).fields if field.label == 'Name')
+        self.assertEqual(name.value({'Name': 'Ann'}), 'Ann')
+        self.assertEqual(name.value({'Name': 'old', ids['Name']: 'new'}), 'new')
+
+    def test_migrate_form_keys_rewrites_label_keyed_records(self):
+        DynamicForm.objects.filter(pk=self.form.pk).update(schema_version=DynamicForm.LABEL_KEYED)
+        for name in ('Ann', 'Bob', 'Cid'):
+            self.create(Name=name, Dept='HR')
+        self.assertEqual(migrate_form_keys(DynamicForm.objects.get(pk=self.form.pk), batch_size=2), 3)
+
+        ids = self.field_ids()
+        self.assertEqual(DynamicForm.objects.get(pk=self.form.pk).schema_version, DynamicForm.ID_KEYED)
+        self.assertEqual(
+            sorted(employee.data[ids['Name']] for employee in Employee.objects.all()), ['Ann', 'Bob', 'Cid']
+        )
+        self.assertEqual(self.names('field_Dept=hr'), ['Ann', 'Bob', 'Cid'])
+        self.assertEqual(self.get_records('search=bob')[0]['data'], {'Name': 'Bob', 'Dept': 'HR'})
+        self.assertEqual(migrate_form_keys(self.form), 0)
+
+    def test_mixed_records_are_read_by_label_during_a_migration(self):
+        DynamicForm.objects.filter(pk=self.form.pk).update(schema_version=DynamicForm.LABEL_KEYED)
+        self.create(Name='Ann', Salary='10')
+        DynamicForm.objects.filter(pk=self.form.pk).update(schema_version=DynamicForm.ID_KEYED)
+        invalidate_compiled_form(self.form.pk)
+        self.create(Name='Bob', Salary='20')
+        self.assertEqual(self.names('field_Salary__gte=5'), ['Ann', 'Bob'])
+        self.assertEqual(
+            sorted((record['data']['Name'], record['data']['Salary']) for record in self.get_records()),
+            [('Ann', '10'), ('Bob', '20')],
+        )
+
+
+class BackfillTypedValuesTests(RecordsTestCase):
+
+    def test_command_restores_the_typed_columns(self):
+        FormField.objects.create(form=self.form, label='Remote', field_type='checkbox', order=4)
+        self.create(Name='Ann', Salary='5e4', Joined='15-01-2024', Remote='yes')
+        self.create(Name='Bob', Salary='10')
+        typed = EmployeeFieldValue.objects.filter(form_field__field_type__in=('number', 'date', 'checkbox'))
+        expected = sorted(typed.values_list('form_field__label', 'numeric_value', 'date_value', 'bool_value'))
+        self.assertIn(('Remote', None, None, True), expected)
+        typed.update(numeric_value=None, date_value=None, bool_value=None)
+
+        out = StringIO()
+        call_command('backfill_typed_values', '--form', str(self.form.pk), '--batch-size', '1', stdout=out)
+        self.assertIn('Updated 4, created 0 and deleted 0', out.getvalue())
+        self.assertEqual(
+            sorted(typed.values_list('form_field__label', 'numeric_value', 'date_value', 'bool_value')), expected
+        )
+        self.assertEqual(self.names('field_Salary__gte=20000'), ['Ann'])
+
+
+class BulkWriteTests(RecordsTestCase):
+
+    def bulk(self, records):
+        response = self.write('post', f'{RECORDS_URL}bulk/', {'records': records})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def row(self, **data):
+        return {'form': self.form.pk, 'data': data}
+
+    def test_creates_and_updates_records(self):
+        result = self.bulk([self.row(Name='Ann', Dept='HR'), self.row(Name='Bob', Dept='IT')])
+        self.assertEqual((result['created'], result['updated'], result['failed']), (2, 0, 0))
+        ann_id = result['results'][0]['id']
+
+        result = self.bulk([{'id': ann_id, **self.row(Name='Ann Lee', Dept='IT')}, self.row(Name='Cid')])
+        self.assertEqual((result['created'], result['updated']), (1, 1))
+        self.assertEqual(self.names(), ['Ann Lee', 'Bob', 'Cid'])
+        self.assertEqual(self.names('search=lee'), ['Ann Lee'])
+        self.assertEqual(self.names('field_Dept=it'), ['Ann Lee', 'Bob'])
+        stats = FormStats.objects.get(form=self.form)
+        self.assertEqual((stats.record_count, stats.option_counts), (3, {'Dept': {'IT': 2}}))
+
+    def test_invalid_rows_are_reported_and_valid_ones_saved(self):
+        other_user = User.objects.create_user(username='other', password='password')
+        other_form = DynamicForm.objects.create(name='Other', created_by=other_user)
+        foreign = Employee.objects.create(form=other_form, created_by=other_user, data={})
+        result = self.bulk([
+            self.row(Name='Ann'),
+            self.row(Salary='10'),
+            'not a record',
+            {'form': other_form.pk, 'data': {}},
+            {'id': foreign.pk, **self.row(Name='Taken')},
+            self.row(Name='Bob', Salary='abc'),
+        ])
+        self.assertEqual((result['created'], result['failed']), (1, 5))
+        self.assertEqual(
+            [(error['index'], sorted(error['errors'])) for error in result['errors']],
+            [(1, ['Name']), (2, ['non_field_errors']), (3, ['form']), (4, ['id']), (5, ['Salary'])],
+        )
+        self.assertEqual(self.names(), ['Ann'])
+        self.assertEqual(Employee.objects.get(pk=foreign.pk).data, {})
+
+    def test_repeated_ids_are_rejected_before_writing(self):
+        record = self.create(Name='Ann', Dept='HR')
+        result = self.bulk([
+            {'id': record['id'], **self.row(Name='First', Dept='IT')},
+            {'id': record['id'], **self.row(Name='Second', Dept='IT')},
+            self.row(Name='Bob', Dept='HR'),
+        ])
+        self.assertEqual((result['created'], result['updated'], result['failed']), (1, 0, 2))
+        self.assertEqual([error['index'] for error in result['errors']], [0, 1])
+        self.assertEqual(self.names(), ['Ann', 'Bob'])
+        stats = FormStats.objects.get(form=self.form)
+        self.assertEqual((stats.record_count, stats.option_counts), (2, {'Dept': {'HR': 2}}))
+
+
+class ExplainQueriesTests(RecordsTestCase):
+
+    def test_default_arguments_explain_a_range_filter_on_a_number_field(self):
+        self.create(Name='Ann', Salary='10')
+        out = StringIO()
+        call_command('explain_queries', '--user', 'owner', stdout=out)
+        self.assertIn('records field_Name\n', out.getvalue())
+        self.assertIn('records field_Salary__gte\n', out.getvalue())
+
+
+class SearchTrigramTests(RecordsTestCase):
+
+    def trigram_tokens(self):
+        return set(SearchTrigram.objects.filter(created_by=self.user).values_list('token', flat=True))
+
+    def test_edits_and_deletes_prune_the_trigrams_of_vanished_tokens(self):
+        record = self.create(Name='Zebulon Ward')
+        self.create(Name='Ann Ward')
+        self.write('put', f'{RECORDS_URL}{record["id"]}/', {'form': self.form.pk, 'data': {'Name': 'Yolanda Ward'}})
+        self.assertEqual(self.trigram_tokens(), {'yolanda', 'ann', 'ward'})
+
+        self.write('delete', f'{RECORDS_URL}{record["id"]}/')
+        self.assertEqual(self.trigram_tokens(), {'ann', 'ward'})
+
+        ids = [self.create(Name=f'Bulk{index} Ward')['id'] for index in range(3)]
+        self.write('post', f'{RECORDS_URL}bulk_delete/', {'ids': ids})
+        self.assertEqual(self.trigram_tokens(), {'ann', 'ward'})
+
+        self.write('delete', f'/api/employees/forms/{self.form.pk}/')
+        self.assertEqual(self.trigram_tokens(), set())
+
+    def test_stale_trigrams_do_not_crowd_out_typo_matches(self):
+        self.create(Name='Johnathan')
+        # Left-over tokens sharing more trigrams with the typo than the live one
+        SearchTrigram.objects.bulk_create([
+            SearchTrigram(created_by=self.user, trigram=trigram, token=f'jonathan{index}')
+            for index in range(200) for trigram in trigrams('jonathan')
+        ])
+        self.assertEqual(self.names('search=jonathan&search_mode=words'), ['Johnathan'])
+
+        out = StringIO()
+        call_command('rebuild_field_index', stdout=out)
+        self.assertIn(f'pruned {200 * len(trigrams("jonathan"))} trigrams', out.getvalue())
+        self.assertEqual(self.trigram_tokens(), {'johnathan'})
+
+
+class RecordStatsTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.create(Name='Ann', Salary='100', Joined='2024-01-05', Dept='HR')
+        self.create(Name='Bob', Salary='300', Joined='2024-01-20', Dept='IT')
+        self.create(Name='Cid', Salary='200', Joined='2023-05-05', Dept='IT')
+        self.create(Name='Dee')
+
+    def stats(self, query=''):
+        response = self.client.get(f'{RECORDS_URL}stats/?{query}')
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def test_aggregates_and_groups(self):
+        self.assertEqual(self.stats(), {'count': 4})
+        metrics = self.stats('metrics=count,avg:Salary,min,max,histogram&bins=2')['metrics']
+        self.assertEqual((metrics['avg:Salary'], metrics['min:Salary'], metrics['max:Salary']), (200, 100, 300))
+        self.assertEqual([bucket['count'] for bucket in metrics['histogram:Salary']], [1, 2])
+        groups = self.stats('metrics=avg:Salary&group_by=Dept')['groups']
+        self.assertEqual(
+            [(group['value'], group['count'], group['metrics']['avg:Salary']) for group in groups],
+            [('IT', 2, 250.0), ('HR', 1, 100.0), (None, 1, None)],
+        )
+        self.assertEqual(self.client.get(f'{RECORDS_URL}stats/?metrics=avg:Name').status_code, 400)
+
+    def test_only_the_owners_records_are_counted(self):
+        other = User.objects.create_user(username='other', password='password')
+        other_form = DynamicForm.objects.create(name='Other', created_by=other)
+        FormField.objects.create(form=other_form, label='Salary', field_type='number')
+        Employee.objects.create(form=other_form, created_by=other, data={'Salary': '9000'})
+        self.assertEqual(self.stats('metrics=count,max:Salary'), {'count': 4, 'metrics': {'max:Salary': 300}})
+
+    def test_responses_are_cached_until_a_write(self):
+        self.assertEqual(self.stats('metrics=max:Salary')['metrics'], {'max:Salary': 300})
+        with self.assertNumQueries(0):
+            self.stats('metrics=max:Salary')
+        self.create(Name='Eve', Salary='900')
+        self.assertEqual(self.stats('metrics=max:Salary')['metrics'], {'max:Salary': 900})
+
+
+class SearchFieldsTests(RecordsTestCase):
+    url = f'{RECORDS_URL}search_fields/'
+
+    def test_form_edits_refresh_the_catalog_and_unchanged_ones_are_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual([field['label'] for field in response.data['fields']], ['Name', 'Salary', 'Joined', 'Dept'])
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        ids = dict(FormField.objects.filter(form=self.form).values_list('label', 'id'))
+        response = self.write('patch', f'/api/employees/forms/{self.form.pk}/', {'fields': [
+            {'id': ids['Name'], 'label': 'Full Name', 'field_type': 'text', 'order': 0},
+            {'id': ids['Salary'], 'label': 'Salary', 'field_type': 'number', 'order': 1},
+        ]})
+        self.assertEqual(response.status_code, 200, response.data)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.data['fields'], [{'label': 'Full Name', 'type': 'text'}, {'label': 'Salary', 'type': 'number'}]
+        )
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+class ProfilingTests(TestCase):
+
+    def setUp(self):
+        clear_profiles()
+        self.addCleanup(clear_profiles)
+        self.staff = User.objects.create_user(
+            username='admin', email='admin@example.com', password='password', is_staff=True, is_superuser=True
+        )
+        self.user = User.objects.create_user(username='owner', email='owner@example.com', password='password')
+
+    def sampled(self, sampler, delay):
+        def view(request):
+            time.sleep(delay)
+            return HttpResponse('ok')
+        middleware = ProfilingMiddleware(view)
+        middleware.sampler = sampler
+        middleware(RequestFactory().get('/slow/'))
+        return [profile for profile in get_profiles() if profile['mode'] == 'sampling']
+
+    def test_only_requests_past_the_threshold_are_sampled(self):
+        sampler = SlowRequestSampler(threshold=0.05, interval=0.002)
+        self.assertEqual(self.sampled(sampler, 0), [])
+        profiles = self.sampled(sampler, 0.3)
+        self.assertEqual(len(profiles), 1)
+        self.assertEqual(profiles[0]['path'], '/slow/')
+        self.assertGreaterEqual(profiles[0]['duration_ms'], 300)
+        # The innermost sampled frame is the sleeping view
+        self.assertTrue(profiles[0]['stacks'][0]['stack'][-1].endswith(' view'))
+
+    def test_x_profile_is_honoured_for_staff_only(self):
+        client = APIClient()
+        for user in (self.user, self.staff):
+            token = RefreshToken.for_user(user).access_token
+            response = client.get('/api/employees/forms/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {token}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.has_header('X-Profile-Id'), user.is_staff)
+        profiles = get_profiles()
+        self.assertEqual(
+            [(profile['mode'], profile['view']) for profile in profiles], [('cprofile', 'DynamicFormViewSet.list')]
+        )
+        self.assertTrue(profiles[0]['report'])
+
+    def test_admin_lists_the_profiles(self):
+        client = APIClient()
+        client.force_login(self.staff)
+        client.get('/api/employees/forms/', HTTP_X_PROFILE='1')
+        response = client.get('/admin/employees/requestprofile/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'DynamicFormViewSet.list')
+        client.force_login(self.user)
+        self.assertNotEqual(client.get('/admin/employees/requestprofile/').status_code, 200)
+
+
+class ExportTests(RecordsTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.ann = self.create(Name='Ann, Jr.', Salary='10', Dept='HR')
+        self.bob = self.create(Name='Bob', Dept='IT')
+        other = User.objects.create_user(username='other', password='password')
+        other_form = DynamicForm.objects.create(name='Other', created_by=other)
+        FormField.objects.create(form=other_form, label='Name', field_type='text')
+        Employee.objects.create(form=other_form, created_by=other, data={'Name': 'Mallory'})
+
+    def export(self, query):
+        response = self.client.get(f'{RECORDS_URL}export/?{query}')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode('utf-8')
+
+    def test_csv_holds_the_owners_records_with_a_column_per_field(self):
+        response, body = self.export('format=csv&ordering=id')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="employees.csv"')
+        rows = list(csv.reader(StringIO(body)))
+        self.assertEqual(rows[0][-4:], ['Name', 'Salary', 'Joined', 'Dept'])
+        self.assertEqual([row[-4:] for row in rows[1:]], [['Ann, Jr.', '10', '', 'HR'], ['Bob', '', '', 'IT']])
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.ann['id'], self.bob['id']])
+
+    def test_ndjson_honours_the_list_filters(self):
+        _, body = self.export('format=ndjson&field_Dept=it')
+        items = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]['record_id'], self.bob['id'])
+        self.assertEqual((items[0]['Name'], items[0]['Dept']), ('Bob', 'IT'))
+        self.assertNotIn('Salary', items[0])
+
+
+class ListQueryCountTests(RecordsTestCase):
+
+    def add_form(self, name, records):
+        form = DynamicForm.objects.create(name=name, created_by=self.user)
+        FormField.objects.create(form=form, label='Name', field_type='text')
+        for index in range(records):
+            self.write('post', RECORDS_URL, {'form': form.pk, 'data': {'Name': f'{name}{index}'}})
+        return form
+
+    def cold_list(self, query, queries):
+        # As served by a worker that has not compiled the forms yet
+        for form in DynamicForm.objects.all():
+            invalidate_compiled_form(form.pk)
+        with self.assertNumQueries(queries):
+            return self.get_records(query)
+
+    def test_plain_list_runs_a_constant_number_of_queries(self):
+        self.add_form('A', 2)
+        self.assertEqual(len(self.cold_list('', 2)), 2)
+        for name in 'BCD':
+            self.add_form(name, 5)
+        self.assertEqual(len(self.cold_list('', 2)), 17)
+        get_cache().clear()
+        with self.assertNumQueries(1):
+            self.get_records()
+
+    def test_list_with_form_fields_runs_a_constant_number_of_queries(self):
+        self.add_form('A', 2)
+        self.cold_list('include=form_fields', 2)
+        for name in 'BCD':
+            self.add_form(name, 5)
+        records = self.cold_list('include=form_fields', 2)
+        self.assertEqual([field['label'] for field in records[0]['form_fields']], ['Name'])
+
+
+class WriteQueryCountTests(RecordsTestCase):
+
+    def test_create_indexes_without_replacing_rows_or_savepoints(self):
+        self.create(Name='Warm')
+        # Form, savepoint pair, insert, field values, tokens, trigrams,
+        # stats lock and update, then the response's fields and username
+        with self.assertNumQueries(11):
+            self.create(Name='Ann', Salary='5', Dept='HR')
+        self.assertEqual(self.names('search=ann'), ['Ann'])
+        self.assertEqual(FormStats.objects.get(form=self.form).record_count, 2)
+
+    def test_update_replaces_the_previous_rows(self):
+        record = self.create(Name='Ann', Dept='HR')
+        with self.assertNumQueries(18):
+            response = self.write('put', f"{RECORDS_URL}{record['id']}/", {'form': self.form.pk, 'data': {'Name': 'Zed'}})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.names('search=ann'), [])
+        self.assertEqual(self.names('search=zed'), ['Zed'])
+        self.assertFalse(SearchTrigram.objects.filter(token='ann').exists())
+        self.assertEqual(FormStats.objects.get(form=self.form).option_counts, {})
+
+
+class CompiledFormTests(RecordsTestCase):
+
+    def post(self, **data):
+        return self.write('post', RECORDS_URL, {'form': self.form.pk, 'data': data})
+
+    def test_field_edits_through_the_api_apply_to_the_next_write(self):
+        self.assertEqual(self.post(Name='Ann').status_code, 201)
+        ids = dict(FormField.objects.filter(form=self.form).values_list('label', 'id'))
+        response = self.write('patch', f'/api/employees/forms/{self.form.pk}/', {'fields': [
+            {'id': ids['Name'], 'label': 'Name', 'field_type': 'text', 'order': 0, 'is_required': True},
+            {'id': ids['Salary'], 'label': 'Salary', 'field_type': 'number', 'order': 1, 'is_required': True},
+        ]})
+        self.assertEqual(response.status_code, 200, response.data)
+        response = self.post(Name='Bob')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Salary', response.data)
+
+    def test_a_bumped_updated_at_recompiles_forms_cached_by_other_processes(self):
+        before = get_compiled_form(DynamicForm.objects.get(pk=self.form.pk))
+        # Another process edits the field: this one only sees the form's updated_at move
+        FormField.objects.filter(form=self.form, label='Salary').update(field_type='text')
+        self.assertIs(get_compiled_form(DynamicForm.objects.get(pk=self.form.pk)), before)
+        self.assertEqual(self.post(Name='Ann', Salary='lots').status_code, 400)
+
+        DynamicForm.objects.filter(pk=self.form.pk).update(updated_at=timezone.now())
+        self.assertEqual(self.post(Name='Ann', Salary='lots').status_code, 201)
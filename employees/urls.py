@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import DynamicFormViewSet, EmployeeViewSet
+from . import async_views
 
 router = DefaultRouter()
 router.register(r'forms', DynamicFormViewSet, basename='form')
@@ -8,4 +9,8 @@ router.register(r'records', EmployeeViewSet, basename='employee')
 
 urlpatterns = [
     path('', include(router.urls)),
-]
\ No newline at end of file
+    # Async (ASGI) variants of the records list, search and export endpoints
+    path('async/records/', async_views.record_list, name='async-employee-list'),
+    path('async/records/stream/', async_views.record_stream, name='async-employee-stream'),
+    path('async/records/export/', async_views.record_export, name='async-employee-export'),
+]
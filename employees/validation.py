@@ -0,0 +1,163 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import validate_email
+from django.db.models import prefetch_related_objects
+from .indexing import MISSING, parse_date, parse_number
+from .models import DynamicForm
+
+# Compiled forms kept per process, keyed by form id
+_compiled_forms = {}
+MAX_COMPILED_FORMS = 1024
+
+
+class CompiledField:
+    """Validation rules for a single FormField, precomputed once"""
+    __slots__ = ('id', 'label', 'key', 'other_key', 'field_type', 'is_required', 'options', 'options_text')
+
+    def __init__(self, field, schema_version=DynamicForm.LABEL_KEYED):
+        self.id = field.id
+        self.label = field.label
+        # Key of the value in stored Employee.data, and the key it had under
+        # the other schema, for records not rewritten yet (see field_keys.py)
+        if schema_version >= DynamicForm.ID_KEYED:
+            self.key, self.other_key = str(field.id), field.label
+        else:
+            self.key, self.other_key = field.label, str(field.id)
+        self.field_type = field.field_type
+        self.is_required = field.is_required
+        if field.options and isinstance(field.options, list):
+            self.options = frozenset(str(opt) for opt in field.options)
+            self.options_text = ', '.join(map(str, field.options))
+        else:
+            self.options = None
+            self.options_text = ''
+
+    def value(self, data, default=MISSING):
+        """This field's value in stored Employee.data"""
+        if self.key in data:
+            return data[self.key]
+        return data.get(self.other_key, default)
+
+    def check(self, value):
+        """Return True if value is valid for this field, else an error message"""
+        if not value and not self.is_required:
+            return True
+
+        field_type = self.field_type
+        try:
+            if field_type == 'number':
+                # The same parser projects the value into the typed index
+                if parse_number(value) is None:
+                    raise ValueError("Invalid number")
+
+            elif field_type == 'email':
+                validate_email(str(value))
+
+            elif field_type == 'date':
+                if isinstance(value, str) and parse_date(value) is None:
+                    raise ValueError("Invalid date format")
+
+            elif field_type in ('select', 'radio'):
+                if self.options is not None and str(value) not in self.options:
+                    raise ValueError(f"Value must be one of: {self.options_text}")
+
+            elif field_type == 'checkbox':
+                if self.options is not None:
+                    if isinstance(value, list):
+                        for v in value:
+                            if str(v) not in self.options:
+                                raise ValueError(f"Invalid checkbox value: {v}")
+                    elif str(value) not in self.options:
+                        raise ValueError(f"Value must be one of: {self.options_text}")
+
+            return True
+
+        except (ValueError, DjangoValidationError) as e:
+            return str(e)
+
+
+class CompiledForm:
+    """Immutable validator for a DynamicForm's fields"""
+    __slots__ = ('form_id', 'version', 'schema_version', 'fields', 'required_labels', 'keys_by_label', 'labels_by_key')
+
+    def __init__(self, form, fields):
+        self.form_id = form.pk
+        self.version = form.updated_at
+        self.schema_version = form.schema_version
+        self.fields = tuple(CompiledField(field, form.schema_version) for field in fields)
+        self.required_labels = frozenset(f.label for f in self.fields if f.is_required)
+        self.keys_by_label = {f.label: f.key for f in self.fields}
+        self.labels_by_key = {str(f.id): f.label for f in self.fields}
+
+    def validate(self, data):
+        """Return a dict of label -> error message for invalid data"""
+        errors = {}
+        for field in self.fields:
+            value = data.get(field.label)
+
+            if field.is_required:
+                if value is None or value == '' or (isinstance(value, str) and not value.strip()):
+                    errors[field.label] = f"{field.label} is required."
+                    continue
+
+            if value is not None and value != '':
+                result = field.check(value)
+                if result is not True:
+                    errors[field.label] = result
+        return errors
+
+    def to_storage(self, data):
+        """Label-keyed API data as stored in Employee.data"""
+        if self.schema_version < DynamicForm.ID_KEYED:
+            return data
+        keys = self.keys_by_label
+        return {keys.get(label, label): value for label, value in data.items()}
+
+    def to_labels(self, data):
+        """Stored Employee.data keyed by field label, as the API returns it"""
+        return relabel(data, self.labels_by_key)
+
+
+def relabel(data, labels_by_key):
+    """Replace field keys in stored data with labels; other keys are kept"""
+    if not isinstance(data, dict):
+        return data
+    return {labels_by_key.get(key, key): value for key, value in data.items()}
+
+
+def get_compiled_form(form):
+    """Return the cached CompiledForm for form, compiling it if stale.
+
+    A cached entry is reused while its version matches ``form.updated_at``;
+    field changes touch the form (see signals.py) so other processes notice.
+    """
+    compiled = _compiled_forms.get(form.pk)
+    if compiled is not None and compiled.version == form.updated_at:
+        return compiled
+
+    compiled = CompiledForm(form, form.fields.all())
+    if len(_compiled_forms) >= MAX_COMPILED_FORMS:
+        _compiled_forms.pop(next(iter(_compiled_forms)), None)
+    _compiled_forms[form.pk] = compiled
+    return compiled
+
+
+def compile_forms(forms):
+    """Compile the forms whose cached CompiledForm is missing or stale.
+
+    Their fields are loaded in a single query, so serializing records of
+    many forms costs the same as one.
+    """
+    stale = {}
+    for form in forms:
+        compiled = _compiled_forms.get(form.pk)
+        if compiled is None or compiled.version != form.updated_at:
+            stale.setdefault(form.pk, form)
+    if stale:
+        prefetch_related_objects(list(stale.values()), 'fields')
+        for form in stale.values():
+            get_compiled_form(form)
+
+
+def invalidate_compiled_form(form_id):
+    """Drop the cached validator for a form in this process"""
+    _compiled_forms.pop(form_id, None)
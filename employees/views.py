@@ -1,24 +1,54 @@
+import hashlib
 from rest_framework import viewsets, status, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.renderers import JSONRenderer
+from django.conf import settings
+from django.db import transaction
 from django.db.models import Q
-from .models import DynamicForm, Employee
+from .models import DynamicForm, Employee, FormField
 from .serializers import DynamicFormSerializer, EmployeeSerializer
+from .filters import filter_employees
+from .ordering import FORM_ORDERING_FIELDS, order_by_column
+from .pagination import RecordCursorPagination
+from .search_index import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, suggest
+from .stats import RecordStats
+from .streaming import stream_queryset
+from .bulk import bulk_write_records, delete_records
+from .importer import IMPORT_FORMATS, RecordImporter, detect_format, iter_rows, open_text
+from .exporter import export_columns, export_response
+from .field_keys import field_label_maps
+from .renderers import CSVRenderer, NDJSONRenderer
+from .validation import invalidate_compiled_form
+from .cache import CachedResponseMixin, bump_generation_on_commit, etag_matches, get_cache, get_cache_timeout, get_generation
 
 
-class DynamicFormViewSet(viewsets.ModelViewSet):
+def parse_int(value):
+    """An integer given as a number or numeric string, as the ORM accepts them, else None"""
+    if isinstance(value, (bool, float)):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class DynamicFormViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = DynamicForm.objects.all()
     serializer_class = DynamicFormSerializer
     permission_classes = [IsAuthenticated]
+    # Forms embed their record stats, so record changes invalidate them too
+    cache_scopes = ('forms', 'records')
 
     def get_queryset(self):
         # Filter to only show forms created by the current user
-        queryset = DynamicForm.objects.filter(created_by=self.request.user)
+        queryset = DynamicForm.objects.filter(created_by_id=self.request.user.id).select_related('created_by', 'stats').prefetch_related('fields')
         
         # Apply ordering
-        ordering = self.request.query_params.get('ordering', '-created_at')
-        queryset = queryset.order_by(ordering)
+        ordering = self.request.query_params.get('ordering') or '-created_at'
+        queryset = order_by_column(queryset, ordering, FORM_ORDERING_FIELDS)
         
         # Search functionality
         search = self.request.query_params.get('search', None)
@@ -29,8 +59,14 @@ class DynamicFormViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        serializer.save(created_by_id=self.request.user.id)
 
     def destroy(self, request, *args, **kwargs):
         """Override destroy to return JSON response"""
@@ -46,96 +82,85 @@ class DynamicFormViewSet(viewsets.ModelViewSet):
 
     @action(detail=True, methods=['post'])
     def reorder_fields(self, request, pk=None):
-        """Reorder form fields based on provided order"""
+        """Reorder form fields based on provided order in a single update"""
         form = self.get_object()
         field_orders = request.data.get('field_orders', [])
+        if not isinstance(field_orders, list):
+            return Response({'field_orders': 'Expected a list.'}, status=status.HTTP_400_BAD_REQUEST)
         
-        for item in field_orders:
-            field_id = item.get('field_id')
-            order = item.get('order')
-            try:
-                field = form.fields.get(id=field_id)
-                field.order = order
-                field.save()
-            except:
-                pass
+        fields = {field.pk: field for field in form.fields.all()}
+        changed = {}
+        failed = []
+        for index, item in enumerate(field_orders):
+            raw_id = item.get('field_id') if isinstance(item, dict) else None
+            field_id = parse_int(raw_id)
+            order = parse_int(item.get('order')) if isinstance(item, dict) else None
+            if order is None:
+                failed.append({'index': index, 'field_id': raw_id, 'error': 'A valid integer order is required.'})
+            elif field_id is None:
+                failed.append({'index': index, 'field_id': raw_id, 'error': 'A valid field id is required.'})
+            elif field_id not in fields:
+                failed.append({'index': index, 'field_id': raw_id, 'error': 'Field does not belong to this form.'})
+            else:
+                fields[field_id].order = order
+                changed[field_id] = fields[field_id]
+        
+        if changed:
+            with transaction.atomic():
+                FormField.objects.bulk_update(changed.values(), ['order'])
+            invalidate_compiled_form(form.pk)
+            bump_generation_on_commit(form.created_by_id, 'forms')
         
-        serializer = self.get_serializer(form)
-        return Response(serializer.data)
+        # Drop the prefetched fields so the response reflects the new order
+        form._prefetched_objects_cache = {}
+        data = dict(self.get_serializer(form).data)
+        data['failed'] = failed
+        return Response(data)
 
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
     permission_classes = [IsAuthenticated]
+    # Records embed form names and fields, so form changes invalidate them too
+    cache_scopes = ('records', 'forms')
+    pagination_class = RecordCursorPagination
+    stream_chunk_size = 2000
 
     def get_queryset(self):
-        # Filter to only show employees created by the current user
-        queryset = Employee.objects.filter(created_by=self.request.user)
-        
-        # Apply ordering (default to most recent first)
-        ordering = self.request.query_params.get('ordering', '-created_at')
-        queryset = queryset.order_by(ordering)
-        
-        # Filter by form (only user's own forms)
-        form_id = self.request.query_params.get('form_id', None)
-        if form_id:
-            queryset = queryset.filter(form_id=form_id)
-        
-        # Enhanced search in dynamic fields
-        search = self.request.query_params.get('search', None)
-        if search:
-            # Get all employees first
-            all_employees = list(queryset)
-            matching_ids = []
-            
-            search_lower = search.lower()
-            
-            for employee in all_employees:
-                # Search through all values in the employee's data
-                if employee.data:
-                    for key, value in employee.data.items():
-                        # Convert value to string and search
-                        value_str = str(value).lower() if value is not None else ''
-                        if search_lower in value_str:
-                            matching_ids.append(employee.id)
-                            break  # Found a match, no need to check other fields
-            
-            # Filter queryset by matching IDs
-            if matching_ids:
-                queryset = Employee.objects.filter(id__in=matching_ids).order_by(ordering)
-            else:
-                # No matches found, return empty queryset
-                queryset = Employee.objects.none()
-        
-        # Filter by specific dynamic field
-        for key, value in self.request.query_params.items():
-            if key.startswith('field_'):
-                field_label = key.replace('field_', '').replace('_', ' ')
-                
-                # Get current queryset as list
-                current_employees = list(queryset)
-                matching_ids = []
-                
-                value_lower = value.lower()
-                
-                for employee in current_employees:
-                    if employee.data and field_label in employee.data:
-                        field_value = employee.data[field_label]
-                        field_value_str = str(field_value).lower() if field_value is not None else ''
-                        if value_lower in field_value_str:
-                            matching_ids.append(employee.id)
-                
-                # Filter queryset by matching IDs
-                if matching_ids:
-                    queryset = Employee.objects.filter(id__in=matching_ids).order_by(ordering)
-                else:
-                    queryset = Employee.objects.none()
-        
+        # Only the current user's employees, filtered by the query params
+        queryset = filter_employees(self.request.user, self.request.query_params)
+        queryset = queryset.select_related('form', 'created_by')
+        if self.include_form_fields():
+            queryset = queryset.prefetch_related('form__fields')
         return queryset
 
+    def include_form_fields(self):
+        """Whether each record embeds its form's field schema"""
+        if self.action == 'export':
+            return False
+        if self.action != 'list':
+            return True
+        include = self.request.query_params.get('include', '')
+        return 'form_fields' in include.split(',')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['include_form_fields'] = self.include_form_fields()
+        return context
+
+    def list(self, request, *args, **kwargs):
+        """List records; ?stream=true streams a JSON array instead of paginating"""
+        if request.query_params.get('stream', '').lower() in ('1', 'true'):
+            queryset = self.filter_queryset(self.get_queryset())
+            return stream_queryset(queryset, self.get_serializer(), chunk_size=self.stream_chunk_size)
+        return self.cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, super().retrieve, *args, **kwargs)
+
     def perform_create(self, serializer):
-        serializer.save(created_by=self.request.user)
+        serializer.save(created_by_id=self.request.user.id)
 
     def destroy(self, request, *args, **kwargs):
         """Override destroy to return JSON response"""
@@ -153,38 +178,152 @@ class EmployeeViewSet(viewsets.ModelViewSet):
         """Delete multiple employees (only user's own)"""
         ids = request.data.get('ids', [])
         # Ensure only deleting user's own employees
-        deleted_count = Employee.objects.filter(
+        deleted_count = delete_records(Employee.objects.filter(
             id__in=ids,
-            created_by=self.request.user
-        ).delete()[0]
+            created_by_id=self.request.user.id
+        ))
         return Response({
             'message': f'{deleted_count} employees deleted successfully',
             'deleted_count': deleted_count
         }, status=status.HTTP_200_OK)
     
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk(self, request):
+        """Create or update many records at once, reporting per-row errors"""
+        records = request.data.get('records') if isinstance(request.data, dict) else request.data
+        if not isinstance(records, list):
+            return Response({'records': 'Expected a list of records.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        max_records = getattr(settings, 'EMPLOYEES_BULK_MAX_RECORDS', 10000)
+        if len(records) > max_records:
+            return Response({'records': f'At most {max_records} records can be sent at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        batch_size = getattr(settings, 'EMPLOYEES_BULK_BATCH_SIZE', 500)
+        if isinstance(request.data, dict) and 'batch_size' in request.data:
+            try:
+                batch_size = max(1, min(int(request.data['batch_size']), max_records))
+            except (TypeError, ValueError):
+                return Response({'batch_size': 'A valid integer is required.'},
+                                status=status.HTTP_400_BAD_REQUEST)
+
+        result = bulk_write_records(self.request.user, records, batch_size=batch_size)
+        return Response(result, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_records(self, request):
+        """Import records for one form from an uploaded CSV or NDJSON file"""
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'A CSV or NDJSON file is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            form = DynamicForm.objects.get(id=request.data.get('form_id'), created_by_id=self.request.user.id)
+        except (DynamicForm.DoesNotExist, ValueError, TypeError):
+            return Response({'form_id': 'Form not found.'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('file_format') or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response({'file_format': f'Must be one of: {", ".join(IMPORT_FORMATS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            skip = max(0, int(request.data.get('skip', 0)))
+        except (TypeError, ValueError):
+            return Response({'skip': 'A valid integer is required.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        importer = RecordImporter(
+            form, self.request.user,
+            batch_size=getattr(settings, 'EMPLOYEES_BULK_BATCH_SIZE', 500), skip=skip,
+        )
+        # The upload is read as a stream; large files are spooled to disk by Django
+        stats = importer.run(iter_rows(open_text(upload.file), file_format))
+        if 'error' in stats:
+            # Rows before the error are saved; resume with skip=processed once the file is fixed
+            return Response(stats, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats, status=status.HTTP_200_OK)
+    
+    @action(detail=False, methods=['get'], renderer_classes=[CSVRenderer, NDJSONRenderer, JSONRenderer])
+    def export(self, request, *args, **kwargs):
+        """Stream records as CSV or NDJSON (?format=csv|ndjson), honouring the list filters"""
+        file_format = request.accepted_renderer.format
+        if file_format not in ('csv', 'ndjson'):
+            file_format = 'csv'
+        queryset = self.filter_queryset(self.get_queryset())
+        form_id = request.query_params.get('form_id')
+        columns = export_columns(self.request.user, form_id)
+        labels = field_label_maps(self.request.user, form_id)
+        return export_response(queryset, columns, labels, file_format, chunk_size=self.stream_chunk_size)
+    
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Counts and number/date aggregates over the filtered records, computed in the database"""
+        return self.cached_response(request, self.compute_stats)
+
+    def compute_stats(self, request):
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(RecordStats(self.request.user, queryset, request.query_params).compute())
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Autocomplete field values for a search-as-you-type box (?q=)"""
+        query = request.query_params.get('q', '').strip()
+        form_id = request.query_params.get('form_id') or None
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_SUGGESTIONS)), MAX_SUGGESTIONS))
+        except ValueError:
+            return Response({'limit': 'A valid integer is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if form_id is not None and not form_id.isdigit():
+            return Response({'form_id': 'A valid integer is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not query:
+            return Response({'suggestions': []})
+
+        user_id = self.request.user.id
+        generations = f'{get_generation(user_id, "records")}-{get_generation(user_id, "forms")}'
+        digest = hashlib.md5(f'{query}|{form_id}|{limit}'.encode('utf-8')).hexdigest()
+        cache = get_cache()
+        cache_key = f'employees:suggest:{user_id}:{generations}:{digest}'
+        suggestions = cache.get(cache_key)
+        if suggestions is None:
+            suggestions = suggest(self.request.user, query, form_id=form_id, limit=limit)
+            cache.set(cache_key, suggestions, timeout=get_cache_timeout())
+        response = Response({'suggestions': suggestions})
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
     @action(detail=False, methods=['get'])
     def search_fields(self, request):
         """Get all available field labels for search (from user's own forms)"""
         form_id = request.query_params.get('form_id', None)
+        user_id = self.request.user.id
+        generation = get_generation(user_id, 'forms')
         
+        # The generation changes whenever any of the user's forms or fields do
+        etag = f'"search-fields-{generation}-{form_id or "all"}"'
+        if etag_matches(request, etag):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            cache = get_cache()
+            cache_key = f'employees:search_fields:{user_id}:{generation}:{form_id or ""}'
+            fields = cache.get(cache_key)
+            if fields is None:
+                fields = self.field_catalog(form_id)
+                cache.set(cache_key, fields, timeout=get_cache_timeout())
+            response = Response({'fields': fields})
+        
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def field_catalog(self, form_id=None):
+        """Field labels and types of the user's forms, in a single query"""
+        fields = FormField.objects.filter(form__created_by_id=self.request.user.id)
         if form_id:
             try:
-                # Ensure the form belongs to the current user
-                form = DynamicForm.objects.get(id=form_id, created_by=self.request.user)
-                fields = [{'label': field.label, 'type': field.field_type} 
-                         for field in form.fields.all()]
-                return Response({'fields': fields})
-            except DynamicForm.DoesNotExist:
-                return Response({'fields': []})
-        else:
-            # Get all unique fields across user's own forms
-            user_forms = DynamicForm.objects.filter(created_by=self.request.user)
-            field_dict = {}
-            for form in user_forms:
-                for field in form.fields.all():
-                    if field.label not in field_dict:
-                        field_dict[field.label] = field.field_type
-            
-            fields = [{'label': label, 'type': ftype} 
-                     for label, ftype in field_dict.items()]
-            return Response({'fields': fields})
\ No newline at end of file
+                fields = fields.filter(form_id=int(form_id))
+            except ValueError:
+                return []
+        rows = fields.order_by('-form__created_at', 'form_id', 'order').values_list('label', 'field_type')
+        
+        # First occurrence wins when forms share a label
+        field_dict = {}
+        for label, field_type in rows:
+            field_dict.setdefault(label, field_type)
+        return [{'label': label, 'type': ftype} for label, ftype in field_dict.items()]
@@ -0,0 +1,95 @@
+"""JWT authentication without a user row lookup per request.
+
+Access tokens are signed, so the user id claim can be trusted as is and the
+request gets a lightweight ``TokenUser`` carrying only that id. Views that
+need the full profile load it with ``get_request_user``. So that disabling
+or deleting an account still locks it out before its tokens expire, the
+active flag is checked against a small per-process cache with a short TTL
+(``USERS_STATUS_CACHE_TTL`` seconds), cleared for a user whenever that user
+is saved or deleted.
+"""
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from rest_framework.exceptions import APIException, AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+User = get_user_model()
+
+# user id -> (is active, expiry as a monotonic timestamp)
+_user_status = {}
+
+
+def get_status_ttl():
+    return getattr(settings, 'USERS_STATUS_CACHE_TTL', 30)
+
+
+def cached_is_active(user_id):
+    """Cached active flag for user_id, or None if unknown or expired"""
+    entry = _user_status.get(user_id)
+    if entry is None or entry[1] < time.monotonic():
+        return None
+    return entry[0]
+
+
+def remember_is_active(user_id, active):
+    _user_status[user_id] = (active, time.monotonic() + get_status_ttl())
+    return active
+
+
+def forget_user_status(user_id):
+    _user_status.pop(user_id, None)
+
+
+def active_user_query(user_id):
+    """Query for the active flag of user_id; a deleted user yields None"""
+    return User.objects.filter(pk=user_id).values_list('is_active', flat=True)
+
+
+def is_user_active(user_id):
+    active = cached_is_active(user_id)
+    if active is None:
+        active = remember_is_active(user_id, bool(active_user_query(user_id).first()))
+    return active
+
+
+async def ais_user_active(user_id):
+    active = cached_is_active(user_id)
+    if active is None:
+        active = remember_is_active(user_id, bool(await active_user_query(user_id).afirst()))
+    return active
+
+
+def get_request_user(request):
+    """The full User behind request.user, for views that need profile data"""
+    if isinstance(request.user, User):
+        return request.user
+    try:
+        return User.objects.get(pk=request.user.id)
+    except User.DoesNotExist:
+        raise AuthenticationFailed('User not found', code='user_not_found')
+
+
+class TokenUserAuthentication(JWTStatelessUserAuthentication):
+    """Authenticate from the token claims, checking only the cached active flag"""
+
+    def get_user(self, validated_token):
+        user = super().get_user(validated_token)
+        if not is_user_active(validated_token[api_settings.USER_ID_CLAIM]):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
+
+
+def is_staff_request(request):
+    """Whether the request comes from a staff user, by session or access token"""
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        authenticated = TokenUserAuthentication().authenticate(request)
+    except APIException:
+        return False
+    if authenticated is None:
+        return False
+    return User.objects.filter(pk=authenticated[0].id, is_staff=True, is_active=True).exists()
@@ -39,7 +39,7 @@ class ChangePasswordSerializer(serializers.Serializer):
         return attrs
 
     def validate_old_password(self, value):
-        user = self.context['request'].user
+        user = self.context.get('user') or self.context['request'].user
         if not user.check_password(value):
             raise serializers.ValidationError("Old password is incorrect.")
         return value
\ No newline at end of file
@@ -1,3 +1,87 @@
-from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import TokenUserAuthentication, is_staff_request
 
-# Create your tests here.
+User = get_user_model()
+
+
+class TokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('ann', email='ann@example.com', password='Secret-pass-123')
+        self.client = APIClient()
+
+    def authorize(self, user=None):
+        token = RefreshToken.for_user(user or self.user).access_token
+        return {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+
+    def test_access_token_authenticates_without_loading_the_user(self):
+        request = RequestFactory().get('/', **self.authorize())
+        authentication = TokenUserAuthentication()
+        user, _ = authentication.authenticate(request)
+        self.assertIsInstance(user, TokenUser)
+        self.assertEqual(user.id, self.user.pk)
+        # The active flag is cached after the first request
+        with self.assertNumQueries(0):
+            authentication.authenticate(request)
+
+    def test_inactive_users_are_rejected(self):
+        headers = self.authorize()
+        self.assertEqual(self.client.get('/api/users/profile/', **headers).status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get('/api/users/profile/', **headers)
+        self.assertEqual(response.status_code, 401)
+        with self.assertRaises(AuthenticationFailed):
+            TokenUserAuthentication().authenticate(RequestFactory().get('/', **headers))
+
+    def test_deleted_users_are_rejected(self):
+        headers = self.authorize()
+        self.assertEqual(self.client.get('/api/users/profile/', **headers).status_code, 200)
+        self.user.delete()
+        self.assertEqual(self.client.get('/api/users/profile/', **headers).status_code, 401)
+
+    def test_profile_is_read_and_updated(self):
+        headers = self.authorize()
+        response = self.client.get('/api/users/profile/', **headers)
+        self.assertEqual((response.data['username'], response.data['email']), ('ann', 'ann@example.com'))
+        response = self.client.patch('/api/users/profile/', {'first_name': 'Ann'}, format='json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.first_name, 'Ann')
+
+    def test_change_password_checks_the_old_password(self):
+        headers = self.authorize()
+        payload = {'old_password': 'wrong', 'new_password': 'Another-pass-456', 'new_password2': 'Another-pass-456'}
+        response = self.client.post('/api/users/change-password/', payload, format='json', **headers)
+        self.assertEqual(response.status_code, 400)
+        payload['old_password'] = 'Secret-pass-123'
+        response = self.client.post('/api/users/change-password/', payload, format='json', **headers)
+        self.assertEqual(response.status_code, 200)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password('Another-pass-456'))
+
+    def test_register_and_login(self):
+        payload = {
+            'username': 'bob', 'email': 'bob@example.com',
+            'password': 'Secret-pass-123', 'password2': 'Secret-pass-123',
+        }
+        response = self.client.post('/api/users/register/', payload, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        access = response.data['tokens']['access']
+        response = self.client.get('/api/users/profile/', HTTP_AUTHORIZATION=f'Bearer {access}')
+        self.assertEqual(response.data['username'], 'bob')
+        response = self.client.post('/api/users/login/', {'username': 'bob', 'password': 'Secret-pass-123'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('access', response.data)
+
+    def test_is_staff_request(self):
+        staff = User.objects.create_user('admin', password='Secret-pass-123', is_staff=True)
+        self.assertTrue(is_staff_request(RequestFactory().get('/', **self.authorize(staff))))
+        self.assertFalse(is_staff_request(RequestFactory().get('/', **self.authorize())))
+        self.assertFalse(is_staff_request(RequestFactory().get('/', HTTP_AUTHORIZATION='Bearer invalid')))
+        self.assertFalse(is_staff_request(RequestFactory().get('/')))
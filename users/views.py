@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
+from .authentication import get_request_user
 from .serializers import (
     UserRegistrationSerializer,
     UserProfileSerializer,
@@ -38,15 +39,15 @@ class UserProfileView(generics.RetrieveUpdateAPIView):
     serializer_class = UserProfileSerializer
 
     def get_object(self):
-        return self.request.user
+        return get_request_user(self.request)
 
 class ChangePasswordView(APIView):
     permission_classes = (IsAuthenticated,)
 
     def post(self, request):
-        serializer = ChangePasswordSerializer(data=request.data, context={'request': request})
+        user = get_request_user(request)
+        serializer = ChangePasswordSerializer(data=request.data, context={'request': request, 'user': user})
         if serializer.is_valid():
-            user = request.user
             user.set_password(serializer.validated_data['new_password'])
             user.save()
             return Response({